@@ -0,0 +1 @@
+"""Offline evaluation and benchmark scripts; run them with python -m benchmarks.<name>."""
@@ -0,0 +1,89 @@
+"""Burst of Core42 calls from several sessions against a rate-limited mock.
+
+Starts the mock Core42 server with a request limit per window, fires a burst
+of chat calls spread over several sessions, and compares running with no
+admission control against the shared scheduler set to the mock's quota:
+
+    python -m benchmarks.admission_burst --calls 40 --sessions 4 --limit 10 --window 5
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+from nrc_search import admission
+from nrc_search.admission import AdmissionScheduler, Core42Busy, TokenBucket, admission_context
+from nrc_search.clients import Core42Client, Core42Error
+from nrc_search.mock_servers import start_mock_core42
+
+
+def burst(url: str, calls: int, sessions: int, scheduler: AdmissionScheduler) -> dict:
+    admission._scheduler = scheduler
+    client = Core42Client(api_url=url, api_key="mock", max_retries=3, backoff_base=0.2, backoff_max=2.0)
+    outcomes, lock = [], threading.Lock()
+    positions = {}
+
+    def call(i):
+        session = f"session-{i % sessions}"
+        started = time.perf_counter()
+        with admission_context(session, on_position=lambda n: positions.setdefault(i, n)):
+            try:
+                client.chat([{"role": "user", "content": f"question {i} " + "x" * 400}])
+                status = "ok"
+            except Core42Busy:
+                status = "shed"
+            except Core42Error:
+                status = "error"
+        with lock:
+            outcomes.append({"session": session, "status": status, "seconds": time.perf_counter() - started})
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    finish = {}
+    for outcome in outcomes:
+        finish.setdefault(outcome["session"], []).append(outcome["seconds"])
+    latencies = sorted(outcome["seconds"] for outcome in outcomes)
+    return {
+        "ok": sum(1 for o in outcomes if o["status"] == "ok"),
+        "errors": sum(1 for o in outcomes if o["status"] == "error"),
+        "shed": sum(1 for o in outcomes if o["status"] == "shed"),
+        "client_retries": client.stats["retries"],
+        "seconds": round(elapsed, 2),
+        "latency_s": {"p50": round(statistics.median(latencies), 2), "max": round(latencies[-1], 2)},
+        "max_queue_position": max(positions.values(), default=0),
+        "mean_latency_by_session_s": {s: round(statistics.mean(v), 2) for s, v in sorted(finish.items())},
+        "scheduler": scheduler.stats(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare a Core42 call burst with and without admission control.")
+    parser.add_argument("--calls", type=int, default=40)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=10, help="Mock requests allowed per window")
+    parser.add_argument("--window", type=float, default=5.0, help="Mock rate-limit window in seconds")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock response delay in seconds")
+    args = parser.parse_args()
+
+    report = {}
+    for mode in ("unscheduled", "scheduled"):
+        server, url = start_mock_core42(rpm_limit=args.limit, rate_window=args.window, latency=args.latency)
+        if mode == "unscheduled":
+            scheduler = AdmissionScheduler(rpm=0, tpm=0)
+            scheduler.backoff = lambda seconds: None  # each call only retries on its own
+        else:
+            # 90% of the quota, with bursts of half a window's worth, leaves room for the mock's sliding window
+            rpm = 0.9 * args.limit * 60.0 / args.window
+            scheduler = AdmissionScheduler(rpm=rpm, tpm=0, max_wait=args.calls * args.window)
+            scheduler.requests = TokenBucket(rpm, capacity=max(1, args.limit // 2))
+        report[mode] = burst(url, args.calls, args.sessions, scheduler)
+        report[mode]["mock_429s"] = server.rate_limited_count
+        server.shutdown()
+    print(json.dumps(report, indent=2))
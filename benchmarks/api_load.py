@@ -0,0 +1,124 @@
+"""Sustained requests per second of the JSON API against local mock backends.
+
+Builds a small local index and Data folder, starts the mock Core42 server
+with a fixed latency, then runs the API in-process and drives POST /search
+from --clients keep-alive connections for --seconds, once per worker-pool
+size. Every question is unique so each request does a full retrieval and
+GPT-4o round trip; admission limits are lifted because the mock has none.
+
+    python -m benchmarks.api_load --workers 1,4,16 --clients 32 --seconds 10 --latency 0.2
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.pdf_download_rss import write_large_pdf
+from nrc_search import config
+from nrc_search.local_index import write_index
+from nrc_search.mock_servers import start_mock_core42
+
+TOPICS = ["stress corrosion cracking", "service water biofouling", "diesel generator failures",
+          "boric acid corrosion", "steam generator tube degradation", "motor-operated valve testing"]
+
+
+def build_fixture(workdir: str, chunks: int = 2000):
+    """A synthetic local index and one cited PDF; points config at them."""
+    data_folder = os.path.join(workdir, "Data", "IN")
+    os.makedirs(data_folder)
+    write_large_pdf(os.path.join(data_folder, "IN 2023-01.pdf"), 1)
+    records = []
+    for i in range(chunks):
+        topic = TOPICS[i % len(TOPICS)]
+        name = f"IN 20{10 + i % 14}-{i % 40 + 1:02d}"
+        records.append({"id": f"{name}#{i}", "text": f"{topic} observed at plant {i}; licensees should review {topic}.",
+                        "metadata": {"document_name": name, "document_id": name, "doc_type": "IN",
+                                     "year": 2010 + i % 14, "section_number": str(i % 5 + 1)}})
+    index_dir = os.path.join(workdir, "index")
+    write_index(records, index_dir, dense=False)
+    config.RETRIEVAL_BACKEND = "local"
+    config.LOCAL_INDEX_DIR = index_dir
+    config.DATA_FOLDER = os.path.join(workdir, "Data")
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def drive(base_url: str, clients: int, seconds: float) -> dict:
+    """Closed-loop load: each client sends its next search as soon as the previous one returns."""
+    counter = itertools.count()
+    latencies, statuses, lock = [], {}, threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(n):
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            i = next(counter)
+            question = f"{TOPICS[i % len(TOPICS)]} question {i}"
+            started = time.perf_counter()
+            try:
+                status = session.post(f"{base_url}/search", json={"question": question},
+                                      headers={"X-Client-Id": f"load-{n}"}, timeout=60).status_code
+            except requests.RequestException:
+                status = "connection_error"
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "ok_per_second": round(statuses.get(200, 0) / elapsed, 1),
+        "statuses": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        "latency_ms": {"p50": round(percentile(latencies, 50), 1), "p95": round(percentile(latencies, 95), 1),
+                       "p99": round(percentile(latencies, 99), 1)},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the JSON API against mock retrieval and LLM backends.")
+    parser.add_argument("--workers", default="1,4,16", help="Comma-separated worker-pool sizes to compare")
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent keep-alive connections")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each run")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock Core42 response delay in seconds")
+    args = parser.parse_args()
+
+    from nrc_search.api import start_api_server
+
+    workdir = tempfile.mkdtemp(prefix="api_load_")
+    mock, url = start_mock_core42(latency=args.latency)
+    try:
+        build_fixture(workdir)
+        config.CORE42_API_URL, config.CORE42_API_KEY = url, "mock"
+        config.CORE42_RPM = config.CORE42_TPM = 0
+        config.CACHE_ENABLED = False
+        config.API_MAX_PENDING = args.clients * 2  # measure throughput, not load shedding
+
+        report = {"clients": args.clients, "seconds": args.seconds, "mock_latency_s": args.latency, "runs": {}}
+        for workers in [int(w) for w in args.workers.split(",")]:
+            server, base_url = start_api_server(port=0, workers=workers)
+            pdf = requests.get(f"{base_url}/pdf", params={"name": "IN 2023-01"}, timeout=10)
+            run = drive(base_url, args.clients, args.seconds)
+            run["pdf_lookup_status"] = pdf.status_code
+            run["service"] = requests.get(f"{base_url}/health", timeout=10).json()["workers"]
+            report["runs"][f"workers={workers}"] = run
+            server.shutdown()
+            server.server_close()
+        print(json.dumps(report, indent=2))
+    finally:
+        mock.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
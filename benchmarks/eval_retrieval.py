@@ -0,0 +1,132 @@
+"""Recall@N and latency of single-stage retrieval vs. retrieve-then-rerank and multi-query fan-out.
+
+The question set is JSONL, one labelled question per line:
+
+    {"question": "What does NRC say about SCC in austenitic stainless steel?",
+     "relevant": ["IN 2023-01", "GL 89-13"]}
+
+"relevant" lists document identifiers or document/file names. A retrieved
+chunk counts as a hit when its identifier matches, or when its document
+name contains the label.
+
+    python -m benchmarks.eval_retrieval questions.jsonl --top-n 5 --candidates 30
+    python -m benchmarks.eval_retrieval questions.jsonl --end-to-end   # also time run_custom_rag
+    python -m benchmarks.eval_retrieval questions.jsonl --max-queries 5  # fan-out width
+"""
+import argparse
+import json
+import statistics
+import time
+
+from nrc_search import config
+from nrc_search.clients import get_retriever
+from nrc_search.doc_index import normalize_document_id, normalize_name
+from nrc_search.fanout import fanout_retrieve
+from nrc_search.rerank import rerank
+
+
+def load_questions(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _node_labels(node_with_score) -> tuple:
+    metadata = node_with_score.node.metadata or {}
+    name = metadata.get("document_name") or metadata.get("file_name") or ""
+    doc_id = metadata.get("document_id") or normalize_document_id(str(name))
+    return doc_id, normalize_name(str(name))
+
+
+def recall(nodes: list, relevant: list) -> float:
+    """Fraction of relevant documents that appear among the retrieved nodes."""
+    if not relevant:
+        return 0.0
+    retrieved = [_node_labels(node) for node in nodes]
+    hits = 0
+    for label in relevant:
+        label_id = normalize_document_id(label)
+        label_name = normalize_name(label)
+        if any((label_id and label_id == doc_id) or (label_name and label_name in name) for doc_id, name in retrieved):
+            hits += 1
+    return hits / len(relevant)
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(recalls: list, latencies_ms: list) -> dict:
+    return {
+        "recall": round(statistics.mean(recalls), 4) if recalls else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies_ms, 50), 1),
+            "p95": round(percentile(latencies_ms, 95), 1),
+            "mean": round(statistics.mean(latencies_ms), 1) if latencies_ms else 0.0,
+        },
+    }
+
+
+def evaluate(questions: list, top_n: int, candidates: int, end_to_end: bool = False, max_queries: int = None) -> dict:
+    retriever = get_retriever()
+    single_recall, single_ms, two_recall, two_ms = [], [], [], []
+    fanout_recall, fanout_ms, fanout_width = [], [], []
+    for item in questions:
+        question, relevant = item["question"], item.get("relevant", [])
+
+        start = time.perf_counter()
+        nodes = retriever.retrieve(question, similarity_top_k=top_n)
+        single_ms.append((time.perf_counter() - start) * 1000)
+        single_recall.append(recall(nodes, relevant))
+
+        start = time.perf_counter()
+        nodes = rerank(question, retriever.retrieve(question, similarity_top_k=candidates), top_n)
+        two_ms.append((time.perf_counter() - start) * 1000)
+        two_recall.append(recall(nodes, relevant))
+
+        start = time.perf_counter()
+        nodes, sub_queries = fanout_retrieve(retriever, question, top_n, max_queries)
+        fanout_ms.append((time.perf_counter() - start) * 1000)
+        fanout_recall.append(recall(nodes, relevant))
+        fanout_width.append(len(sub_queries))
+
+    report = {
+        "questions": len(questions),
+        "backend": config.RETRIEVAL_BACKEND,
+        "top_n": top_n,
+        "candidates": candidates,
+        f"single_stage@{top_n}": summarize(single_recall, single_ms),
+        f"rerank@{top_n}": summarize(two_recall, two_ms),
+        f"fanout@{top_n}": {**summarize(fanout_recall, fanout_ms),
+                            "mean_sub_queries": round(statistics.mean(fanout_width), 2) if fanout_width else 0.0},
+    }
+
+    if end_to_end:
+        from nrc_search.pipeline import run_custom_rag
+
+        modes = {}
+        for enabled in (False, True):
+            config.RERANK_ENABLED = enabled
+            config.RERANK_CANDIDATES, config.RERANK_TOP_N = candidates, top_n
+            timings = []
+            for item in questions:
+                start = time.perf_counter()
+                run_custom_rag(item["question"])
+                timings.append((time.perf_counter() - start) * 1000)
+            modes["rerank" if enabled else "single_stage"] = summarize([], timings)["latency_ms"]
+        report["end_to_end_ms"] = modes
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure recall@N and latency with and without reranking or fan-out.")
+    parser.add_argument("questions", help="Labelled question set (JSONL)")
+    parser.add_argument("--top-n", type=int, default=config.RERANK_TOP_N, help="Chunks passed to the LLM")
+    parser.add_argument("--candidates", type=int, default=config.RERANK_CANDIDATES, help="First-stage candidate count")
+    parser.add_argument("--end-to-end", action="store_true", help="Also time the full retrieval + GPT-4o pipeline")
+    parser.add_argument("--max-queries", type=int, default=config.FANOUT_MAX_QUERIES, help="Fan-out sub-queries per question")
+    args = parser.parse_args()
+    report = evaluate(load_questions(args.questions), args.top_n, args.candidates, args.end_to_end, args.max_queries)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,161 @@
+"""Excerpt grounding cost and accuracy on long chunk sets.
+
+Builds --queries synthetic searches of --chunks chunks of about --chunk-chars
+characters each. Sentences draw on a Zipf-distributed vocabulary of function
+words and technical terms, so common phrases recur across chunks as they do
+in real letters. Every search has --references references with --excerpts
+quotes each, drawn in turn from five kinds:
+
+- verbatim: a chunk sentence, with quote marks, case and punctuation changed
+- paraphrased: a chunk sentence with about 10% of its words dropped or replaced
+- elided: the start and end of a chunk sentence joined with "..."
+- chimera: the first half of one chunk sentence and the second half of another
+- fabricated: a new sentence of the same vocabulary
+
+The first three should be grounded and the last two flagged. Reports
+milliseconds per search (chunk tokenization included) and how many excerpts
+of each kind were grounded. With --baseline the naive alternative, difflib
+over every chunk's full text for every excerpt, is timed as well.
+
+    python -m benchmarks.grounding --chunks 200 --chunk-chars 4000 --baseline
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from difflib import SequenceMatcher
+
+from nrc_search.grounding import Grounder, words
+
+FUNCTION_WORDS = ("the of and to in a was for that is on with by as at from be were this which or an are "
+                  "not had have during after when its been than".split())
+SYLLABLES = ["ac", "bor", "cool", "dra", "feed", "gen", "ic", "lant", "men", "nu", "or", "pres", "ric", "sur",
+             "ter", "val", "weld", "ing", "tion", "ure", "ant", "ic", "al", "ed"]
+KINDS = ["verbatim", "paraphrased", "elided", "chimera", "fabricated"]
+
+
+def vocabulary(rng: random.Random, size: int = 3000) -> tuple:
+    """(words, weights): function words first, then made-up technical terms, with Zipf weights."""
+    terms = set()
+    while len(terms) < size - len(FUNCTION_WORDS):
+        terms.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    vocab = FUNCTION_WORDS + sorted(terms)
+    rng.shuffle(vocab[len(FUNCTION_WORDS):])
+    return vocab, [1 / (rank + 1) for rank in range(len(vocab))]
+
+
+def sentence(rng: random.Random, vocab: tuple) -> str:
+    tokens = rng.choices(vocab[0], weights=vocab[1], k=rng.randint(12, 28))
+    return " ".join(tokens).capitalize() + "."
+
+
+def build_chunks(count: int, chars: int, rng: random.Random, vocab: tuple) -> list:
+    chunks = []
+    for i in range(count):
+        parts, size = [], 0
+        while size < chars:
+            parts.append(sentence(rng, vocab))
+            size += len(parts[-1]) + 1
+        chunks.append({"source_num": i + 1, "node_id": f"chunk-{i}", "content": " ".join(parts),
+                       "metadata": {"document_id": f"IN 2020-{i % 40 + 1:02d}"}})
+    return chunks
+
+
+def chunk_sentence(chunks: list, rng: random.Random) -> list:
+    return rng.choice(rng.choice(chunks)["content"].split(". ")).rstrip(".").split()
+
+
+def quote(chunks: list, kind: str, rng: random.Random, vocab: tuple) -> str:
+    """One excerpt of the given kind."""
+    if kind == "fabricated":
+        return sentence(rng, vocab)
+    tokens = chunk_sentence(chunks, rng)
+    if kind == "verbatim":
+        text = " ".join(tokens)
+        return f"“{text.upper() if rng.random() < 0.3 else text}.”"
+    if kind == "elided":
+        return f"{' '.join(tokens[:6])} ... {' '.join(tokens[-5:])}"
+    if kind == "chimera":
+        other = chunk_sentence(chunks, rng)
+        return " ".join(tokens[:len(tokens) // 2] + other[len(other) // 2:])
+    edited = list(tokens)
+    for _ in range(max(1, len(tokens) // 10)):
+        position = rng.randrange(len(edited))
+        if rng.random() < 0.5:
+            del edited[position]
+        else:
+            edited[position] = rng.choice(FUNCTION_WORDS)
+    return " ".join(edited)
+
+
+def naive_ground(chunks: list, excerpt: str) -> float:
+    """Best difflib similarity of an excerpt against any whole chunk (the slow way)."""
+    target = words(excerpt)
+    best = 0.0
+    for chunk in chunks:
+        matcher = SequenceMatcher(None, target, words(chunk["content"]), autojunk=False)
+        best = max(best, sum(b.size for b in matcher.get_matching_blocks()) / len(target))
+    return best
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and score excerpt grounding on long chunk sets.")
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--chunks", type=int, default=30, help="Retrieved chunks per search")
+    parser.add_argument("--chunk-chars", type=int, default=1500)
+    parser.add_argument("--references", type=int, default=5)
+    parser.add_argument("--excerpts", type=int, default=4, help="Quotes per reference")
+    parser.add_argument("--baseline", action="store_true", help="Also time difflib over whole chunks")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocab = vocabulary(rng)
+    timings, baseline_timings = [], []
+    outcomes = {kind: {"excerpts": 0, "grounded": 0} for kind in KINDS}
+    for _ in range(args.queries):
+        chunks = build_chunks(args.chunks, args.chunk_chars, rng, vocab)
+        references, truth = [], {}
+        for r in range(args.references):
+            excerpts = []
+            for e in range(args.excerpts):
+                kind = KINDS[(r * args.excerpts + e) % len(KINDS)]
+                excerpts.append(quote(chunks, kind, rng, vocab))
+                truth[excerpts[-1]] = kind
+            references.append({"document_name": chunks[r]["metadata"]["document_id"], "key_excerpts": excerpts})
+
+        started = time.perf_counter()
+        Grounder(chunks).ground_all(references, drop=False)
+        timings.append((time.perf_counter() - started) * 1000)
+
+        for ref in references:
+            for record in ref["grounding"]["excerpts"]:
+                outcome = outcomes[truth[record["text"]]]
+                outcome["excerpts"] += 1
+                outcome["grounded"] += record["grounded"]
+        if args.baseline:
+            started = time.perf_counter()
+            for excerpt in truth:
+                naive_ground(chunks, excerpt)
+            baseline_timings.append((time.perf_counter() - started) * 1000)
+
+    for outcome in outcomes.values():
+        outcome["grounded_pct"] = round(100 * outcome["grounded"] / outcome["excerpts"], 1)
+    report = {
+        "queries": args.queries,
+        "chunks": args.chunks,
+        "chunk_chars": args.chunk_chars,
+        "excerpts_per_query": args.references * args.excerpts,
+        "grounding_ms": {"mean": round(statistics.mean(timings), 2), "p50": percentile(timings, 0.5),
+                         "p95": percentile(timings, 0.95)},
+        "outcomes": outcomes,
+    }
+    if baseline_timings:
+        report["naive_difflib_ms"] = {"mean": round(statistics.mean(baseline_timings), 2),
+                                      "p50": percentile(baseline_timings, 0.5)}
+    print(json.dumps(report, indent=2))
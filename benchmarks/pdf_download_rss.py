@@ -0,0 +1,136 @@
+"""Peak RSS of a results page citing five large PDFs, across several reruns.
+
+Builds a throwaway Data folder of large PDFs, answers the search from the
+mock Core42 server with one reference per PDF, then drives the dashboard
+with Streamlit's AppTest: one search followed by --reruns reruns. Each
+dashboard variant runs in its own process so peak RSS is comparable.
+
+    python -m benchmarks.pdf_download_rss --mb 40 --baseline-rev <commit before lazy downloads>
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from nrc_search.local_index import write_index
+from nrc_search.mock_servers import start_mock_core42
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOCUMENTS = [f"IN 2024-0{i}" for i in range(1, 6)]
+
+
+def write_large_pdf(path: str, megabytes: int):
+    """A one-page PDF padded with an unused binary stream of the given size."""
+    padding = os.urandom(megabytes * 1024 * 1024)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>",
+        b"<< /Length %d >>\nstream\n" % len(padding) + padding + b"\nendstream",
+    ]
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def run_child(script: str, reruns: int):
+    """Runs inside the measured process: one search, then reruns."""
+    from streamlit.testing.v1 import AppTest
+
+    start_mb = current_rss_mb()
+    at = AppTest.from_file(script, default_timeout=120).run()
+    at.toggle[0].set_value(False).run()
+    at.text_input[0].input("large technical letters").run()
+    at.button[0].click().run()
+    for _ in range(reruns):
+        at.run()
+    print(json.dumps({
+        "exceptions": [str(e.value) for e in at.exception],
+        "download_buttons": len(at.get("download_button")),
+        "rss_start_mb": round(start_mb, 1),
+        "rss_end_mb": round(current_rss_mb(), 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def measure(module: str, script_source: str, workdir: str, env: dict, *args) -> dict:
+    """Run `python -m module --child <script> args...` in a fresh process; returns its last JSON line."""
+    script = os.path.join(workdir, "dashboard.py")
+    with open(script, "w", encoding="utf-8") as f:
+        f.write(script_source)
+    output = subprocess.run(
+        [sys.executable, "-m", module, "--child", script, *args],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def dashboard_script(rev: str = None) -> str:
+    """02_dashboard.py from the working tree, or as of a git revision."""
+    if rev:
+        return subprocess.run(["git", "show", f"{rev}:02_dashboard.py"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout
+    with open(os.path.join(PROJECT_ROOT, "02_dashboard.py"), encoding="utf-8") as f:
+        return f.read()
+
+
+def build_fixture(workdir: str, megabytes: int):
+    """Data folder of cited PDFs, a stub local index and a mock Core42 citing every PDF. Returns (server, env)."""
+    os.makedirs(os.path.join(workdir, "Data", "IN"))
+    for name in DOCUMENTS:
+        write_large_pdf(os.path.join(workdir, "Data", "IN", f"{name}.pdf"), megabytes)
+    index_dir = os.path.join(workdir, "index")
+    write_index([{"id": "stub#0", "text": "large technical letters", "metadata": {"document_name": DOCUMENTS[0]}}],
+                index_dir, dense=False)
+    references = {"references": [
+        {"document_name": name, "section_number": "1", "relevance_summary": "Benchmark reference.",
+         "key_excerpts": ["An excerpt long enough to be rendered as a quote."], "technical_context": "Context."}
+        for name in DOCUMENTS
+    ]}
+    server, url = start_mock_core42(references=references)
+    env = dict(os.environ, CORE42_API_URL=url, CORE42_API_KEY="mock", CACHE_ENABLED="0", METRICS_PORT="0",
+               RETRIEVAL_BACKEND="local", LOCAL_INDEX_DIR=index_dir, PYTHONPATH=PROJECT_ROOT)
+    return server, env
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak RSS of a results page with five large cited PDFs.")
+    parser.add_argument("--mb", type=int, default=40, help="Size of each PDF")
+    parser.add_argument("--reruns", type=int, default=5, help="Reruns after the search")
+    parser.add_argument("--baseline-rev", help="Also measure 02_dashboard.py as of this git revision")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.reruns)
+        sys.exit(0)
+
+    workdir = tempfile.mkdtemp(prefix="pdf_rss_")
+    try:
+        server, env = build_fixture(workdir, args.mb)
+        report = {"pdfs": len(DOCUMENTS), "mb_each": args.mb, "reruns": args.reruns}
+        variants = ([("baseline", args.baseline_rev)] if args.baseline_rev else []) + [("current", None)]
+        for label, rev in variants:
+            report[label] = measure("benchmarks.pdf_download_rss", dashboard_script(rev), workdir, env,
+                                    "--reruns", str(args.reruns))
+        server.shutdown()
+        print(json.dumps(report, indent=2))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,81 @@
+"""Rerun time of the results page with five references.
+
+Drives the dashboard with Streamlit's AppTest: one search, then times full
+reruns (what any widget interaction used to trigger) and clicks on a
+result's "Open in System Viewer" button (only offered on Windows; elsewhere
+button_click_ms is null). AppTest always reruns the whole script, so button
+clicks here do not show the saving from the results fragment; in a browser
+they rerun only the results area. Uses the same fixture as pdf_download_rss;
+each variant runs in its own process.
+
+    python -m benchmarks.rerun_timing --baseline-rev <commit before the view model>
+"""
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.pdf_download_rss import DOCUMENTS, build_fixture, dashboard_script, measure
+
+
+def _median_ms(action, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        action()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 1)
+
+
+def run_child(script: str, runs: int):
+    """Runs inside the measured process."""
+    from streamlit.testing.v1 import AppTest
+
+    from nrc_search.tracing import get_metrics
+
+    at = AppTest.from_file(script, default_timeout=120).run()
+    at.toggle[0].set_value(False).run()
+    at.text_input[0].input("large technical letters").run()
+    at.button[0].click().run()
+    at.run()  # warm up
+    lookups_before = get_metrics().snapshot().get("find_pdf", {}).get("count", 0)
+    rerun_ms = _median_ms(lambda: at.run(), runs)
+    lookups = get_metrics().snapshot().get("find_pdf", {}).get("count", 0) - lookups_before
+    print(json.dumps({
+        "exceptions": [str(e.value) for e in at.exception],
+        "references_shown": sum(1 for tab in at.tabs if tab.label == "📥 Download PDF"),
+        "rerun_ms": rerun_ms,
+        "button_click_ms": (_median_ms(lambda: at.button(key="open_sys_0").click().run(), runs)
+                            if any(b.key == "open_sys_0" for b in at.button) else None),
+        "pdf_lookups_per_rerun": round(lookups / runs, 1),
+        # The results area alone, without AppTest's own per-run overhead
+        "render_p50_ms": get_metrics().snapshot().get("render", {}).get("p50_ms"),
+    }))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time reruns of a results page with five references.")
+    parser.add_argument("--runs", type=int, default=20, help="Timed reruns per measurement")
+    parser.add_argument("--mb", type=int, default=2, help="Size of each cited PDF")
+    parser.add_argument("--baseline-rev", help="Also measure 02_dashboard.py as of this git revision")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.runs)
+        sys.exit(0)
+
+    workdir = tempfile.mkdtemp(prefix="rerun_timing_")
+    try:
+        server, env = build_fixture(workdir, args.mb)
+        report = {"references": len(DOCUMENTS), "runs": args.runs}
+        variants = ([("baseline", args.baseline_rev)] if args.baseline_rev else []) + [("current", None)]
+        for label, rev in variants:
+            report[label] = measure("benchmarks.rerun_timing", dashboard_script(rev), workdir, env, "--runs", str(args.runs))
+        server.shutdown()
+        print(json.dumps(report, indent=2))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,79 @@
+"""Which question pairs the similar-question cache lets share an answer.
+
+Each pair's first question is cached, then the second is looked up. Paraphrases
+should reuse the cached answer; near misses (another plant type, year,
+document number or system) must not, however similar their wording. Reports
+the embedding similarity of every pair, whether the key terms agree, whether
+the similarity alone would have reused the answer, and whether the cache did.
+
+    python -m benchmarks.semantic_cache --threshold 0.8
+"""
+import argparse
+import json
+
+from nrc_search import config
+from nrc_search.embeddings import cosine
+from nrc_search.pipeline import similar_question_scope
+from nrc_search.semantic_cache import SemanticCache, key_terms
+
+PARAPHRASES = [
+    ("What does NRC say about stress corrosion cracking in austenitic stainless steel?",
+     "What does the NRC say about SCC in austenitic stainless steel?"),
+    ("What does the NRC say about the Production of Chloride-Based Salt Fuel",
+     "what does NRC say about production of chloride based salt fuel?"),
+    ("In Thermodynamic Reference Electrodes what is a well defined chemical RedOx couple.",
+     "What is a well-defined chemical redox couple in thermodynamic reference electrodes?"),
+    ("Emergency diesel generator failures to start during surveillance testing",
+     "EDG failures to start during surveillance testing"),
+    ("SCC in austenitic stainless", "stress corrosion cracking of 304 SS"),
+]
+
+NEAR_MISSES = [
+    ("What does NRC say about stress corrosion cracking in piping at BWR plants?",
+     "What does NRC say about stress corrosion cracking in piping at PWR plants?"),
+    ("Cracking in boiling water reactor recirculation piping",
+     "Cracking in pressurized water reactor recirculation piping"),
+    ("Steam generator tube failures reported in 2015", "Steam generator tube failures reported in 2016"),
+    ("What did GL 89-13 require for service water systems?", "What did GL 89-10 require for service water systems?"),
+    ("RHR pump failures during shutdown", "RCIC pump failures during shutdown"),
+    ("IGSCC in reactor recirculation piping welds", "PWSCC in reactor recirculation piping welds"),
+    ("Inservice inspection requirements of 10 CFR 50.55a", "Inservice inspection requirements of 10 CFR 50.65"),
+]
+
+
+def check(pairs: list, threshold: float) -> list:
+    """One record per pair: similarity, key terms agreeing, and the reuse decisions."""
+    records = []
+    for first, second in pairs:
+        cache = SemanticCache(path="", threshold=threshold)
+        cache.add(first, "first", similar_question_scope(first))
+        similarity = round(cosine(cache.embed_query(first), cache.embed_query(second)), 3)
+        records.append({
+            "first": first,
+            "second": second,
+            "similarity": similarity,
+            "same_key_terms": key_terms(first) == key_terms(second),
+            "reused_by_similarity_alone": similarity >= threshold,
+            "reused": cache.find(second, similar_question_scope(second)) is not None,
+        })
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check answer reuse for paraphrases and near-miss question pairs.")
+    parser.add_argument("--threshold", type=float, default=config.SEMANTIC_CACHE_THRESHOLD)
+    parser.add_argument("--pairs", action="store_true", help="List every pair, not only the summary")
+    args = parser.parse_args()
+
+    report = {"threshold": args.threshold}
+    for name, pairs in (("paraphrases", PARAPHRASES), ("near_misses", NEAR_MISSES)):
+        records = check(pairs, args.threshold)
+        report[name] = {
+            "pairs": len(records),
+            "reused": sum(r["reused"] for r in records),
+            "reused_by_similarity_alone": sum(r["reused_by_similarity_alone"] for r in records),
+            "max_similarity": max(r["similarity"] for r in records),
+        }
+        if args.pairs:
+            report[name]["records"] = records
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,97 @@
+"""Memory held by many dashboard sessions' retrieved chunks: own copies vs. the shared chunk store.
+
+Serves realistic-length chunks from the mock LlamaCloud, then simulates
+--sessions sessions, each of which ran one search drawn from --questions
+distinct questions with a skewed popularity (a few questions are asked by
+many users). Every search goes through build_rag_context and the LlamaCloud
+client, so each one gets freshly decoded chunk dicts exactly as the
+dashboard does. Each session then keeps either those dicts (as before) or
+ChunkRef references into one ChunkStore. Live memory after all sessions is
+measured with tracemalloc.
+
+    python -m benchmarks.session_memory --sessions 500 --questions 60
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from benchmarks.api_load import TOPICS
+from nrc_search import config
+from nrc_search.chunk_store import ChunkStore
+from nrc_search.mock_servers import start_mock_llama_cloud
+
+SENTENCE = ("Licensees identified {topic} during inservice inspection of unit {unit}; the root cause evaluation "
+            "attributed it to inadequate monitoring, and corrective actions revised the {topic} program. ")
+
+
+def build_chunks(documents: int = 400, chunks_per_document: int = 6) -> list:
+    """About 1.2 KB chunks with the metadata ingest uploads."""
+    records = []
+    for d in range(documents):
+        name = f"IN {2000 + d % 24}-{d // 24 + 1:02d}"
+        for c in range(chunks_per_document):
+            topic = TOPICS[(d + c) % len(TOPICS)]
+            text = "".join(SENTENCE.format(topic=topic, unit=(d * 7 + c + s) % 97) for s in range(6))
+            records.append({"id": f"{name}#{c}", "text": text,
+                            "metadata": {"document_name": name, "document_id": name, "doc_type": "IN",
+                                         "year": 2000 + d % 24, "section_number": str(c + 1),
+                                         "file_name": f"{name}.pdf"}})
+    return records
+
+
+def session_questions(sessions: int, questions: int, seed: int = 0) -> list:
+    """One question per session; question i is chosen with weight 1 / (i + 1)."""
+    pool = [f"{TOPICS[i % len(TOPICS)]} findings at unit {i}" for i in range(questions)]
+    return random.Random(seed).choices(pool, weights=[1 / (i + 1) for i in range(questions)], k=sessions)
+
+
+def measure(questions: list, keep) -> dict:
+    """Live bytes after every session has stored keep(raw_chunks) in its state."""
+    from nrc_search.pipeline import build_rag_context
+
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    sessions = []
+    for question in questions:
+        _, raw_chunks = build_rag_context(question)
+        sessions.append({"raw_chunks": keep(raw_chunks)})
+    gc.collect()
+    total = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return {"total_kb": round(total / 1024, 1), "per_session_kb": round(total / 1024 / len(sessions), 2),
+            "chunks_held": sum(len(s["raw_chunks"]) for s in sessions)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-session chunk copies with the shared chunk store.")
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--questions", type=int, default=60, help="Distinct questions the sessions draw from")
+    parser.add_argument("--store-mb", type=float, default=config.CHUNK_STORE_MB, help="Chunk store bound")
+    args = parser.parse_args()
+
+    mock, base_url = start_mock_llama_cloud(chunks=build_chunks())
+    try:
+        config.RETRIEVAL_BACKEND = "llamacloud"
+        config.LLAMA_CLOUD_BASE_URL, config.LLAMA_CLOUD_API_KEY = base_url, "mock"
+        config.FANOUT_ENABLED = config.RERANK_ENABLED = False
+        questions = session_questions(args.sessions, args.questions)
+        from nrc_search.pipeline import build_rag_context
+
+        build_rag_context(questions[0])  # connect and import the client before measuring
+
+        store = ChunkStore(max_bytes=int(args.store_mb * 1024 * 1024))
+        report = {
+            "sessions": args.sessions,
+            "distinct_questions": len(set(questions)),
+            "copies": measure(questions, lambda raw_chunks: raw_chunks),
+            "chunk_store": measure(questions, store.add_chunks),
+        }
+        report["chunk_store"]["store"] = store.stats()
+        report["saved_pct"] = round(
+            100 * (1 - report["chunk_store"]["total_kb"] / report["copies"]["total_kb"]), 1)
+        print(json.dumps(report, indent=2))
+    finally:
+        mock.shutdown()
@@ -0,0 +1,80 @@
+"""Identical searches after a streamed reply is dropped, closed or half read.
+
+The leader of a shared search hands its reply to identical searches only
+once its stream has been read to the end. Starts the mock Core42 server,
+runs a streaming search per case and abandons its stream without reading it
+to the end, then runs the same question again. The flight must be gone and
+the repeat must run its own search, not wait for the abandoned one until
+--timeout:
+
+    python -m benchmarks.single_flight --timeout 5
+"""
+import argparse
+import gc
+import json
+import shutil
+import tempfile
+import time
+
+from benchmarks.api_load import build_fixture
+from nrc_search import config
+from nrc_search.mock_servers import start_mock_core42
+from nrc_search.pipeline import run_custom_rag, stream_custom_rag
+from nrc_search.singleflight import get_single_flight
+
+
+def never_iterated(stream):
+    del stream
+    gc.collect()
+
+
+def closed_unread(stream):
+    stream.close()
+
+
+def half_read(stream):
+    for _ in zip(range(1), stream):
+        pass
+    stream.close()
+
+
+CASES = {"never_iterated": never_iterated, "closed_unread": closed_unread, "half_read": half_read}
+
+
+def run_case(name: str, abandon) -> dict:
+    question = f"stress corrosion cracking ({name})"
+    stream, _ = stream_custom_rag(question)
+    abandon(stream)
+    del stream
+    in_flight = get_single_flight().stats()["in_flight"]
+    started = time.perf_counter()
+    try:
+        run_custom_rag(question)
+        repeat = "ok"
+    except Exception as e:
+        repeat = type(e).__name__
+    return {"in_flight_after": in_flight, "repeat": repeat, "repeat_seconds": round(time.perf_counter() - started, 2)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that abandoned streamed searches do not block identical ones.")
+    parser.add_argument("--timeout", type=float, default=5.0, help="How long an identical search waits for a shared reply")
+    parser.add_argument("--latency", type=float, default=0.1, help="Mock Core42 response delay in seconds")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="single_flight_")
+    mock, url = start_mock_core42(latency=args.latency)
+    try:
+        build_fixture(workdir, chunks=200)
+        config.CORE42_API_URL, config.CORE42_API_KEY = url, "mock"
+        config.CORE42_RPM = config.CORE42_TPM = 0
+        config.CACHE_ENABLED = False
+        config.SINGLE_FLIGHT_ENABLED = True
+        config.SINGLE_FLIGHT_TIMEOUT = args.timeout
+
+        report = {"timeout_s": args.timeout, "cases": {name: run_case(name, abandon) for name, abandon in CASES.items()}}
+        report["single_flight"] = get_single_flight().stats()
+        print(json.dumps(report, indent=2))
+    finally:
+        mock.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
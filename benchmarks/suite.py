@@ -0,0 +1,292 @@
+"""Offline end-to-end benchmark: retrieval, GPT-4o, reply parsing and PDF lookup.
+
+Everything external is replaced by local stand-ins, so the suite runs on a
+laptop or in CI without credentials:
+- a synthetic Data tree of stub PDFs (one folder per document type and year)
+  for every --sizes entry, e.g. 1k, 10k and 100k files
+- the mock LlamaCloud retrieve API over one chunk per cited document, going
+  through the real LlamaCloudIndex client and connection pool
+- the mock Core42 chat API, whose references cite documents in the tree plus
+  one that is not there (the slow fuzzy path of the PDF lookup)
+
+Both mocks take a latency, jitter and error rate. Each query is timed the
+way the dashboard handles a search: run_custom_rag, parse_rag_response on
+the reply, then a PDF lookup per reference through the document index that
+find_pdf_file wraps. The report is JSON, per tree size and stage:
+
+    python -m benchmarks.suite --sizes 1000,10000,100000 --output suite.json
+    python -m benchmarks.suite --output after.json --compare suite.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.api_load import TOPICS, percentile
+from nrc_search import config
+from nrc_search.doc_index import DocumentIndex, get_document_index
+from nrc_search.mock_servers import start_mock_core42, start_mock_llama_cloud
+from nrc_search.responses import parse_rag_response
+from nrc_search.tracing import start_trace
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOCUMENT_TYPES = ("IN", "GL", "BL", "RIS")
+YEARS = range(1990, 2025)
+MISSING_DOCUMENT = "IN 1989-999 Withdrawn notice that is not in the Data folder"
+STUB_PDF = b"%PDF-1.4\n1 0 obj << /Type /Catalog >> endobj\ntrailer << /Root 1 0 R >>\n%%EOF\n"
+STAGES = ("end_to_end", "rag", "retrieval", "llm", "parse", "find_pdf")
+
+
+def document_names(count: int) -> list:
+    """count distinct (doc_type, year, file stem) spread over every type and year."""
+    names = []
+    per_number = len(DOCUMENT_TYPES) * len(YEARS)
+    for i in range(count):
+        doc_type = DOCUMENT_TYPES[i % len(DOCUMENT_TYPES)]
+        year = YEARS[(i // len(DOCUMENT_TYPES)) % len(YEARS)]
+        number = i // per_number + 1
+        topic = TOPICS[i % len(TOPICS)].title()
+        names.append((doc_type, year, f"{doc_type} {year}-{number:02d} {topic}"))
+    return names
+
+
+def build_data_tree(root: str, count: int) -> list:
+    """Write count stub PDFs under root/<type>/<year>/; returns the names written."""
+    names = document_names(count)
+    for doc_type, year, stem in names:
+        folder = os.path.join(root, doc_type, str(year))
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, stem + ".pdf"), "wb") as f:
+            f.write(STUB_PDF)
+    return names
+
+
+def build_chunks(names: list, count: int, rng: random.Random) -> list:
+    """LlamaCloud chunks for a sample of the tree, with the metadata ingest uploads."""
+    chunks = []
+    for i, (doc_type, year, stem) in enumerate(rng.sample(names, min(count, len(names)))):
+        document_id = " ".join(stem.split(" ")[:2])
+        topic = TOPICS[i % len(TOPICS)]
+        chunks.append({
+            "id": f"chunk-{i}",
+            "text": f"{topic} was observed at plant {i}. Licensees should review {topic} programs and "
+                    f"operating experience described in {document_id}.",
+            "metadata": {"file_name": stem + ".pdf", "document_name": stem, "document_id": document_id,
+                         "doc_type": doc_type, "year": year, "section_number": str(i % 5 + 1)},
+        })
+    return chunks
+
+
+def build_references(names: list, count: int, rng: random.Random) -> dict:
+    """The canned GPT-4o reply: count documents from the tree and one that is missing."""
+    references = []
+    for _, _, stem in rng.sample(names, min(count, len(names))) + [(None, None, MISSING_DOCUMENT)]:
+        references.append({
+            "document_name": stem,
+            "section_number": "2",
+            "relevance_summary": "Benchmark reference.",
+            "key_excerpts": ["Licensees should review operating experience."],
+            "technical_context": "Synthetic.",
+        })
+    return {"references": references}
+
+
+def summarize(samples: list, errors: int, elapsed: float) -> dict:
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "throughput_per_s": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(samples) / len(samples), 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+    }
+
+
+def run_query(question: str, data_folder: str) -> dict:
+    """One dashboard search, timed per stage (ms). Raises if the search itself fails."""
+    from nrc_search.pipeline import run_custom_rag
+
+    timings = {"find_pdf": []}
+    started = time.perf_counter()
+    with start_trace("benchmark") as trace:
+        response, _ = run_custom_rag(question)
+    timings["rag"] = trace.total_ms
+    for stage in trace.spans:
+        if stage.name in ("retrieval", "llm"):
+            timings[stage.name] = stage.duration_ms
+        if stage.name == "llm" and "error" in stage.attributes:
+            raise RuntimeError(f"Core42: {response}")
+
+    parse_started = time.perf_counter()
+    results = parse_rag_response(response)
+    timings["parse"] = (time.perf_counter() - parse_started) * 1000
+
+    index = get_document_index(data_folder)
+    for reference in results.get("references", []):
+        lookup_started = time.perf_counter()
+        index.find(reference.get("document_name", ""))
+        timings["find_pdf"].append((time.perf_counter() - lookup_started) * 1000)
+    timings["end_to_end"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def start_mocks(args, names: list):
+    """Mock LlamaCloud and Core42 for the whole run; the app's clients are pointed at them."""
+    rng = random.Random(0)
+    llama, llama_url = start_mock_llama_cloud(
+        chunks=build_chunks(names, args.chunks, rng), latency=args.llamacloud_latency, jitter=args.jitter,
+        error_rate=args.llamacloud_error_rate,
+    )
+    core42, core42_url = start_mock_core42(
+        references=build_references(names, args.references, rng), latency=args.core42_latency,
+        jitter=args.jitter, error_rate=args.core42_error_rate,
+    )
+    config.LLAMA_CLOUD_BASE_URL, config.LLAMA_CLOUD_API_KEY = llama_url, "mock"
+    config.CORE42_API_URL, config.CORE42_API_KEY = core42_url, "mock"
+    return llama, core42
+
+
+def run_size(size: int, args, workdir: str, mocks: tuple) -> dict:
+    """Build a tree of size files and run args.queries searches against it."""
+    data_folder = os.path.join(workdir, f"Data-{size}")
+    started = time.perf_counter()
+    build_data_tree(data_folder, size)
+    tree_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    DocumentIndex(data_folder)
+    index_build_ms = (time.perf_counter() - started) * 1000
+    get_document_index(data_folder)  # the warm, process-wide index the searches use
+    config.DATA_FOLDER = data_folder
+    requests_before = [mock.request_count for mock in mocks]
+    try:
+        samples = {stage: [] for stage in STAGES}
+        errors = dict.fromkeys(STAGES, 0)
+
+        def one(i):
+            question = f"{TOPICS[i % len(TOPICS)]} operating experience, case {size}-{i}"
+            try:
+                return run_query(question, data_folder), None
+            except ValueError as e:  # json.JSONDecodeError: the reply could not be parsed
+                return None, ("parse", e)
+            except Exception as e:
+                return None, ("rag", e)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            outcomes = list(pool.map(one, range(args.queries)))
+        elapsed = time.perf_counter() - started
+
+        for timings, error in outcomes:
+            if error:
+                errors[error[0]] += 1
+                errors["end_to_end"] += 1
+                continue
+            for stage, value in timings.items():
+                samples[stage].extend(value if isinstance(value, list) else [value])
+        return {
+            "files": size,
+            "tree_build_s": round(tree_seconds, 2),
+            "doc_index_build_ms": round(index_build_ms, 1),
+            "elapsed_s": round(elapsed, 3),
+            "stages": {stage: summarize(samples[stage], errors[stage], elapsed) for stage in STAGES},
+            "mock_requests": {name: mock.request_count - before
+                              for name, mock, before in zip(("llamacloud", "core42"), mocks, requests_before)},
+        }
+    finally:
+        shutil.rmtree(data_folder, ignore_errors=True)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Percent change of p50/p95/throughput per size and stage (negative latency = faster)."""
+    deltas = {}
+    for size, run in report["sizes"].items():
+        before = baseline.get("sizes", {}).get(size)
+        if not before:
+            continue
+        for stage, now in run["stages"].items():
+            old = before["stages"].get(stage)
+            if not old:
+                continue
+            deltas.setdefault(size, {})[stage] = {
+                metric: round((now[metric] - old[metric]) / old[metric] * 100, 1) if old[metric] else None
+                for metric in ("p50_ms", "p95_ms", "throughput_per_s")
+            }
+        deltas.setdefault(size, {})["doc_index_build_ms"] = (
+            round((run["doc_index_build_ms"] - before["doc_index_build_ms"]) / before["doc_index_build_ms"] * 100, 1)
+            if before.get("doc_index_build_ms") else None
+        )
+    return deltas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark against mock LlamaCloud and Core42.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated Data tree sizes (PDF files)")
+    parser.add_argument("--queries", type=int, default=200, help="Searches per tree size, all distinct")
+    parser.add_argument("--concurrency", type=int, default=8, help="Searches in flight at once")
+    parser.add_argument("--chunks", type=int, default=5000, help="Chunks in the mock LlamaCloud index (at most the smallest tree size)")
+    parser.add_argument("--references", type=int, default=5, help="Tree documents cited per reply (plus one missing)")
+    parser.add_argument("--llamacloud-latency", type=float, default=0.05, help="Mock retrieve delay in seconds")
+    parser.add_argument("--core42-latency", type=float, default=0.2, help="Mock chat completion delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra delay (0..jitter seconds) on both mocks")
+    parser.add_argument("--llamacloud-error-rate", type=float, default=0.0, help="Fraction of retrieves answered 500")
+    parser.add_argument("--core42-error-rate", type=float, default=0.0, help="Fraction of completions answered 500")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--compare", help="Earlier report to compute percent changes against")
+    args = parser.parse_args()
+
+    config.RETRIEVAL_BACKEND = "llamacloud"
+    config.CACHE_ENABLED = config.SEMANTIC_CACHE_ENABLED = False  # every search must do the full round trip
+    config.CORE42_RPM = config.CORE42_TPM = 0
+    config.METRICS_PORT = 0
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    # Every tree starts with the same documents, so the chunks and cited
+    # references drawn from the smallest one exist in all of them
+    mocks = start_mocks(args, document_names(min(sizes)))
+    workdir = tempfile.mkdtemp(prefix="nrc_suite_")
+    try:
+        from nrc_search.pipeline import run_custom_rag
+
+        started = time.perf_counter()
+        run_custom_rag("warm-up question")  # imports, index connect and pools; reported, not sampled
+        cold_search_ms = (time.perf_counter() - started) * 1000
+        report = {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "cold_search_ms": round(cold_search_ms, 1),
+            "sizes": {},
+        }
+        for size in sizes:
+            print(f"running {size} files ...", file=sys.stderr)
+            report["sizes"][str(size)] = run_size(size, args, workdir, mocks)
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as f:
+                report["compared_to"] = {"file": args.compare, "deltas_pct": compare(report, json.load(f))}
+        text = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+        print(text)
+    finally:
+        for mock in mocks:
+            mock.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,6 @@
+"""Search pipeline behind the NRC Technical Document Query dashboard.
+
+Modules in this package are imported (not re-executed) by the Streamlit
+script, so state held at module level is created once per process and
+shared by every session.
+"""
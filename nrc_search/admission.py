@@ -0,0 +1,327 @@
+"""Process-wide admission control for Core42 calls.
+
+Core42 limits each API key by requests and tokens per minute. Instead of
+letting every session fire at once and collecting 429s, each call first
+takes a ticket here. Tickets are admitted when both token buckets (RPM and
+TPM) can pay for them, in round-robin order across sessions and FIFO within
+a session, so one busy session (or a batch run) cannot starve the others.
+While a ticket waits, its caller is told its queue position. A 429 from
+Core42 pauses admission for the Retry-After period.
+
+Background work (the cache warmer) takes background tickets: they are
+admitted only while no live call is waiting or was admitted in the last
+WARMUP_IDLE_SECONDS, and only if both buckets keep WARMUP_RESERVE of their
+capacity afterwards, so they never delay a user's search.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from . import config
+from .tracing import get_metrics
+
+
+class Core42Busy(Exception):
+    """Raised when a Core42 call cannot be admitted (queue full or waited too long)."""
+
+
+class TokenBucket:
+    """Refills continuously at per_minute; holds at most capacity (default: one minute's worth).
+
+    A per_minute of 0 or less means unlimited.
+    """
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = float(per_minute) / 60.0
+        self.capacity = float(capacity if capacity is not None else per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def refill(self, now: float):
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until amount can be taken (0 if it can be taken now)."""
+        if self.unlimited or self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        if not self.unlimited:
+            self.level -= amount
+
+
+class Ticket:
+    __slots__ = ("session", "tokens", "background", "enqueued_at", "admitted_at")
+
+    def __init__(self, session: str, tokens: int, background: bool = False):
+        self.session = session
+        self.tokens = tokens
+        self.background = background
+        self.enqueued_at = time.monotonic()
+        self.admitted_at = None
+
+    @property
+    def wait_seconds(self) -> float:
+        return (self.admitted_at or time.monotonic()) - self.enqueued_at
+
+
+_session = contextvars.ContextVar("nrc_search_admission_session", default="default")
+_position_callback = contextvars.ContextVar("nrc_search_admission_callback", default=None)
+_background = contextvars.ContextVar("nrc_search_admission_background", default=False)
+
+
+@contextmanager
+def admission_context(session: str, on_position=None, background: bool = False):
+    """Attribute Core42 calls in the enclosed block to session; on_position(n) is called while queued.
+
+    With background=True the calls only use quota that live traffic leaves idle.
+    """
+    session_token = _session.set(session)
+    callback_token = _position_callback.set(on_position)
+    background_token = _background.set(background)
+    try:
+        yield
+    finally:
+        _background.reset(background_token)
+        _position_callback.reset(callback_token)
+        _session.reset(session_token)
+
+
+def in_background() -> bool:
+    """True inside admission_context(..., background=True)."""
+    return _background.get()
+
+
+def bind_admission_session(session: str, on_position=None):
+    """Like admission_context, for the rest of the current thread's run (used by the Streamlit script)."""
+    _session.set(session)
+    _position_callback.set(on_position)
+
+
+class AdmissionScheduler:
+    """RPM/TPM token buckets with a fair per-session FIFO queue in front of them."""
+
+    def __init__(self, rpm: float = None, tpm: float = None, max_queue: int = None, max_wait: float = None,
+                 idle_seconds: float = None, reserve: float = None):
+        self.requests = TokenBucket(config.CORE42_RPM if rpm is None else rpm)
+        self.tokens = TokenBucket(config.CORE42_TPM if tpm is None else tpm)
+        self.max_queue = config.CORE42_MAX_QUEUE if max_queue is None else max_queue
+        self.max_wait = config.CORE42_QUEUE_TIMEOUT if max_wait is None else max_wait
+        self.idle_seconds = config.WARMUP_IDLE_SECONDS if idle_seconds is None else idle_seconds
+        self.reserve = config.WARMUP_RESERVE if reserve is None else reserve
+        self._cond = threading.Condition()
+        self._queues = {}       # session -> deque of waiting tickets
+        self._order = deque()   # sessions with waiting tickets, in round-robin order
+        self._background = deque()  # background tickets, admitted only when live traffic is idle
+        self._paused_until = 0.0
+        self._last_live = float("-inf")  # when a live call was last admitted
+        self._counters = {"admitted": 0, "queued": 0, "shed": 0, "timeouts": 0, "rate_limited": 0,
+                          "wait_seconds_total": 0.0, "background_admitted": 0, "background_timeouts": 0}
+
+    # Queue bookkeeping (call with self._cond held)
+    def _depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _head(self):
+        return self._queues[self._order[0]][0] if self._order else None
+
+    def _position(self, ticket: Ticket) -> int:
+        """1-based place of ticket in round-robin admission order."""
+        queue = self._queues.get(ticket.session)
+        if not queue or ticket not in queue:
+            return 0
+        index = queue.index(ticket)
+        own_turn = self._order.index(ticket.session)
+        ahead = index
+        for turn, session in enumerate(self._order):
+            if session != ticket.session:
+                ahead += min(len(self._queues[session]), index + (1 if turn < own_turn else 0))
+        return ahead + 1
+
+    def _remove(self, ticket: Ticket):
+        queue = self._queues.get(ticket.session)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.session]
+                self._order.remove(ticket.session)
+
+    def _admit_delay(self, ticket: Ticket, now: float) -> float:
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return max(self._paused_until - now, self.requests.delay(1), self.tokens.delay(ticket.tokens))
+
+    def _background_delay(self, ticket: Ticket, now: float) -> float:
+        """Seconds until a background ticket may go: live traffic idle and the reserve left untouched."""
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        if self._order or self._background[0] is not ticket:
+            return 1.0
+        delays = [self._paused_until - now, self._last_live + self.idle_seconds - now]
+        for bucket, amount in ((self.requests, 1), (self.tokens, ticket.tokens)):
+            if not bucket.unlimited:
+                delays.append(bucket.delay(amount + self.reserve * bucket.capacity))
+        return max(delays)
+
+    def _admit(self, ticket: Ticket, now: float):
+        self.requests.take(1)
+        self.tokens.take(ticket.tokens)
+        ticket.admitted_at = now
+        if ticket.background:
+            self._background.popleft()
+            self._counters["background_admitted"] += 1
+            return
+        queue = self._queues[ticket.session]
+        queue.popleft()
+        self._order.popleft()
+        if queue:
+            self._order.append(ticket.session)
+        else:
+            del self._queues[ticket.session]
+        self._last_live = now
+        self._counters["admitted"] += 1
+        self._counters["wait_seconds_total"] += ticket.wait_seconds
+
+    # Public API
+    def acquire(self, tokens: int, session: str = None, on_position=None, timeout: float = None,
+                background: bool = None) -> Ticket:
+        """Block until a call of about `tokens` tokens may be sent. Raises Core42Busy."""
+        session = session or _session.get()
+        on_position = on_position or _position_callback.get()
+        timeout = self.max_wait if timeout is None else timeout
+        background = _background.get() if background is None else background
+        if not self.tokens.unlimited:
+            # An oversized call must still fit eventually (a background one beside the reserve)
+            tokens = min(tokens, int(self.tokens.capacity * ((1.0 - self.reserve) if background else 1.0)))
+        if background:
+            return self._acquire_background(Ticket(session, tokens, background=True), timeout)
+        ticket = Ticket(session, tokens)
+        deadline = ticket.enqueued_at + timeout
+        reported, waited = None, False
+
+        with self._cond:
+            depth = self._depth()
+            if self.max_queue and depth >= self.max_queue:
+                self._counters["shed"] += 1
+                raise Core42Busy(f"Core42 is at capacity ({depth} requests queued); please retry shortly.")
+            if ticket.session not in self._queues:
+                self._queues[ticket.session] = deque()
+                self._order.append(ticket.session)
+            self._queues[ticket.session].append(ticket)
+
+        # on_position may raise (Streamlit stops a rerun with a BaseException); a ticket
+        # left queued would block every later call behind it until they all time out.
+        try:
+            while True:
+                with self._cond:
+                    now = time.monotonic()
+                    head = self._head()
+                    delay = self._admit_delay(head, now)
+                    if head is ticket and delay <= 0:
+                        self._admit(ticket, now)
+                        self._cond.notify_all()
+                        return ticket
+                    if now >= deadline:
+                        position = self._position(ticket)
+                        self._remove(ticket)
+                        self._counters["timeouts"] += 1
+                        self._cond.notify_all()
+                        raise Core42Busy(f"Still queued for Core42 (position {position}) after {timeout:g}s; please retry.")
+                    if not waited:
+                        waited = True
+                        self._counters["queued"] += 1
+                    position = self._position(ticket)
+
+                if on_position is not None and position != reported:
+                    reported = position
+                    on_position(position)
+
+                with self._cond:
+                    # Woken early when the head is admitted; otherwise sleep until the head can pay
+                    self._cond.wait(max(0.01, min(delay if head is ticket else 1.0, deadline - time.monotonic(), 1.0)))
+        except BaseException:
+            with self._cond:
+                self._remove(ticket)
+                self._cond.notify_all()
+            raise
+
+    def _acquire_background(self, ticket: Ticket, timeout: float) -> Ticket:
+        deadline = ticket.enqueued_at + timeout
+        with self._cond:
+            self._background.append(ticket)
+            while True:
+                now = time.monotonic()
+                delay = self._background_delay(ticket, now)
+                if delay <= 0:
+                    self._admit(ticket, now)
+                    self._cond.notify_all()
+                    return ticket
+                if now >= deadline:
+                    self._background.remove(ticket)
+                    self._counters["background_timeouts"] += 1
+                    self._cond.notify_all()
+                    raise Core42Busy(f"Live traffic kept Core42 busy for {timeout:g}s; background call not sent.")
+                self._cond.wait(max(0.01, min(delay, deadline - now, 1.0)))
+
+    def live_idle(self) -> bool:
+        """No live call waiting, none admitted in the last idle_seconds and no 429 pause in force."""
+        with self._cond:
+            now = time.monotonic()
+            return not self._order and now >= self._paused_until and now - self._last_live >= self.idle_seconds
+
+    def settle(self, ticket: Ticket, actual_tokens: int):
+        """Correct the token bucket once the real usage of an admitted call is known."""
+        if actual_tokens is None:
+            return
+        with self._cond:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + ticket.tokens - actual_tokens)
+            self._cond.notify_all()
+
+    def backoff(self, seconds: float):
+        """Hold all admissions for seconds, e.g. after Core42 answered 429."""
+        with self._cond:
+            self._counters["rate_limited"] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            return {
+                **self._counters,
+                "queue_depth": self._depth(),
+                "sessions_waiting": len(self._order),
+                "background_waiting": len(self._background),
+                "requests_available": None if self.requests.unlimited else round(self.requests.level, 2),
+                "tokens_available": None if self.tokens.unlimited else round(self.tokens.level),
+                "paused_seconds": round(max(0.0, self._paused_until - now), 2),
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> AdmissionScheduler:
+    """Return the process-wide Core42 scheduler, creating it on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = AdmissionScheduler()
+                get_metrics().register_source("core42_admission", _scheduler.stats, {
+                    "admitted": "counter", "queued": "counter", "shed": "counter", "timeouts": "counter",
+                    "rate_limited": "counter", "wait_seconds_total": "counter",
+                    "background_admitted": "counter", "background_timeouts": "counter",
+                })
+    return _scheduler
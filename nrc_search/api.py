@@ -0,0 +1,413 @@
+"""Headless JSON HTTP API for scripts and other internal tools.
+
+Runs the same cached pipeline as the dashboard, without Streamlit. Searches
+execute on a bounded worker pool shared by all connections, each with a
+timeout; when the pool is saturated further searches are refused with 503
+instead of queueing without bound. Retrieval and Core42 clients are built
+at startup and a periodic retrieval probe keeps their connection pools warm;
+the cache warmer (nrc_search.warmup) answers popular questions while idle.
+
+    python -m nrc_search.api --port 8600 --workers 16
+
+    POST /search                {"question": "...", "filters": {"doc_types": ["IN"], "year_from": 2015},
+                                 "include_chunks": false}
+    GET  /pdf?name=IN 2023-01   where a cited document's PDF is
+    GET  /pdf/download?name=... the PDF itself
+    GET  /pdf/pages?name=...&section=2&excerpt=...  only the cited pages, as a small PDF (or &pages=3,4)
+    GET  /pdf/page.png?name=...&page=3              a rendered page preview (needs pymupdf)
+    GET  /health                liveness, backends and worker state (?deep=1 also probes retrieval)
+    GET  /metrics               Prometheus text, as on METRICS_PORT
+
+Searches from one client (X-Client-Id header, else its address) share a
+lane in the Core42 admission queue, so one busy tool cannot starve others.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+from . import config
+from .admission import Core42Busy, admission_context, get_scheduler
+from .cache import get_query_cache
+from .clients import get_core42_client, get_retriever
+from .doc_index import get_document_index, normalize_document_id
+from .filters import DOCUMENT_TYPE_LABELS, SearchFilters
+from .pdf_cache import get_pdf_cache
+from .pdf_pages import get_page_extractor
+from .pipeline import search
+from .tracing import get_metrics, start_trace
+from .warmup import log_query, start_cache_warmer
+
+
+logger = logging.getLogger(__name__)
+
+MAX_QUESTION_CHARS = 2000
+
+
+class ApiError(Exception):
+    """An error answered to the client with the given HTTP status."""
+
+    def __init__(self, status: int, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+# --- Worker Pool ---
+class SearchService:
+    """Runs pipeline calls on a bounded thread pool with per-request timeouts.
+
+    Threads suit the work: a search spends nearly all its time waiting on
+    LlamaCloud and Core42, and threads share the warm clients and caches.
+    A search that times out keeps running to completion (its answer is
+    still cached) and keeps counting against max_pending until it does.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = None, timeout: float = None):
+        self.workers = workers or config.API_WORKERS
+        self.max_pending = max(self.workers, max_pending or config.API_MAX_PENDING)
+        self.timeout = timeout or config.API_REQUEST_TIMEOUT
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="nrc-api")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._counters = {"requests": 0, "completed": 0, "rejected": 0, "timeouts": 0, "errors": 0}
+        self._stop = threading.Event()
+        self.started_at = time.time()
+
+    def call(self, fn, *args):
+        """Run fn(*args) on the pool and wait for it. Raises ApiError on overload or timeout."""
+        with self._lock:
+            self._counters["requests"] += 1
+            if self._pending >= self.max_pending:
+                self._counters["rejected"] += 1
+                raise ApiError(503, f"Search service is at capacity ({self._pending} searches in progress).", retry_after=2)
+            self._pending += 1
+        future = self._pool.submit(self._run, fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._counters["timeouts"] += 1
+            raise ApiError(504, f"Search did not finish within {self.timeout:g}s.") from None
+
+    def _run(self, fn, *args):
+        try:
+            result = fn(*args)
+        except Exception:
+            with self._lock:
+                self._counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+        with self._lock:
+            self._counters["completed"] += 1
+        return result
+
+    # Warm clients
+    def warm_up(self):
+        """Build the shared clients and indexes now rather than on the first request."""
+        for name, step in (("retriever", _probe_retrieval), ("core42", get_core42_client),
+                           ("documents", get_document_index)):
+            started = time.perf_counter()
+            try:
+                step()
+                logger.info("warmed %s in %.0f ms", name, (time.perf_counter() - started) * 1000)
+            except Exception as e:
+                logger.warning("warm-up of %s failed: %s", name, e)
+
+    def start_keepalive(self, interval: float = None):
+        """Probe retrieval periodically so pooled connections are not dropped while idle."""
+        interval = config.API_KEEPALIVE_SECONDS if interval is None else interval
+        if interval <= 0:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    _probe_retrieval()
+                except Exception as e:
+                    logger.warning("keep-alive probe failed: %s", e)
+
+        threading.Thread(target=loop, name="nrc-api-keepalive", daemon=True).start()
+
+    def shutdown(self):
+        self._stop.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "workers": self.workers, "pending": self._pending, "max_pending": self.max_pending}
+
+
+def _probe_retrieval():
+    retriever = get_retriever()
+    if hasattr(retriever, "health_check"):
+        if not retriever.health_check():
+            raise RuntimeError("retrieval probe failed")
+    else:
+        retriever.retrieve("health check", similarity_top_k=1)
+
+
+# --- Request Handling ---
+def parse_filters_payload(payload) -> SearchFilters:
+    """SearchFilters from the "filters" object of a search request."""
+    if not payload:
+        return None
+    if not isinstance(payload, dict):
+        raise ApiError(400, '"filters" must be an object.')
+    try:
+        year_from = int(payload["year_from"]) if payload.get("year_from") is not None else None
+        year_to = int(payload["year_to"]) if payload.get("year_to") is not None else None
+    except (TypeError, ValueError):
+        raise ApiError(400, "Filter years must be integers.") from None
+    doc_types = payload.get("doc_types") or []
+    if not isinstance(doc_types, list) or any(str(t).upper() not in DOCUMENT_TYPE_LABELS for t in doc_types):
+        raise ApiError(400, f'"doc_types" must be a list of {", ".join(DOCUMENT_TYPE_LABELS)}.')
+    document_ids = []
+    for name in payload.get("document_ids") or []:
+        document_id = normalize_document_id(str(name))
+        if not document_id:
+            raise ApiError(400, f"Not a document number: {name!r}")
+        document_ids.append(document_id)
+    return SearchFilters(doc_types, year_from, year_to, document_ids)
+
+
+def run_search(question: str, filters, include_chunks: bool, client: str) -> dict:
+    """One search, as the JSON body of a /search response."""
+    log_query(question, filters)
+    with admission_context(f"api:{client}"), start_trace("api_search") as trace:
+        try:
+            results, raw_chunks, from_cache = search(question, filters)
+        except json.JSONDecodeError as e:
+            # get_core42_response reports API failures as an "Error: ..." reply
+            raise ApiError(502, e.doc if e.doc.startswith("Error:") else "The model returned an unparseable reply.") from None
+        except Core42Busy as e:
+            raise ApiError(503, str(e), retry_after=5) from None
+    body = {"question": question, "results": results, "from_cache": from_cache}
+    reused = next((s.attributes for s in trace.spans if s.name == "cache_lookup" and "similar_to" in s.attributes), None)
+    if reused:
+        body["similar_to"] = {"question": reused["similar_to"], "similarity": reused["similarity"]}
+    if include_chunks:
+        body["raw_chunks"] = raw_chunks
+    body["timing_ms"] = {"total": round(trace.total_ms, 1)}
+    for span in trace.spans:
+        body["timing_ms"][span.name] = round(body["timing_ms"].get(span.name, 0) + span.duration_ms, 1)
+    return body
+
+
+class _ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for callers that reuse connections
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        self._send(status, json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"),
+                   "application/json; charset=utf-8", headers)
+
+    def _handle(self, route):
+        try:
+            route()
+        except ApiError as e:
+            headers = {"Retry-After": str(int(e.retry_after))} if e.retry_after else None
+            self._send_json(e.status, {"error": str(e)}, headers)
+        except Exception as e:
+            logger.exception("request failed: %s %s", self.command, self.path)
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        values = parse_qs(url.query)
+        query = {key: found[-1] for key, found in values.items()}
+        routes = {
+            "/health": lambda: self._health(query),
+            "/metrics": self._metrics,
+            "/pdf": lambda: self._pdf(query),
+            "/pdf/download": lambda: self._pdf_download(query),
+            "/pdf/pages": lambda: self._pdf_pages(query, values.get("excerpt", [])),
+            "/pdf/page.png": lambda: self._pdf_page_png(query),
+        }
+        self._handle(routes.get(url.path.rstrip("/") or "/", self._not_found))
+
+    def do_POST(self):
+        # Read the body even for unknown routes so the kept-alive connection stays in sync
+        self._body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        routes = {"/search": self._search}
+        self._handle(routes.get(urlparse(self.path).path.rstrip("/"), self._not_found))
+
+    def _not_found(self):
+        raise ApiError(404, f"No such endpoint: {self.command} {urlparse(self.path).path}")
+
+    def _read_json(self) -> dict:
+        try:
+            payload = json.loads(self._body or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ApiError(400, "Request body must be JSON.") from None
+        if not isinstance(payload, dict):
+            raise ApiError(400, "Request body must be a JSON object.")
+        return payload
+
+    # Endpoints
+    def _search(self):
+        payload = self._read_json()
+        question = payload.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise ApiError(400, '"question" is required.')
+        if len(question) > MAX_QUESTION_CHARS:
+            raise ApiError(400, f'"question" is longer than {MAX_QUESTION_CHARS} characters.')
+        filters = parse_filters_payload(payload.get("filters"))
+        client = self.headers.get("X-Client-Id") or self.client_address[0]
+        body = self.server.service.call(run_search, question.strip(), filters, bool(payload.get("include_chunks")), client)
+        self._send_json(200, body)
+
+    def _pdf(self, query: dict):
+        name = (query.get("name") or "").strip()
+        if not name:
+            raise ApiError(400, 'Query parameter "name" is required.')
+        path = get_document_index().find(name)
+        if path is None:
+            raise ApiError(404, f"No PDF found for {name!r}.")
+        self._send_json(200, {
+            "name": name,
+            "file_name": os.path.basename(path),
+            "path": os.path.relpath(path, config.DATA_FOLDER),
+            "bytes": os.path.getsize(path),
+            "download": f"/pdf/download?name={quote(os.path.basename(path))}",
+        })
+
+    def _pdf_download(self, query: dict):
+        path = self._find_pdf(query)
+        file_name = os.path.basename(path).replace('"', "")
+        self._send(200, get_pdf_cache().read(path), "application/pdf",
+                   {"Content-Disposition": f'attachment; filename="{file_name}"'})
+
+    def _find_pdf(self, query: dict) -> str:
+        name = (query.get("name") or "").strip()
+        path = get_document_index().find(name) if name else None
+        if path is None:
+            raise ApiError(404, f"No PDF found for {name!r}.")
+        return path
+
+    def _pdf_pages(self, query: dict, excerpts: list):
+        path = self._find_pdf(query)
+        extractor = get_page_extractor()
+        if query.get("pages"):
+            try:
+                pages = sorted({int(p) for p in query["pages"].split(",")})
+            except ValueError:
+                raise ApiError(400, '"pages" must be comma-separated page numbers.') from None
+        else:
+            pages = self.server.service.call(extractor.locate, path, query.get("section"), excerpts)
+            if not pages:
+                raise ApiError(404, "The cited section was not found in the PDF; download it whole instead.")
+        page_count = len(extractor.page_texts(path))
+        if pages[0] < 1 or pages[-1] > page_count or len(pages) > config.PAGE_EXTRACT_MAX_PAGES:
+            raise ApiError(400, f"Pages must be 1-{page_count}, at most {config.PAGE_EXTRACT_MAX_PAGES} of them.")
+        stem = os.path.splitext(os.path.basename(path))[0].replace('"', "")
+        self._send(200, self.server.service.call(extractor.pages_pdf, path, pages), "application/pdf", {
+            "Content-Disposition": f'attachment; filename="{stem} p{"-".join(map(str, pages))}.pdf"',
+            "X-Pages": ",".join(map(str, pages)),
+        })
+
+    def _pdf_page_png(self, query: dict):
+        path = self._find_pdf(query)
+        try:
+            page = int(query.get("page") or 0)
+        except ValueError:
+            page = 0
+        extractor = get_page_extractor()
+        if not 1 <= page <= len(extractor.page_texts(path)):
+            raise ApiError(400, '"page" must be a page number of the PDF.')
+        png = self.server.service.call(extractor.page_png, path, page)
+        if png is None:
+            raise ApiError(501, "Page previews need pymupdf installed on the server.")
+        self._send(200, png, "image/png")
+
+    def _health(self, query: dict):
+        service = self.server.service
+        body = {
+            "status": "ok",
+            "uptime_s": round(time.time() - service.started_at, 1),
+            "backend": config.RETRIEVAL_BACKEND,
+            "workers": service.stats(),
+            "admission": get_scheduler().stats(),
+        }
+        retriever = get_retriever()
+        if hasattr(retriever, "stats"):
+            body["retriever"] = retriever.stats()
+        if config.CACHE_ENABLED:
+            body["cache"] = get_query_cache().stats()
+        status = 200
+        if query.get("deep") in ("1", "true"):
+            try:
+                service.call(_probe_retrieval)
+                body["retrieval_probe"] = "ok"
+            except Exception as e:
+                body.update(status="degraded", retrieval_probe=str(e))
+                status = 503
+        self._send_json(status, body)
+
+    def _metrics(self):
+        self._send(200, get_metrics().render_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service: SearchService):
+        super().__init__(address, _ApiHandler)
+        self.service = service
+
+    def server_close(self):
+        super().server_close()
+        self.service.shutdown()
+
+
+def create_api_server(host: str = None, port: int = None, workers: int = None, warm: bool = True) -> ApiServer:
+    """Build the API server and its worker pool (port 0 picks a free port); call serve_forever to run it."""
+    service = SearchService(workers)
+    if warm:
+        service.warm_up()
+        service.start_keepalive()
+        start_cache_warmer()
+    return ApiServer((host or config.API_HOST, config.API_PORT if port is None else port), service)
+
+
+def start_api_server(host: str = None, port: int = None, workers: int = None, warm: bool = True):
+    """Run the API on a daemon thread. Returns (server, base_url)."""
+    server = create_api_server(host, port, workers, warm)
+    threading.Thread(target=server.serve_forever, name="nrc-api", daemon=True).start()
+    return server, f"http://{server.server_address[0]}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the document search as a JSON HTTP API.")
+    parser.add_argument("--host", default=config.API_HOST)
+    parser.add_argument("--port", type=int, default=config.API_PORT)
+    parser.add_argument("--workers", type=int, default=config.API_WORKERS, help="Searches running at once")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    server = create_api_server(args.host, args.port, args.workers)
+    logger.info("NRC search API listening on http://%s:%d", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,156 @@
+"""Headless batch runner: answer a file of questions without the dashboard.
+
+Questions are read from JSONL ({"id": ..., "question": ...}; "id" optional)
+or CSV (a "question" column, optionally "id"). Up to --concurrency searches
+run at once, so retrieval and GPT-4o calls for different questions overlap.
+Each answer is appended to the output JSONL as soon as it completes;
+re-running with the same output file skips questions already answered, so
+an interrupted run picks up where it stopped. Failed questions are retried
+on the next run and their new record is appended after the failed one.
+
+    python -m nrc_search.batch questions.csv -o answers.jsonl --concurrency 8
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config
+from .cache import normalize_query
+from .pipeline import search
+from .tracing import start_trace
+
+
+# --- Input ---
+def question_id(question: str) -> str:
+    """Stable id for a question without one, so resuming works on reordered input."""
+    return hashlib.sha256(normalize_query(question).encode("utf-8")).hexdigest()[:16]
+
+
+def load_questions(path: str) -> list:
+    """Read [{"id", "question"}] from a .jsonl or .csv file, skipping blank questions."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    questions, seen = [], set()
+    for row in rows:
+        question = (row.get("question") or "").strip()
+        if not question:
+            continue
+        qid = str(row.get("id") or "").strip() or question_id(question)
+        if qid not in seen:
+            seen.add(qid)
+            questions.append({"id": qid, "question": question})
+    return questions
+
+
+def completed_ids(output_path: str, retry_failed: bool = True) -> set:
+    """Ids already answered in an earlier run's output (a torn last line is ignored)."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok" or not retry_failed:
+                done.add(record.get("id"))
+    return done
+
+
+# --- Running ---
+def answer(item: dict, include_chunks: bool = False) -> dict:
+    """Run one question through the cached pipeline. Never raises; failures become records."""
+    record = {"id": item["id"], "question": item["question"]}
+    with start_trace("batch_search") as trace:
+        try:
+            results, raw_chunks, from_cache = search(item["question"])
+        except json.JSONDecodeError as e:
+            # get_core42_response reports API failures as an "Error: ..." reply
+            record.update(status="error", error=e.doc if e.doc.startswith("Error:") else f"Unparseable reply: {e.doc[:500]}")
+        except Exception as e:
+            record.update(status="error", error=f"{type(e).__name__}: {e}")
+        else:
+            record.update(status="ok", from_cache=from_cache, results=results)
+            if include_chunks:
+                record["raw_chunks"] = raw_chunks
+    record["timing_ms"] = {"total": round(trace.total_ms, 1)}
+    for span in trace.spans:
+        record["timing_ms"][span.name] = round(record["timing_ms"].get(span.name, 0) + span.duration_ms, 1)
+    return record
+
+
+async def run_batch(questions: list, output_path: str, concurrency: int = None, include_chunks: bool = False,
+                    retry_failed: bool = True, progress=None) -> dict:
+    """Answer questions concurrently, appending each record to output_path. Returns a summary."""
+    concurrency = concurrency or config.BATCH_CONCURRENCY
+    done = completed_ids(output_path, retry_failed)
+    pending = [item for item in questions if item["id"] not in done]
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    summary = {"questions": len(questions), "skipped": len(questions) - len(pending), "answered": 0, "failed": 0}
+    latencies = []
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="nrc-batch") as pool, \
+            open(output_path, "a", encoding="utf-8") as out:
+
+        async def run_one(item):
+            async with semaphore:
+                return await loop.run_in_executor(pool, answer, item, include_chunks)
+
+        for future in asyncio.as_completed([run_one(item) for item in pending]):
+            record = await future
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+            summary["answered" if record["status"] == "ok" else "failed"] += 1
+            latencies.append(record["timing_ms"]["total"])
+            if progress:
+                progress(record, summary)
+
+    elapsed = time.perf_counter() - started
+    summary.update({
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "queries_per_minute": round((summary["answered"] + summary["failed"]) / elapsed * 60, 1) if pending and elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(statistics.median(latencies), 1) if latencies else None,
+            "max": round(max(latencies), 1) if latencies else None,
+        },
+    })
+    return summary
+
+
+def _print_progress(record: dict, summary: dict):
+    status = "ok" if record["status"] == "ok" else f"FAILED ({record['error'][:80]})"
+    print(f"[{summary['answered'] + summary['failed']}] {record['id']}: {status}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a file of questions with the RAG pipeline.")
+    parser.add_argument("questions", help="Questions file (.jsonl or .csv)")
+    parser.add_argument("-o", "--output", required=True, help="Results file (JSONL, appended to when resuming)")
+    parser.add_argument("--concurrency", type=int, default=config.BATCH_CONCURRENCY, help="Searches in flight at once")
+    parser.add_argument("--include-chunks", action="store_true", help="Also write the retrieved chunks")
+    parser.add_argument("--skip-failed", action="store_true", help="Do not retry questions that failed in an earlier run")
+    parser.add_argument("--quiet", action="store_true", help="No per-question progress lines")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_batch(
+        load_questions(args.questions), args.output, concurrency=args.concurrency, include_chunks=args.include_chunks,
+        retry_failed=not args.skip_failed, progress=None if args.quiet else _print_progress,
+    ))
+    print(json.dumps(summary, indent=2))
+    sys.exit(1 if summary["failed"] else 0)
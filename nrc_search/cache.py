@@ -0,0 +1,179 @@
+"""Two-tier cache of parsed search results.
+
+Tier 1 is an in-process LRU shared by all sessions; tier 2 is a SQLite file
+that survives restarts. Entries hold both the parsed GPT-4o reply and the
+retrieved raw chunks, so a hit needs no network call at all.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from . import config
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold, collapse whitespace and drop surrounding punctuation."""
+    text = unicodedata.normalize("NFKC", query).casefold()
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" \t\"'.,;:!?")
+
+
+def make_cache_key(query: str, **params) -> str:
+    """Hash the normalized query together with the retrieval/LLM parameters."""
+    payload = json.dumps({"query": normalize_query(query), "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class QueryCache:
+    """In-memory LRU in front of a SQLite store, with TTL and size limits."""
+
+    def __init__(self, path: str = None, memory_entries: int = None, disk_entries: int = None,
+                 ttl_seconds: float = None):
+        self.path = config.CACHE_PATH if path is None else path
+        self.memory_entries = memory_entries or config.CACHE_MEMORY_ENTRIES
+        self.disk_entries = disk_entries or config.CACHE_DISK_ENTRIES
+        self.ttl_seconds = ttl_seconds or config.CACHE_TTL_SECONDS
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+        self._db = None
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self._db.commit()
+
+    def get(self, key: str):
+        """Return (results, raw_chunks) or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if now - row[1] <= self.ttl_seconds:
+                        self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        stored = json.loads(row[0])
+                        value = (stored["results"], stored["raw_chunks"])
+                        self._remember(key, row[1], value)
+                        self._counters["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self._counters["misses"] += 1
+            return None
+
+    def contains(self, key: str) -> bool:
+        """Whether a live entry exists, without counting a lookup or refreshing its LRU position."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl_seconds:
+                return True
+            if self._db is None:
+                return False
+            row = self._db.execute("SELECT created FROM results WHERE key = ?", (key,)).fetchone()
+            return row is not None and now - row[0] <= self.ttl_seconds
+
+    def put(self, key: str, results: dict, raw_chunks: list):
+        now = time.time()
+        value = (results, raw_chunks)
+        with self._lock:
+            self._remember(key, now, value)
+            self._counters["stores"] += 1
+            if self._db is not None:
+                blob = json.dumps({"results": results, "raw_chunks": raw_chunks}, default=str)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, blob, now, now),
+                )
+                self._evict_disk(now)
+                self._db.commit()
+
+    def _remember(self, key: str, created: float, value):
+        """Insert into the memory tier. Caller must hold the lock."""
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _evict_disk(self, now: float):
+        """Drop expired rows, then least-recently-used rows over the limit. Caller must hold the lock."""
+        expired = self._db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl_seconds,)).rowcount
+        overflow = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.disk_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)",
+                (overflow,),
+            )
+        self._counters["evictions"] += max(0, expired) + max(0, overflow)
+
+    def invalidate(self, key: str = None):
+        """Drop one entry, or everything when key is None (e.g. after the index changes)."""
+        with self._lock:
+            if key is None:
+                self._memory.clear()
+                if self._db is not None:
+                    self._db.execute("DELETE FROM results")
+            else:
+                self._memory.pop(key, None)
+                if self._db is not None:
+                    self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            if self._db is not None:
+                self._db.commit()
+            self._counters["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = (
+                self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0] if self._db is not None else 0
+            )
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_query_cache = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> QueryCache:
+    """Return the process-wide result cache, creating it on first use."""
+    global _query_cache
+    if _query_cache is None:
+        with _query_cache_lock:
+            if _query_cache is None:
+                _query_cache = QueryCache()
+    return _query_cache
+
+
+def on_index_changed():
+    """Invalidation hook: call after documents are added to or removed from the index."""
+    get_query_cache().invalidate()
+    if config.SEMANTIC_CACHE_ENABLED:
+        from .semantic_cache import get_semantic_cache  # imports this module
+        get_semantic_cache().invalidate()
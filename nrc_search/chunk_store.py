@@ -0,0 +1,167 @@
+"""Process-wide store of retrieved chunks, shared by every dashboard session.
+
+A search returns fresh dicts with their own copy of every chunk's text and
+metadata, and each session used to keep them in st.session_state until it
+ended. Popular chunks come back for many sessions, so the same text was held
+hundreds of times. Chunks are now stored once per process, keyed by node id
+(or a hash of their text when there is none), as slotted records whose
+metadata keys, string values and identical metadata dicts are interned.
+Sessions keep a list of ChunkRef: the record plus its rank and score.
+
+The store is an LRU bounded by CHUNK_STORE_MB of chunk text. An evicted
+record stays alive only while a session still refers to it; the next search
+returning the same chunk stores it afresh.
+"""
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+from . import config
+from .tracing import get_metrics
+
+
+class ChunkRecord:
+    """One stored chunk. Treat content and metadata as read-only: they are shared."""
+
+    __slots__ = ("chunk_id", "content", "metadata", "metadata_key", "size")
+
+    def __init__(self, chunk_id: str, content: str, metadata: dict, metadata_key, size: int):
+        self.chunk_id = chunk_id
+        self.content = content
+        self.metadata = metadata
+        self.metadata_key = metadata_key
+        self.size = size
+
+
+class ChunkRef:
+    """A session's reference to a stored chunk; reads like the raw_chunks dict it replaces."""
+
+    __slots__ = ("record", "source_num", "score")
+
+    def __init__(self, record: ChunkRecord, source_num: int, score: float = None):
+        self.record = record
+        self.source_num = source_num
+        self.score = score
+
+    def __getitem__(self, key: str):
+        if key == "content":
+            return self.record.content
+        if key == "metadata":
+            return self.record.metadata
+        if key in ("source_num", "score"):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> dict:
+        return {"source_num": self.source_num, "content": self.record.content,
+                "metadata": dict(self.record.metadata), "score": self.score}
+
+
+def _intern_value(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def chunk_id(chunk: dict) -> str:
+    """The node id of a raw chunk, or a digest of its text and metadata when it has none."""
+    metadata = chunk.get("metadata") or {}
+    node_id = chunk.get("node_id") or chunk.get("id") or metadata.get("node_id")
+    if node_id:
+        return str(node_id)
+    digest = hashlib.sha1(chunk.get("content", "").encode("utf-8"))
+    digest.update(json.dumps(metadata, sort_keys=True, default=str).encode("utf-8"))
+    return "sha1:" + digest.hexdigest()
+
+
+class ChunkStore:
+    """LRU of ChunkRecord by chunk id, bounded by total text size, with a shared metadata pool."""
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = config.CHUNK_STORE_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._records = OrderedDict()
+        self._metadata = {}  # canonical metadata key -> [shared dict, records using it]
+        self.size = 0
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _shared_metadata(self, metadata: dict) -> tuple:
+        """(interned dict, pool key) for metadata. Caller must hold the lock."""
+        try:
+            key = tuple(sorted(metadata.items()))
+            hash(key)
+        except TypeError:  # list or dict values
+            key = json.dumps(metadata, sort_keys=True, default=str)
+        entry = self._metadata.get(key)
+        if entry is None:
+            shared = {sys.intern(str(k)): _intern_value(v) for k, v in metadata.items()}
+            entry = self._metadata[key] = [shared, 0]
+        entry[1] += 1
+        return entry[0], key
+
+    def _release_metadata(self, key):
+        entry = self._metadata[key]
+        entry[1] -= 1
+        if not entry[1]:
+            del self._metadata[key]
+
+    def put(self, chunk: dict) -> ChunkRecord:
+        """The stored record for a raw chunk dict ({"content", "metadata", ...}), adding it if new."""
+        key = chunk_id(chunk)
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                self._records.move_to_end(key)
+                self._counters["hits"] += 1
+                return record
+            self._counters["misses"] += 1
+            content = chunk.get("content") or ""
+            metadata, metadata_key = self._shared_metadata(chunk.get("metadata") or {})
+            record = ChunkRecord(key, content, metadata, metadata_key, len(content))
+            self._records[key] = record
+            self.size += record.size
+            while self.size > self.max_bytes and len(self._records) > 1:
+                _, evicted = self._records.popitem(last=False)
+                self.size -= evicted.size
+                self._release_metadata(evicted.metadata_key)
+                self._counters["evictions"] += 1
+            return record
+
+    def add_chunks(self, raw_chunks: list) -> list:
+        """Store a search's raw chunks; returns the ChunkRef list a session should keep instead."""
+        return [ChunkRef(self.put(chunk), chunk.get("source_num", i + 1), chunk.get("score"))
+                for i, chunk in enumerate(raw_chunks or [])]
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._metadata.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "entries": len(self._records), "bytes": self.size,
+                    "metadata_shapes": len(self._metadata)}
+
+
+_chunk_store = None
+_chunk_store_lock = threading.Lock()
+
+
+def get_chunk_store() -> ChunkStore:
+    """Return the process-wide chunk store, creating it on first use."""
+    global _chunk_store
+    if _chunk_store is None:
+        with _chunk_store_lock:
+            if _chunk_store is None:
+                _chunk_store = ChunkStore()
+                get_metrics().register_source("chunk_store", _chunk_store.stats, {
+                    "hits": "counter", "misses": "counter", "evictions": "counter",
+                })
+    return _chunk_store
@@ -0,0 +1,407 @@
+"""Process-wide clients shared by every dashboard session.
+
+The LlamaCloud index is created once per process on top of a keep-alive
+HTTP connection pool, instead of once per search. If a retrieval fails the
+index is rebuilt and the call is retried once. Core42 calls go through a
+single pooled requests.Session with timeouts and jittered retries.
+
+Compare per-query client construction against the shared client with:
+
+    python -m nrc_search.clients "stress corrosion cracking" --runs 5
+"""
+import argparse
+import asyncio
+import datetime
+import email.utils
+import json
+import random
+import statistics
+import threading
+import time
+
+from . import config
+from .admission import get_scheduler
+from .context import count_tokens
+from .tracing import annotate, span
+
+
+# --- LlamaCloud Index ---
+def _build_http_clients():
+    """Create sync/async httpx clients with a bounded keep-alive pool."""
+    import httpx
+
+    limits = httpx.Limits(
+        max_connections=config.LLAMA_CLOUD_POOL_SIZE,
+        max_keepalive_connections=config.LLAMA_CLOUD_POOL_SIZE,
+        keepalive_expiry=config.LLAMA_CLOUD_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(config.LLAMA_CLOUD_TIMEOUT, connect=config.LLAMA_CLOUD_CONNECT_TIMEOUT)
+    return httpx.Client(limits=limits, timeout=timeout), httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+def _close_http_clients(http_client, async_http_client):
+    """Close both pools; the async one on this thread's running loop, or on a short-lived one."""
+    try:
+        http_client.close()
+    except Exception:
+        pass
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    try:
+        if loop is None:
+            asyncio.run(async_http_client.aclose())
+        else:
+            loop.create_task(async_http_client.aclose())
+    except Exception:
+        pass
+
+
+def build_llama_cloud_index(httpx_client=None, async_httpx_client=None):
+    """Create a LlamaCloudIndex for the configured "nrc" pipeline."""
+    from llama_cloud_services import LlamaCloudIndex
+
+    kwargs = {
+        "name": config.LLAMA_CLOUD_INDEX_NAME,
+        "project_name": config.LLAMA_CLOUD_PROJECT_NAME,
+        "organization_id": config.LLAMA_CLOUD_ORGANIZATION_ID,
+        "api_key": config.LLAMA_CLOUD_API_KEY,
+    }
+    if config.LLAMA_CLOUD_BASE_URL:
+        kwargs["base_url"] = config.LLAMA_CLOUD_BASE_URL
+    if httpx_client is not None:
+        kwargs["httpx_client"] = httpx_client
+    if async_httpx_client is not None:
+        kwargs["async_httpx_client"] = async_httpx_client
+    return LlamaCloudIndex(**kwargs)
+
+
+class SharedRetriever:
+    """Thread-safe LlamaCloud retriever that is built once and rebuilt on failure."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._http_clients = None
+        self._retrievers = {}
+        self._generation = 0
+        self._connects = 0
+        self._reconnects = 0
+        self._last_success = None
+
+    def _connect(self):
+        """Build the index and its connection pool. Caller must hold the lock."""
+        self._http_clients = _build_http_clients()
+        self._index = build_llama_cloud_index(*self._http_clients)
+        self._retrievers = {}
+        self._generation += 1
+        self._connects += 1
+
+    def _close(self):
+        """Drop the current index and close its pool. Caller must hold the lock."""
+        if self._http_clients:
+            _close_http_clients(*self._http_clients)
+        self._index = None
+        self._http_clients = None
+        self._retrievers = {}
+
+    def _get_retriever(self, similarity_top_k: int, filters=None):
+        with self._lock:
+            if self._index is None:
+                self._connect()
+            if filters:  # too many combinations to keep; building a retriever is cheap
+                return self._index.as_retriever(similarity_top_k=similarity_top_k, filters=filters), self._generation
+            retriever = self._retrievers.get(similarity_top_k)
+            if retriever is None:
+                retriever = self._index.as_retriever(similarity_top_k=similarity_top_k)
+                self._retrievers[similarity_top_k] = retriever
+            return retriever, self._generation
+
+    def _reconnect(self, failed_generation: int):
+        """Rebuild the index unless another thread already replaced it."""
+        with self._lock:
+            if self._generation == failed_generation:
+                self._close()
+                self._connect()
+                self._reconnects += 1
+
+    def retrieve(self, query: str, similarity_top_k: int = None, filters=None):
+        """Retrieve nodes for a query, reconnecting and retrying once on failure.
+
+        filters (SearchFilters) are applied to a wider candidate set, or sent as
+        LlamaCloud metadata filters when LLAMA_CLOUD_FILTER_PUSHDOWN is on. A
+        pushed-down query that finds nothing (e.g. chunks without that metadata)
+        is retried with client-side filtering.
+        """
+        similarity_top_k = similarity_top_k or config.SIMILARITY_TOP_K
+        pushdown = filters.to_llama_filters() if filters and config.LLAMA_CLOUD_FILTER_PUSHDOWN else None
+        if pushdown is not None:
+            nodes = self._retrieve(query, similarity_top_k, pushdown)
+            if nodes:
+                return nodes
+            annotate(filter_pushdown="empty")
+        if not filters:
+            return self._retrieve(query, similarity_top_k)
+        nodes = self._retrieve(query, similarity_top_k * config.FILTER_OVERFETCH)
+        return [node for node in nodes if filters.matches(node.node.metadata)][:similarity_top_k]
+
+    def _retrieve(self, query: str, similarity_top_k: int, pushdown=None):
+        retriever, generation = self._get_retriever(similarity_top_k, pushdown)
+        try:
+            nodes = retriever.retrieve(query)
+        except Exception:
+            self._reconnect(generation)
+            retriever, _ = self._get_retriever(similarity_top_k, pushdown)
+            nodes = retriever.retrieve(query)
+        self._last_success = time.time()
+        return nodes
+
+    def health_check(self, probe_query: str = "health check") -> bool:
+        """Run a 1-node probe retrieval; reconnect if it fails."""
+        try:
+            self.retrieve(probe_query, similarity_top_k=1)
+            return True
+        except Exception:
+            return False
+
+    def reset(self):
+        """Close the shared client so the next call builds a fresh one."""
+        with self._lock:
+            self._close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "connected": self._index is not None,
+                "connects": self._connects,
+                "reconnects": self._reconnects,
+                "cached_retrievers": sorted(self._retrievers),
+                "last_success": self._last_success,
+            }
+
+
+_shared_retriever = None
+_shared_retriever_lock = threading.Lock()
+
+
+def get_shared_retriever() -> SharedRetriever:
+    """Return the process-wide retriever, creating it on first use."""
+    global _shared_retriever
+    if _shared_retriever is None:
+        with _shared_retriever_lock:
+            if _shared_retriever is None:
+                _shared_retriever = SharedRetriever()
+    return _shared_retriever
+
+
+def get_retriever():
+    """Return the configured retrieval backend (anything with .retrieve(query, similarity_top_k, filters))."""
+    if config.RETRIEVAL_BACKEND == "local":
+        from .local_index import get_local_retriever
+        return get_local_retriever()
+    return get_shared_retriever()
+
+
+# --- Core42 Chat Completions ---
+class Core42Error(Exception):
+    """Raised when the Core42 API cannot produce a completion."""
+
+
+def parse_retry_after(value: str):
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class Core42Client:
+    """Pooled Core42 client with connect/read timeouts and jittered retries."""
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, api_url: str = None, api_key: str = None, pool_size: int = None,
+                 connect_timeout: float = None, read_timeout: float = None, max_retries: int = None,
+                 backoff_base: float = None, backoff_max: float = None, retry_after_max: float = None):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.api_url = api_url or config.CORE42_API_URL
+        self.api_key = api_key if api_key is not None else config.CORE42_API_KEY
+        self.timeout = (connect_timeout or config.CORE42_CONNECT_TIMEOUT, read_timeout or config.CORE42_READ_TIMEOUT)
+        self.max_retries = config.CORE42_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base if backoff_base is not None else config.CORE42_BACKOFF_BASE
+        self.backoff_max = backoff_max if backoff_max is not None else config.CORE42_BACKOFF_MAX
+        self.retry_after_max = retry_after_max if retry_after_max is not None else config.CORE42_RETRY_AFTER_MAX
+
+        pool_size = pool_size or config.CORE42_POOL_SIZE
+        self._requests = requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        })
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "attempts": 0, "retries": 0, "failures": 0}
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def backoff_delay(self, attempt: int, retry_after: float = None) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After if given."""
+        if retry_after is not None:
+            return min(retry_after, self.retry_after_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def admit(self, messages: list):
+        """Wait for the shared scheduler to admit a call with these messages. Returns its ticket."""
+        estimate = sum(count_tokens(m["content"]) for m in messages) + config.CORE42_EXPECTED_COMPLETION_TOKENS
+        with span("core42_queue", estimated_tokens=estimate) as queue_span:
+            ticket = get_scheduler().acquire(estimate)
+            queue_span.set(queued=ticket.wait_seconds > 0.01)
+        return ticket
+
+    def post(self, payload: dict, stream: bool = False):
+        """POST a chat-completions payload, retrying 429/5xx and connection errors."""
+        self._count("requests")
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            self._count("attempts")
+            retry_after = None
+            response = None
+            try:
+                response = self.session.post(self.api_url, json=payload, timeout=self.timeout, stream=stream)
+            except (self._requests.ConnectionError, self._requests.Timeout) as e:
+                last_error = e
+            else:
+                if response.status_code not in self.RETRY_STATUSES:
+                    try:
+                        response.raise_for_status()
+                    except self._requests.HTTPError as e:
+                        self._count("failures")
+                        raise Core42Error(str(e)) from e
+                    return response
+                last_error = Core42Error(f"HTTP {response.status_code} from Core42")
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                response.close()
+
+            if attempt < self.max_retries:
+                self._count("retries")
+                delay = self.backoff_delay(attempt, retry_after)
+                if response is not None and response.status_code == 429:
+                    get_scheduler().backoff(delay)  # hold every other session's calls too
+                time.sleep(delay)
+
+        self._count("failures")
+        raise Core42Error(f"Core42 request failed after {self.max_retries + 1} attempts: {last_error}") from last_error
+
+    def chat(self, messages: list, model: str = None, temperature: float = None) -> str:
+        """Return the assistant message content for a non-streaming completion."""
+        payload = {
+            "model": model or config.CORE42_MODEL,
+            "stream": False,
+            "messages": messages,
+            "temperature": config.CORE42_TEMPERATURE if temperature is None else temperature,
+        }
+        ticket = self.admit(messages)
+        response = self.post(payload)
+        body = response.json()
+        usage = body.get("usage") or {}
+        if usage:
+            annotate(prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"))
+        content = body["choices"][0]["message"]["content"]
+        get_scheduler().settle(ticket, usage.get("total_tokens") or ticket.tokens - config.CORE42_EXPECTED_COMPLETION_TOKENS + count_tokens(content))
+        return content
+
+    def stream_chat(self, messages: list, model: str = None, temperature: float = None):
+        """Yield assistant content fragments from a streamed (SSE) completion."""
+        payload = {
+            "model": model or config.CORE42_MODEL,
+            "stream": True,
+            "messages": messages,
+            "temperature": config.CORE42_TEMPERATURE if temperature is None else temperature,
+        }
+        ticket = self.admit(messages)
+        response = self.post(payload, stream=True)
+        if response.encoding is None:
+            response.encoding = "utf-8"
+        completion_tokens = 0
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                if choices:
+                    content = (choices[0].get("delta") or {}).get("content")
+                    if content:
+                        completion_tokens += count_tokens(content)
+                        yield content
+        get_scheduler().settle(ticket, ticket.tokens - config.CORE42_EXPECTED_COMPLETION_TOKENS + completion_tokens)
+
+
+_core42_client = None
+_core42_client_lock = threading.Lock()
+
+
+def get_core42_client() -> Core42Client:
+    """Return the process-wide Core42 client, creating it on first use."""
+    global _core42_client
+    if _core42_client is None:
+        with _core42_client_lock:
+            if _core42_client is None:
+                _core42_client = Core42Client()
+    return _core42_client
+
+
+# --- Latency Comparison ---
+def compare_client_reuse(query: str, runs: int = 5, similarity_top_k: int = None) -> dict:
+    """Time per-query client construction against the shared retriever."""
+    similarity_top_k = similarity_top_k or config.SIMILARITY_TOP_K
+
+    per_query_ms = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        build_llama_cloud_index().as_retriever(similarity_top_k=similarity_top_k).retrieve(query)
+        per_query_ms.append((time.perf_counter() - start) * 1000)
+
+    shared = get_shared_retriever()
+    shared.retrieve(query, similarity_top_k=similarity_top_k)  # warm the pool
+    shared_ms = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        shared.retrieve(query, similarity_top_k=similarity_top_k)
+        shared_ms.append((time.perf_counter() - start) * 1000)
+
+    per_query_median = statistics.median(per_query_ms)
+    shared_median = statistics.median(shared_ms)
+    return {
+        "runs": runs,
+        "per_query_client_ms": {"median": round(per_query_median, 1), "mean": round(statistics.mean(per_query_ms), 1)},
+        "shared_client_ms": {"median": round(shared_median, 1), "mean": round(statistics.mean(shared_ms), 1)},
+        "saved_ms_per_query": round(per_query_median - shared_median, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report latency saved by reusing the LlamaCloud client.")
+    parser.add_argument("query", help="Query to retrieve for")
+    parser.add_argument("--runs", type=int, default=5, help="Timed retrievals per mode")
+    args = parser.parse_args()
+    print(json.dumps(compare_client_reuse(args.query, runs=args.runs), indent=2))
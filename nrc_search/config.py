@@ -0,0 +1,171 @@
+"""Runtime settings for the NRC search pipeline.
+
+Every value can be overridden with an environment variable of the same name.
+"""
+import os
+
+
+def _env_str(name: str, default: str) -> str:
+    return os.environ.get(name, default)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATA_FOLDER = _env_str("DATA_FOLDER", os.path.join(PROJECT_ROOT, "Data"))
+DOC_INDEX_REFRESH_SECONDS = _env_float("DOC_INDEX_REFRESH_SECONDS", 5.0)
+
+# --- LlamaCloud Index ---
+LLAMA_CLOUD_INDEX_NAME = _env_str("LLAMA_CLOUD_INDEX_NAME", "nrc")
+LLAMA_CLOUD_PROJECT_NAME = _env_str("LLAMA_CLOUD_PROJECT_NAME", "Default")
+LLAMA_CLOUD_ORGANIZATION_ID = _env_str("LLAMA_CLOUD_ORGANIZATION_ID", "c9e1176c-fd12-4819-bfd7-fc23f80ab9b5")
+LLAMA_CLOUD_API_KEY = _env_str("LLAMA_CLOUD_API_KEY", "llx-7GWrpifAsJ6UJYIPoVa9jl2tSRwmeIOpbi4Hcj5ynctYzJ4B")
+LLAMA_CLOUD_BASE_URL = _env_str("LLAMA_CLOUD_BASE_URL", "")  # empty = LlamaCloud default
+
+SIMILARITY_TOP_K = _env_int("SIMILARITY_TOP_K", 5)
+
+# --- Retrieval Backend ---
+RETRIEVAL_BACKEND = _env_str("RETRIEVAL_BACKEND", "llamacloud")  # "llamacloud" or "local"
+LOCAL_INDEX_DIR = _env_str("LOCAL_INDEX_DIR", os.path.join(PROJECT_ROOT, ".cache", "local_index"))
+LOCAL_CHUNK_CHARS = _env_int("LOCAL_CHUNK_CHARS", 1500)
+LOCAL_CHUNK_OVERLAP = _env_int("LOCAL_CHUNK_OVERLAP", 200)
+LOCAL_DENSE = _env_int("LOCAL_DENSE", 1) == 1
+LOCAL_DENSE_WEIGHT = _env_float("LOCAL_DENSE_WEIGHT", 0.3)
+EMBEDDING_DIM = _env_int("EMBEDDING_DIM", 256)
+
+# --- Two-Stage Retrieval (retrieve wide, rerank locally) ---
+RERANK_ENABLED = _env_int("RERANK_ENABLED", 0) == 1
+RERANK_CANDIDATES = _env_int("RERANK_CANDIDATES", 30)
+RERANK_TOP_N = _env_int("RERANK_TOP_N", 5)
+
+# --- Metadata Filters (document type, year range, identifiers) ---
+# 1 = send filters to LlamaCloud as metadata filters; only for an index uploaded by ingest with
+# doc_type/year/document_id metadata (the hand-filled "nrc" index has none). 0 = filter results client-side
+LLAMA_CLOUD_FILTER_PUSHDOWN = _env_int("LLAMA_CLOUD_FILTER_PUSHDOWN", 0) == 1
+FILTER_OVERFETCH = _env_int("FILTER_OVERFETCH", 4)  # candidate multiplier when filtering client-side
+
+# --- Multi-Query Fan-Out (sub-queries fused with reciprocal rank fusion) ---
+FANOUT_ENABLED = _env_int("FANOUT_ENABLED", 0) == 1
+FANOUT_MAX_QUERIES = _env_int("FANOUT_MAX_QUERIES", 5)  # including the original question
+FANOUT_RRF_K = _env_int("FANOUT_RRF_K", 60)
+FANOUT_WORKERS = _env_int("FANOUT_WORKERS", 8)
+
+# --- Prompt Context ---
+CONTEXT_TOKEN_BUDGET = _env_int("CONTEXT_TOKEN_BUDGET", 6000)
+CONTEXT_METADATA_FIELDS = [f.strip() for f in _env_str(
+    "CONTEXT_METADATA_FIELDS", "document_name,file_name,section_number,page_label").split(",") if f.strip()]
+CONTEXT_MIN_OVERLAP = _env_int("CONTEXT_MIN_OVERLAP", 40)
+
+# --- Ingestion ---
+INGEST_WORKERS = _env_int("INGEST_WORKERS", os.cpu_count() or 4)
+INGEST_UPLOAD_WORKERS = _env_int("INGEST_UPLOAD_WORKERS", 4)
+
+# --- Single-Flight Deduplication ---
+SINGLE_FLIGHT_ENABLED = _env_int("SINGLE_FLIGHT_ENABLED", 1) == 1
+SINGLE_FLIGHT_TIMEOUT = _env_float("SINGLE_FLIGHT_TIMEOUT", 180.0)  # longest a session waits on an identical search
+
+# --- Batch Runner ---
+BATCH_CONCURRENCY = _env_int("BATCH_CONCURRENCY", 8)
+
+# --- HTTP API (python -m nrc_search.api) ---
+API_HOST = _env_str("API_HOST", "127.0.0.1")
+API_PORT = _env_int("API_PORT", 8600)
+API_WORKERS = _env_int("API_WORKERS", 16)  # searches running at once
+API_MAX_PENDING = _env_int("API_MAX_PENDING", 64)  # searches accepted (running or waiting) before answering 503
+API_REQUEST_TIMEOUT = _env_float("API_REQUEST_TIMEOUT", 120.0)
+API_KEEPALIVE_SECONDS = _env_float("API_KEEPALIVE_SECONDS", 240.0)  # retrieval probe interval keeping pools warm; 0 = off
+
+# --- Shared HTTP Connection Pool (LlamaCloud) ---
+LLAMA_CLOUD_POOL_SIZE = _env_int("LLAMA_CLOUD_POOL_SIZE", 20)
+LLAMA_CLOUD_KEEPALIVE_EXPIRY = _env_float("LLAMA_CLOUD_KEEPALIVE_EXPIRY", 60.0)
+LLAMA_CLOUD_CONNECT_TIMEOUT = _env_float("LLAMA_CLOUD_CONNECT_TIMEOUT", 10.0)
+LLAMA_CLOUD_TIMEOUT = _env_float("LLAMA_CLOUD_TIMEOUT", 60.0)
+
+# --- Core42 Chat Completions ---
+CORE42_API_KEY = _env_str("CORE42_API_KEY", "81052a984bee43ee865f296e5a88e5f1")
+CORE42_API_URL = _env_str("CORE42_API_URL", "https://api.core42.ai/v1/chat/completions")
+CORE42_MODEL = _env_str("CORE42_MODEL", "gpt-4o")
+CORE42_TEMPERATURE = _env_float("CORE42_TEMPERATURE", 0.1)
+
+CORE42_POOL_SIZE = _env_int("CORE42_POOL_SIZE", 20)
+CORE42_CONNECT_TIMEOUT = _env_float("CORE42_CONNECT_TIMEOUT", 5.0)
+CORE42_READ_TIMEOUT = _env_float("CORE42_READ_TIMEOUT", 120.0)
+CORE42_MAX_RETRIES = _env_int("CORE42_MAX_RETRIES", 3)
+CORE42_BACKOFF_BASE = _env_float("CORE42_BACKOFF_BASE", 0.5)
+CORE42_BACKOFF_MAX = _env_float("CORE42_BACKOFF_MAX", 20.0)
+CORE42_RETRY_AFTER_MAX = _env_float("CORE42_RETRY_AFTER_MAX", 60.0)
+
+# Admission control; set these a little under the API key's quota (0 = unlimited)
+CORE42_RPM = _env_float("CORE42_RPM", 60)
+CORE42_TPM = _env_float("CORE42_TPM", 150000)
+CORE42_MAX_QUEUE = _env_int("CORE42_MAX_QUEUE", 200)  # calls waiting beyond this are refused
+CORE42_QUEUE_TIMEOUT = _env_float("CORE42_QUEUE_TIMEOUT", 120.0)  # longest a call waits for admission
+CORE42_EXPECTED_COMPLETION_TOKENS = _env_int("CORE42_EXPECTED_COMPLETION_TOKENS", 800)  # reserved until usage is known
+
+# --- Excerpt Grounding (GPT-4o's quotes located in the retrieved chunks) ---
+GROUNDING_MODE = _env_str("GROUNDING_MODE", "flag")  # "flag" unverified excerpts, "drop" them, or "off"
+GROUNDING_MIN_SIMILARITY = _env_float("GROUNDING_MIN_SIMILARITY", 0.85)  # share of an excerpt's words aligned in order
+GROUNDING_MIN_WORDS = _env_int("GROUNDING_MIN_WORDS", 4)  # shorter excerpts are grounded only by a verbatim match
+
+# --- Query Result Cache ---
+CACHE_ENABLED = _env_int("CACHE_ENABLED", 1) == 1
+CACHE_PATH = _env_str("CACHE_PATH", os.path.join(PROJECT_ROOT, ".cache", "query_cache.sqlite3"))
+CACHE_MEMORY_ENTRIES = _env_int("CACHE_MEMORY_ENTRIES", 256)
+CACHE_DISK_ENTRIES = _env_int("CACHE_DISK_ENTRIES", 10000)
+CACHE_TTL_SECONDS = _env_float("CACHE_TTL_SECONDS", 7 * 24 * 3600)
+INDEX_VERSION = _env_str("INDEX_VERSION", "")  # part of every cache key; change it to orphan old entries
+
+# --- Similar-Question Cache (reuses the cached answer of a paraphrased earlier question) ---
+SEMANTIC_CACHE_ENABLED = _env_int("SEMANTIC_CACHE_ENABLED", 0) == 1
+SEMANTIC_CACHE_THRESHOLD = _env_float("SEMANTIC_CACHE_THRESHOLD", 0.8)  # cosine similarity of query embeddings
+SEMANTIC_CACHE_ENTRIES = _env_int("SEMANTIC_CACHE_ENTRIES", 5000)
+SEMANTIC_CACHE_PATH = _env_str("SEMANTIC_CACHE_PATH", os.path.join(PROJECT_ROOT, ".cache", "semantic_cache.sqlite3"))
+SEMANTIC_CACHE_AUDIT_ROWS = _env_int("SEMANTIC_CACHE_AUDIT_ROWS", 10000)  # reuse records kept for auditing
+
+# --- Cache Warm-Up (example and popular questions answered ahead of users) ---
+WARMUP_ENABLED = _env_int("WARMUP_ENABLED", 1) == 1
+WARMUP_DELAY_SECONDS = _env_float("WARMUP_DELAY_SECONDS", 60.0)  # after startup, before the first warm-up search
+WARMUP_INTERVAL_SECONDS = _env_float("WARMUP_INTERVAL_SECONDS", 15.0)  # at least this long between warm-up searches
+WARMUP_REFRESH_SECONDS = _env_float("WARMUP_REFRESH_SECONDS", 6 * 3600)  # rerun to pick up new popular questions
+WARMUP_MAX_QUERIES = _env_int("WARMUP_MAX_QUERIES", 50)  # examples plus the most frequent logged questions
+WARMUP_IDLE_SECONDS = _env_float("WARMUP_IDLE_SECONDS", 30.0)  # no live GPT-4o call for this long before warming
+WARMUP_RESERVE = _env_float("WARMUP_RESERVE", 0.5)  # share of the RPM/TPM buckets warm-up never touches
+# Opt-in: keeps question text on the server (no user or session); without it only the examples are warmed
+QUERY_LOG_ENABLED = _env_int("QUERY_LOG_ENABLED", 0) == 1
+QUERY_LOG_PATH = _env_str("QUERY_LOG_PATH", os.path.join(PROJECT_ROOT, ".cache", "query_log.sqlite3"))
+QUERY_LOG_MIN_COUNT = _env_int("QUERY_LOG_MIN_COUNT", 3)  # a logged question is warmed once asked this often
+QUERY_LOG_ENTRIES = _env_int("QUERY_LOG_ENTRIES", 5000)
+
+# --- PDF Downloads ---
+PDF_CACHE_MB = _env_int("PDF_CACHE_MB", 256)  # PDF bytes kept in memory for downloads, shared by all sessions
+PAGE_CACHE_DIR = _env_str("PAGE_CACHE_DIR", os.path.join(PROJECT_ROOT, ".cache", "pages"))  # cited-page PDFs and previews
+PAGE_CACHE_MB = _env_int("PAGE_CACHE_MB", 512)
+PAGE_EXTRACT_MAX_PAGES = _env_int("PAGE_EXTRACT_MAX_PAGES", 3)  # pages cut out per reference
+PAGE_PREVIEW_ZOOM = _env_float("PAGE_PREVIEW_ZOOM", 1.5)  # PNG previews (needs pymupdf) at 108 dpi
+
+# --- Chunk Store ---
+CHUNK_STORE_MB = _env_int("CHUNK_STORE_MB", 64)  # retrieved chunk text kept once per process for all sessions' results
+
+# --- Startup ---
+STARTUP_PREWARM = _env_int("STARTUP_PREWARM", 1) == 1  # build the PDF index and import the retrieval client in the background
+STARTUP_PROFILE = _env_int("STARTUP_PROFILE", 0) == 1  # log time from process start to imports, first paint and end of first run
+STARTUP_BUDGET_SECONDS = _env_float("STARTUP_BUDGET_SECONDS", 5.0)  # time-to-first-paint the startup profile must stay under
+
+# --- Tracing and Metrics ---
+DIAGNOSTICS_ENABLED = _env_int("DIAGNOSTICS_ENABLED", 1) == 1  # per-query timing expander in the dashboard
+METRICS_HOST = _env_str("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = _env_int("METRICS_PORT", 9464)  # 0 disables the /metrics endpoint
+METRICS_WINDOW = _env_int("METRICS_WINDOW", 2048)  # recent observations per stage used for p50/p95/p99
@@ -0,0 +1,131 @@
+"""Token-budgeted assembly of the CONTEXT block sent to GPT-4o.
+
+Chunks from the same document and section are deduplicated (one contained
+in another) or merged where one ends with the text the next begins with.
+Only the metadata fields the prompt asks about are sent, and sources are
+added in rank order until the token budget is used up.
+"""
+import math
+import re
+
+from . import config
+
+
+MIN_SOURCE_TOKENS = 50  # don't start a source that would be cut to less than this
+
+_encoder = None
+_encoder_loaded = False
+
+
+def count_tokens(text: str) -> int:
+    """GPT-4o token count via tiktoken when installed, otherwise an estimate."""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoder = None
+        _encoder_loaded = True
+    if _encoder is not None:
+        return len(_encoder.encode(text, disallowed_special=()))
+    # Roughly one token per word or punctuation mark, plus long words splitting in two
+    pieces = re.findall(r"\w+|[^\w\s]", text)
+    return sum(1 + len(piece) // 8 for piece in pieces)
+
+
+def legacy_context(nodes: list) -> str:
+    """The context string as it was built before this module (full metadata repr per chunk)."""
+    parts = []
+    for i, node_with_score in enumerate(nodes):
+        parts.append(f"\n--- Source {i+1} ---\nMETADATA: {node_with_score.node.metadata}\nCONTENT: {node_with_score.node.get_content()}\n")
+    return "".join(parts)
+
+
+def _merge_overlap(first: str, second: str, min_overlap: int):
+    """Return first+second joined on their overlap, or None if they do not overlap."""
+    probe = second[:min_overlap]
+    if len(probe) < min_overlap:
+        return None
+    start = first.find(probe)
+    while start != -1:
+        tail = first[start:]
+        if second.startswith(tail):
+            return first + second[len(tail):]
+        start = first.find(probe, start + 1)
+    return None
+
+
+def _group_key(metadata: dict):
+    document = metadata.get("document_name") or metadata.get("file_name") or metadata.get("file_path")
+    return document, metadata.get("section_number")
+
+
+def build_context(nodes: list, token_budget: int = None, metadata_fields=None, min_overlap: int = None):
+    """Build the CONTEXT text for the retrieved nodes. Returns (context_text, stats)."""
+    token_budget = token_budget or config.CONTEXT_TOKEN_BUDGET
+    metadata_fields = metadata_fields or config.CONTEXT_METADATA_FIELDS
+    min_overlap = min_overlap or config.CONTEXT_MIN_OVERLAP
+
+    # Group by document and section, keeping the rank order of each group's best chunk
+    groups = {}
+    for node_with_score in nodes:
+        metadata = node_with_score.node.metadata or {}
+        groups.setdefault(_group_key(metadata), []).append((node_with_score.node.get_content(), metadata))
+
+    sources, duplicates, merges = [], 0, 0
+    for (document, section), members in groups.items():
+        texts = []
+        for text, metadata in members:
+            text = text.strip()
+            if not text:
+                continue
+            if any(text in kept for kept in texts):
+                duplicates += 1
+                continue
+            for i, kept in enumerate(texts):
+                merged = _merge_overlap(kept, text, min_overlap) or _merge_overlap(text, kept, min_overlap)
+                if merged is None and kept in text:
+                    merged = text
+                if merged is not None:
+                    texts[i] = merged
+                    merges += 1
+                    break
+            else:
+                texts.append(text)
+        fields = {key: members[0][1][key] for key in metadata_fields if members[0][1].get(key) not in (None, "")}
+        for text in texts:
+            sources.append((fields, text))
+
+    parts, used, truncated, dropped = [], 0, 0, 0
+    for i, (fields, text) in enumerate(sources):
+        header = f"\n--- Source {i+1} ---\n"
+        if fields:
+            header += "".join(f"{key}: {value}\n" for key, value in fields.items())
+        header_tokens = count_tokens(header) + 2
+        remaining = token_budget - used - header_tokens
+        if remaining < MIN_SOURCE_TOKENS:
+            dropped = len(sources) - i
+            break
+        text_tokens = count_tokens(text)
+        if text_tokens > remaining:
+            # Cut proportionally by characters; good enough for a budget guard
+            text = text[:max(0, math.floor(len(text) * (remaining - 4) / text_tokens))].rstrip() + " ..."
+            text_tokens = count_tokens(text)
+            truncated += 1
+        parts.append(f"{header}CONTENT: {text}\n")
+        used += header_tokens + text_tokens
+
+    context_text = "".join(parts)
+    stats = {
+        "chunks_in": len(nodes),
+        "sources_sent": len(parts),
+        "duplicates_dropped": duplicates,
+        "chunks_merged": merges,
+        "sources_truncated": truncated,
+        "sources_dropped": dropped,
+        "tokens_before": count_tokens(legacy_context(nodes)),
+        "tokens_after": count_tokens(context_text),
+        "token_budget": token_budget,
+    }
+    return context_text, stats
@@ -0,0 +1,252 @@
+"""In-memory index of the PDFs under the Data folder.
+
+Built once per process, then kept current by re-listing only directories
+whose mtime changed. Lookups by file name, NRC document identifier (e.g.
+"IN 2023-01", "GL 89-13") or normalized title are dictionary hits; anything
+else falls back to character-trigram candidates ranked deterministically.
+"""
+import os
+import re
+import threading
+import time
+
+from . import config
+
+
+DOCUMENT_TYPES = ("GL", "IN", "BL", "RIS", "IEB", "IEN", "IEC", "AL", "NUREG")
+
+_ID_PATTERN = (
+    r"\b(" + "|".join(DOCUMENT_TYPES) + r")[\s_-]*(\d{2,4})[\s_-]+(\d{1,3})(?:[\s_,-]*(?i:supp(?:lement)?|s)[\s_.-]*(\d{1,2}))?\b"
+)
+_DOCUMENT_ID = re.compile(_ID_PATTERN, re.IGNORECASE)  # file names, e.g. "in_2023-1.pdf"
+# In prose the type must be in capitals, or "what is in 2019 5 plants" would cite "IN 2019-05"
+_DOCUMENT_ID_IN_TEXT = re.compile(_ID_PATTERN)
+
+
+def _canonical_id(match) -> str:
+    doc_type, year, number, supplement = match.groups()
+    doc_id = f"{doc_type.upper()} {year}-{int(number):02d}"
+    if supplement:
+        doc_id += f" S{int(supplement)}"
+    return doc_id
+
+
+def normalize_document_id(name: str):
+    """Return the canonical identifier in a name (e.g. "in_2023-1.pdf" -> "IN 2023-01"), or None."""
+    match = _DOCUMENT_ID.search(name.replace(".pdf", " ").replace(".PDF", " "))
+    return _canonical_id(match) if match else None
+
+
+def document_year(document_id: str):
+    """Four-digit year of an identifier such as "GL 89-13" (1989) or "IN 2023-01"."""
+    if not document_id:
+        return None
+    year = int(document_id.split(" ")[1].split("-")[0])
+    if year < 100:
+        year += 1900 if year > 50 else 2000
+    return year
+
+
+def find_document_ids(text: str, any_case: bool = False) -> list:
+    """All canonical identifiers mentioned in a piece of text, in order of appearance.
+
+    The type must be upper case ("IN 2023-01") unless any_case is set, as for file names or a field that
+    only holds document numbers.
+    """
+    pattern = _DOCUMENT_ID if any_case else _DOCUMENT_ID_IN_TEXT
+    return list(dict.fromkeys(_canonical_id(m) for m in pattern.finditer(text.replace(".pdf", " "))))
+
+
+def remove_document_ids(text: str) -> str:
+    """The text with every document identifier blanked out."""
+    return _DOCUMENT_ID_IN_TEXT.sub(" ", text)
+
+
+def normalize_name(name: str) -> str:
+    """Lower-case a title or file name and reduce it to alphanumeric words."""
+    stem = name.strip()
+    if stem.lower().endswith(".pdf"):
+        stem = stem[:-4]
+    return " ".join(re.findall(r"[a-z0-9]+", stem.casefold()))
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class DocumentIndex:
+    """Maps file names, document identifiers and normalized titles to PDF paths."""
+
+    def __init__(self, data_folder: str, refresh_interval: float = None):
+        self.data_folder = os.path.abspath(data_folder)
+        self.refresh_interval = config.DOC_INDEX_REFRESH_SECONDS if refresh_interval is None else refresh_interval
+        self._lock = threading.RLock()
+        self._dir_mtimes = {}
+        self._dir_files = {}
+        self._by_filename = {}
+        self._by_id = {}
+        self._by_name = {}
+        self._names = {}
+        self._gram_counts = {}
+        self._trigrams = {}
+        self._last_refresh = 0.0
+        self.refresh()
+
+    # --- Maintenance ---
+    def refresh(self) -> int:
+        """Re-list directories whose mtime changed. Returns how many were re-listed."""
+        with self._lock:
+            pending = list(self._dir_mtimes) or [self.data_folder]
+            seen, relisted = set(), 0
+            while pending:
+                folder = pending.pop()
+                if folder in seen:
+                    continue
+                seen.add(folder)
+                try:
+                    mtime = os.stat(folder).st_mtime
+                except OSError:
+                    self._drop_tree(folder)
+                    continue
+                if self._dir_mtimes.get(folder) == mtime:
+                    continue
+                pending.extend(self._list_directory(folder, mtime))
+                relisted += 1
+            self._last_refresh = time.monotonic()
+            return relisted
+
+    def _list_directory(self, folder: str, mtime: float) -> list:
+        """(Re)index the PDFs directly inside one folder; return its subdirectories."""
+        subdirs, pdfs = [], []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(".pdf"):
+                        pdfs.append(entry.path)
+        except OSError:
+            return []
+        for path in self._dir_files.get(folder, []):
+            self._remove_path(path)
+        for path in pdfs:
+            self._add_path(path)
+        self._dir_files[folder] = pdfs
+        self._dir_mtimes[folder] = mtime
+        # Forget subdirectories that disappeared from this folder
+        live = set(subdirs)
+        for known in [d for d in self._dir_mtimes if os.path.dirname(d) == folder]:
+            if known not in live:
+                self._drop_tree(known)
+        return subdirs
+
+    def _drop_directory(self, folder: str):
+        for path in self._dir_files.pop(folder, []):
+            self._remove_path(path)
+        self._dir_mtimes.pop(folder, None)
+
+    def _drop_tree(self, folder: str):
+        prefix = folder.rstrip(os.sep) + os.sep
+        for known in [d for d in self._dir_mtimes if d == folder or d.startswith(prefix)]:
+            self._drop_directory(known)
+
+    def _add_path(self, path: str):
+        file_name = os.path.basename(path)
+        name = normalize_name(file_name)
+        self._by_filename.setdefault(file_name.casefold(), []).append(path)
+        self._by_name.setdefault(name, []).append(path)
+        doc_id = normalize_document_id(file_name)
+        if doc_id:
+            self._by_id.setdefault(doc_id, []).append(path)
+        self._names[path] = name
+        grams = _trigrams(name)
+        self._gram_counts[path] = len(grams)
+        for gram in grams:
+            self._trigrams.setdefault(gram, set()).add(path)
+
+    def _remove_path(self, path: str):
+        file_name = os.path.basename(path)
+        name = self._names.pop(path, normalize_name(file_name))
+        self._gram_counts.pop(path, None)
+        for table, key in ((self._by_filename, file_name.casefold()), (self._by_name, name),
+                           (self._by_id, normalize_document_id(file_name))):
+            paths = table.get(key)
+            if paths and path in paths:
+                paths.remove(path)
+                if not paths:
+                    del table[key]
+        for gram in _trigrams(name):
+            paths = self._trigrams.get(gram)
+            if paths:
+                paths.discard(path)
+                if not paths:
+                    del self._trigrams[gram]
+
+    def _maybe_refresh(self):
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            self.refresh()
+
+    # --- Lookup ---
+    def find(self, document_name: str, min_similarity: float = 0.5):
+        """Return the best matching PDF path for a document name, or None."""
+        if not document_name or not document_name.strip():
+            return None
+        self._maybe_refresh()
+        with self._lock:
+            file_name = document_name.strip()
+            if not file_name.lower().endswith(".pdf"):
+                file_name += ".pdf"
+            for table, key in ((self._by_filename, file_name.casefold()),
+                               (self._by_id, normalize_document_id(document_name)),
+                               (self._by_name, normalize_name(document_name))):
+                paths = table.get(key) if key else None
+                if paths:
+                    return min(paths)
+            ranked = self.rank(document_name, limit=1)
+            if ranked and (ranked[0][1] >= min_similarity or ranked[0][2]):
+                return ranked[0][0]
+            return None
+
+    def rank(self, document_name: str, limit: int = 5) -> list:
+        """Fuzzy candidates as (path, dice_similarity, name_contains_query), best first."""
+        query = normalize_name(document_name)
+        if not query:
+            return []
+        query_grams = _trigrams(query)
+        with self._lock:
+            shared = {}
+            for gram in query_grams:
+                for path in self._trigrams.get(gram, ()):
+                    shared[path] = shared.get(path, 0) + 1
+            scored = []
+            for path, count in shared.items():
+                similarity = 2 * count / (len(query_grams) + self._gram_counts[path])
+                scored.append((path, round(similarity, 4), query in self._names[path]))
+        scored.sort(key=lambda item: (not item[2], -item[1], len(item[0]), item[0]))
+        return scored[:limit]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "directories": len(self._dir_mtimes),
+                "files": len(self._names),
+                "identifiers": len(self._by_id),
+            }
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_document_index(data_folder: str = None) -> DocumentIndex:
+    """Return the process-wide index for a data folder, building it on first use."""
+    data_folder = os.path.abspath(data_folder or config.DATA_FOLDER)
+    index = _indexes.get(data_folder)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(data_folder)
+            if index is None:
+                index = DocumentIndex(data_folder)
+                _indexes[data_folder] = index
+    return index
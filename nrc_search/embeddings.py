@@ -0,0 +1,40 @@
+"""Dependency-free text embeddings using the hashing trick.
+
+Word unigrams, word bigrams and character trigrams are hashed into a fixed
+number of signed buckets and L2-normalized. This runs on CPU in
+microseconds and needs no model download, which suits air-gapped hosts.
+"""
+import math
+import zlib
+from array import array
+
+from . import config
+from .text import tokenize
+
+
+def _features(text: str) -> list:
+    words = tokenize(text)
+    features = list(words)
+    features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = f"#{word}#"
+        features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+def embed(text: str, dim: int = None) -> array:
+    """Return a unit-length float32 vector for a piece of text."""
+    dim = dim or config.EMBEDDING_DIM
+    vector = [0.0] * dim
+    for feature in _features(text):
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm:
+        vector = [v / norm for v in vector]
+    return array("f", vector)
+
+
+def cosine(a, b) -> float:
+    """Dot product of two unit vectors."""
+    return sum(x * y for x, y in zip(a, b))
@@ -0,0 +1,136 @@
+"""Multi-query retrieval: expand a question into sub-queries and fuse the results.
+
+Long compound questions retrieve poorly as one query. The question is
+expanded locally (no LLM call) into:
+- each NRC document identifier it mentions
+- its keywords, without the question phrasing
+- the question with common nuclear abbreviations spelled out
+- each clause of a compound question
+
+All sub-queries are retrieved concurrently and merged with reciprocal rank
+fusion, deduplicated by node id, so the added latency is about one
+retrieval rather than one per sub-query.
+"""
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config
+from .doc_index import find_document_ids
+from .text import tokenize
+
+
+logger = logging.getLogger(__name__)
+
+ABBREVIATIONS = {
+    "aoo": "anticipated operational occurrence",
+    "atws": "anticipated transient without scram",
+    "bwr": "boiling water reactor",
+    "cfr": "code of federal regulations",
+    "ecc": "emergency core cooling",
+    "eccs": "emergency core cooling system",
+    "edg": "emergency diesel generator",
+    "fac": "flow-accelerated corrosion",
+    "hpci": "high pressure coolant injection",
+    "igscc": "intergranular stress corrosion cracking",
+    "isi": "inservice inspection",
+    "ist": "inservice testing",
+    "loca": "loss-of-coolant accident",
+    "loop": "loss of offsite power",
+    "mov": "motor-operated valve",
+    "npsh": "net positive suction head",
+    "pwr": "pressurized water reactor",
+    "pwscc": "primary water stress corrosion cracking",
+    "rcic": "reactor core isolation cooling",
+    "rcp": "reactor coolant pump",
+    "rcs": "reactor coolant system",
+    "rhr": "residual heat removal",
+    "rpv": "reactor pressure vessel",
+    "scc": "stress corrosion cracking",
+    "sg": "steam generator",
+    "sgtr": "steam generator tube rupture",
+    "srv": "safety relief valve",
+    "ss": "stainless steel",
+}
+
+_ABBREVIATION = re.compile(r"\b(" + "|".join(ABBREVIATIONS) + r")\b", re.IGNORECASE)
+_CLAUSE_SPLIT = re.compile(r"[?;]|\b(?:and also|as well as|and what|and how|and where|and which|also)\b", re.IGNORECASE)
+
+
+def expand_abbreviations(text: str) -> str:
+    """The text with each known abbreviation followed by its expansion, e.g. "SCC (stress corrosion cracking)"."""
+    return _ABBREVIATION.sub(lambda m: f"{m.group(0)} ({ABBREVIATIONS[m.group(0).lower()]})", text)
+
+
+def expand_query(query: str, max_queries: int = None) -> list:
+    """Return [(kind, sub_query)], starting with the original question, without duplicates."""
+    max_queries = max_queries or config.FANOUT_MAX_QUERIES
+    candidates = [("original", query)]
+    candidates += [("document_id", doc_id) for doc_id in find_document_ids(query)]
+    keywords = tokenize(query)
+    if keywords:
+        candidates.append(("keywords", " ".join(dict.fromkeys(keywords))))
+    expanded = expand_abbreviations(query)
+    if expanded != query:
+        candidates.append(("expanded", expanded))
+    clauses = [c.strip(" ,.") for c in _CLAUSE_SPLIT.split(query) if c and len(tokenize(c)) >= 2]
+    if len(clauses) > 1:
+        candidates += [("clause", clause) for clause in clauses]
+
+    sub_queries, seen = [], set()
+    for kind, text in candidates:
+        key = " ".join(text.casefold().split())
+        if key and key not in seen:
+            seen.add(key)
+            sub_queries.append((kind, text))
+    return sub_queries[:max_queries]
+
+
+def node_id(node_with_score) -> str:
+    node = node_with_score.node
+    return getattr(node, "node_id", None) or getattr(node, "id_", None) or str(id(node))
+
+
+def reciprocal_rank_fusion(result_lists: list, k: int = None, limit: int = None) -> list:
+    """Merge ranked node lists: score = sum of 1 / (k + rank). Duplicates (same node id) are merged."""
+    k = k or config.FANOUT_RRF_K
+    scores, first_seen = {}, {}
+    for nodes in result_lists:
+        for rank, node_with_score in enumerate(nodes, 1):
+            key = node_id(node_with_score)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            first_seen.setdefault(key, node_with_score)
+    fused = []
+    for key in sorted(scores, key=lambda key: -scores[key])[:limit]:
+        node_with_score = first_seen[key]
+        node_with_score.score = round(scores[key], 6)
+        fused.append(node_with_score)
+    return fused
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=config.FANOUT_WORKERS, thread_name_prefix="nrc-fanout")
+    return _pool
+
+
+def fanout_retrieve(retriever, query: str, similarity_top_k: int, max_queries: int = None, filters=None) -> tuple:
+    """Retrieve every sub-query in parallel and fuse the results. Returns (nodes, sub_queries)."""
+    sub_queries = expand_query(query, max_queries)
+    futures = [_get_pool().submit(retriever.retrieve, text, similarity_top_k=similarity_top_k, filters=filters)
+               for _, text in sub_queries]
+    result_lists = [futures[0].result()]  # the original question must succeed
+    for (kind, text), future in zip(sub_queries[1:], futures[1:]):
+        try:
+            result_lists.append(future.result())
+        except Exception as e:
+            logger.warning("sub-query %s %r failed: %s", kind, text, e)
+    return reciprocal_rank_fusion(result_lists, limit=similarity_top_k), sub_queries
@@ -0,0 +1,201 @@
+"""Metadata filters for retrieval: document type, year range and exact identifiers.
+
+Hard filters come from explicit terms in the question (type:IN,
+year:2010-2015, doc:"GL 89-13"), from the dashboard's filter expander or
+the API, and from a question that is nothing but identifiers. They are
+pushed into the retriever, so only chunks of matching documents are scored.
+An identifier-only question skips scoring entirely and is answered by a
+direct lookup of those documents.
+
+Types, years and identifiers a question merely mentions ("information
+notices since 2015", "what happened in 1986 at Chernobyl?") are only hints:
+retrieval fetches a wider candidate set and ranks the chunks that match them
+first, but never drops the rest.
+"""
+import re
+
+from .doc_index import document_year, find_document_ids, normalize_document_id, remove_document_ids
+from .text import tokenize
+
+
+DOCUMENT_TYPE_LABELS = {
+    "GL": "Generic Letter",
+    "IN": "Information Notice",
+    "BL": "Bulletin",
+    "RIS": "Regulatory Issue Summary",
+}
+
+_TYPE_NAMES = {
+    "GL": re.compile(r"\bgeneric\s+letters?\b", re.IGNORECASE),
+    "IN": re.compile(r"\binformation\s+notices?\b", re.IGNORECASE),
+    "BL": re.compile(r"\bbulletins?\b", re.IGNORECASE),
+    "RIS": re.compile(r"\bregulatory\s+issue\s+summar(?:y|ies)\b", re.IGNORECASE),
+}
+# Abbreviations only count in upper case, so the word "in" is not read as a type
+_TYPE_ABBREVIATION = re.compile(r"\b(GL|IN|BL|RIS)s?\b")
+
+_YEAR = r"((?:19|20)\d{2})"
+_YEAR_BETWEEN = re.compile(rf"\b(?:between\s+{_YEAR}\s+and|(?:from\s+)?{_YEAR}\s*(?:-|–|to|through|until))\s*{_YEAR}\b", re.IGNORECASE)
+_YEAR_FROM = re.compile(rf"\b(since|from|after|starting(?:\s+in)?)\s+{_YEAR}\b", re.IGNORECASE)
+_YEAR_TO = re.compile(rf"\b(before|prior\s+to|until|through|up\s+to)\s+{_YEAR}\b", re.IGNORECASE)
+_YEAR_LIST = r"(?:19|20)\d{2}(?:\s*(?:,|&|\band\b|\bor\b)\s*(?:19|20)\d{2})*\b"  # "2015", "2015 and 2016"
+_YEAR_IN = re.compile(rf"\b(?:in|during|of|issued)\s+({_YEAR_LIST})", re.IGNORECASE)
+
+# Explicit filter terms: type:IN,GL  year:2015  year:2010-2015  year:2015-  doc:"GL 89-13"  doc:GL 89-13
+# Only doc: runs on to a following number, so "year:2015 10 CFR 50.55a" keeps its "10".
+_FILTER_TERM = re.compile(
+    r'(?<!\S)(?:(type|year):\s*("[^"]*"|\S+)|(doc):\s*("[^"]*"|\S+(?:\s+\d[\d-]*\b)?))', re.IGNORECASE
+)
+
+# Words that may accompany identifiers without making the query a question
+_LOOKUP_FILLER = frozenset("show me open get give see read view document documents pdf full text please".split())
+
+
+class SearchFilters:
+    """Restrictions on which documents retrieval may return. Empty filters match everything."""
+
+    __slots__ = ("doc_types", "year_from", "year_to", "document_ids")
+
+    def __init__(self, doc_types=(), year_from: int = None, year_to: int = None, document_ids=()):
+        self.doc_types = tuple(sorted({t.upper() for t in doc_types}))
+        self.year_from = year_from
+        self.year_to = year_to
+        self.document_ids = tuple(dict.fromkeys(document_ids))
+
+    def __bool__(self):
+        return bool(self.doc_types or self.year_from or self.year_to or self.document_ids)
+
+    def merge(self, override) -> "SearchFilters":
+        """These filters with every field set in override (e.g. from the UI) taking precedence."""
+        if not override:
+            return self
+        return SearchFilters(
+            override.doc_types or self.doc_types,
+            override.year_from if override.year_from is not None else self.year_from,
+            override.year_to if override.year_to is not None else self.year_to,
+            override.document_ids or self.document_ids,
+        )
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.__slots__ if getattr(self, key)}
+
+    def describe(self) -> str:
+        parts = []
+        if self.document_ids:
+            parts.append(", ".join(self.document_ids))
+        if self.doc_types:
+            parts.append("/".join(self.doc_types))
+        if self.year_from or self.year_to:
+            parts.append(f"{self.year_from or '…'}–{self.year_to or '…'}")
+        return "; ".join(parts)
+
+    def matches(self, metadata: dict) -> bool:
+        """Whether a chunk's metadata passes; identifiers and years fall back to the file name."""
+        if not self:
+            return True
+        metadata = metadata or {}
+        document_id = metadata.get("document_id") or normalize_document_id(
+            str(metadata.get("file_name") or metadata.get("document_name") or ""))
+        if self.document_ids and document_id not in self.document_ids:
+            return False
+        if self.doc_types and (metadata.get("doc_type") or (document_id or "").split(" ")[0]) not in self.doc_types:
+            return False
+        if self.year_from or self.year_to:
+            year = metadata.get("year") or document_year(document_id)
+            if year is None or (self.year_from and year < self.year_from) or (self.year_to and year > self.year_to):
+                return False
+        return True
+
+    def to_llama_filters(self):
+        """The same restrictions as LlamaIndex MetadataFilters over the metadata ingest uploads."""
+        from llama_index.core.vector_stores.types import FilterCondition, FilterOperator, MetadataFilter, MetadataFilters
+
+        parts = []
+        if self.document_ids:
+            parts.append(MetadataFilter(key="document_id", value=list(self.document_ids), operator=FilterOperator.IN))
+        if self.doc_types:
+            parts.append(MetadataFilter(key="doc_type", value=list(self.doc_types), operator=FilterOperator.IN))
+        if self.year_from:
+            parts.append(MetadataFilter(key="year", value=self.year_from, operator=FilterOperator.GTE))
+        if self.year_to:
+            parts.append(MetadataFilter(key="year", value=self.year_to, operator=FilterOperator.LTE))
+        return MetadataFilters(filters=parts, condition=FilterCondition.AND)
+
+
+def strip_filter_terms(query: str) -> str:
+    """The question without its type:, year: and doc: terms, for retrieval."""
+    return " ".join(_FILTER_TERM.sub(" ", query).split())
+
+
+def _year_range(value: str) -> tuple:
+    """(year_from, year_to) of a year: term: "2015", "2010-2015", "2015,2016", "2015-" or "-2010"."""
+    years = sorted(int(year) for year in re.findall(r"\d{4}", value))
+    if not years:
+        return None, None
+    if value.endswith(("-", "–", "..")):
+        return years[0], None
+    if value.startswith(("-", "–", "..")):
+        return None, years[-1]
+    return years[0], years[-1]
+
+
+def parse_filters(query: str) -> SearchFilters:
+    """Hard filters of a question: its type:, year: and doc: terms, or the documents it consists of."""
+    doc_types, year_from, year_to, document_ids = [], None, None, []
+    for term in _FILTER_TERM.finditer(query):
+        field, value = (term.group(1) or term.group(3)).lower(), (term.group(2) or term.group(4)).strip('"').strip()
+        if field == "type":
+            doc_types += [t for t in re.split(r"[\s,/]+", value.upper()) if t in DOCUMENT_TYPE_LABELS]
+        elif field == "year":
+            year_from, year_to = _year_range(value)
+        else:
+            document_ids += find_document_ids(value, any_case=True)
+    if is_identifier_query(query):
+        document_ids += find_document_ids(query)
+    return SearchFilters(doc_types, year_from, year_to, document_ids)
+
+
+def filter_hints(query: str) -> SearchFilters:
+    """Types, years and identifiers a question mentions in passing; for ranking only, never for excluding."""
+    text = strip_filter_terms(query)
+    document_ids = find_document_ids(text)
+    text = remove_document_ids(text)
+
+    doc_types = [doc_type for doc_type, pattern in _TYPE_NAMES.items() if pattern.search(text)]
+    if not text.isupper():
+        doc_types += [m.group(1) for m in _TYPE_ABBREVIATION.finditer(text)]
+
+    year_from = year_to = None
+    between = _YEAR_BETWEEN.search(text)
+    if between:
+        years = sorted(int(y) for y in between.groups() if y)
+        year_from, year_to = years[0], years[-1]
+    else:
+        since = _YEAR_FROM.search(text)
+        if since:
+            year_from = int(since.group(2)) + (1 if since.group(1).lower() == "after" else 0)
+        until = _YEAR_TO.search(text)
+        if until:
+            year_to = int(until.group(2)) - (1 if until.group(1).lower().startswith(("before", "prior")) else 0)
+        if not since and not until:
+            # "in 2015 and 2016" or "in 2015 ... in 2018": the span of every year mentioned
+            years = [int(year) for m in _YEAR_IN.finditer(text) for year in re.findall(r"\d{4}", m.group(1))]
+            if years:
+                year_from, year_to = min(years), max(years)
+    return SearchFilters(doc_types, year_from, year_to, document_ids)
+
+
+def prefer_matching(nodes: list, hints: SearchFilters, limit: int) -> list:
+    """The best limit nodes with those matching the hints ranked first; each group keeps its order."""
+    matching = [hints.matches(node.node.metadata) for node in nodes]
+    return ([node for node, match in zip(nodes, matching) if match]
+            + [node for node, match in zip(nodes, matching) if not match])[:limit]
+
+
+def is_identifier_query(query: str) -> bool:
+    """True when a question names documents and asks nothing else ("GL 89-13", "show IN 2023-01")."""
+    query = strip_filter_terms(query)
+    if not find_document_ids(query):
+        return False
+    return all(token in _LOOKUP_FILLER for token in tokenize(remove_document_ids(query)))
+
@@ -0,0 +1,261 @@
+"""Grounding of GPT-4o's quotes in the retrieved chunks, without another model call.
+
+GPT-4o returns key_excerpts as direct quotes and a document_name per
+reference, and the dashboard shows them as such; nothing used to check them.
+Each excerpt is now located in the raw_chunks of the search:
+
+1. Chunk text and excerpts are normalized to lower-case word tokens, so
+   punctuation, quote styles, dashes, case and line breaks do not matter.
+2. One Aho-Corasick automaton over the tokens of every excerpt (split at
+   "..." elisions) scans each chunk once: every verbatim quote is found in
+   time linear in the chunk text.
+3. A fragment that is not verbatim is aligned fuzzily: its word trigrams
+   vote for a start position in the chunks, and only the best few windows
+   are compared with difflib. Similarity is the Dice ratio of words matched
+   in order between the fragment and the aligned span of the chunk.
+
+Each reference gains a "grounding" entry with, per excerpt, the source chunk
+(source_num and chunk id), the character offset and length of the match in
+that chunk's text and the similarity; and whether the cited document was
+among the retrieved chunks at all. Excerpts below GROUNDING_MIN_SIMILARITY
+are flagged, or removed from key_excerpts when GROUNDING_MODE=drop.
+
+    python -m benchmarks.grounding --chunks 200 --chunk-chars 4000
+"""
+import re
+from collections import Counter
+from itertools import islice
+from difflib import SequenceMatcher
+
+from . import config
+from .chunk_store import chunk_id
+from .doc_index import normalize_document_id
+from .tracing import span
+
+
+_WORD = re.compile(r"\w+")
+_ELISION = re.compile(r"\[?(?:\.\s*){3,}\]?|…")
+_CANDIDATES = 3  # fuzzy windows compared per fragment
+_MAX_POSTINGS = 64  # trigrams occurring more often than this in the chunks carry no alignment signal
+
+
+def words(text: str) -> list:
+    """Case-folded word tokens of text; punctuation, quote styles and line breaks are dropped."""
+    return _WORD.findall(text.casefold())
+
+
+class _Automaton:
+    """Aho-Corasick over word tokens: finds every occurrence of any pattern in one pass."""
+
+    def __init__(self, patterns: list):
+        self.goto, self.fail, self.out = [{}], [0], [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            node = 0
+            for token in pattern:
+                child = self.goto[node].get(token)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto[node][token] = child
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = child
+            self.out[node].append(pattern_id)
+        queue = list(self.goto[0].values())
+        for node in queue:  # breadth first; the list grows while it is walked
+            for token, child in self.goto[node].items():
+                fallback = self.fail[node]
+                while fallback and token not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(token, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+                queue.append(child)
+        self.vocabulary = frozenset(token for pattern in patterns for token in pattern)
+
+    def scan(self, tokens: list):
+        """Yield (pattern_id, index of its last token) for every match."""
+        goto, fail, out, vocabulary = self.goto, self.fail, self.out, self.vocabulary
+        node = 0
+        for index, token in enumerate(tokens):
+            if token not in vocabulary:  # no pattern continues through this word
+                node = 0
+                continue
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for pattern_id in out[node]:
+                yield pattern_id, index
+
+
+class _Chunk:
+    __slots__ = ("source_num", "chunk_id", "document_id", "text", "tokens")
+
+    def __init__(self, chunk, position: int):
+        self.source_num = chunk.get("source_num") or position + 1
+        self.chunk_id = chunk_id(chunk)
+        self.document_id = _document_key(chunk.get("metadata") or {})
+        self.text = chunk.get("content") or ""
+        self.tokens = words(self.text)
+
+    def span(self, first: int, last: int) -> tuple:
+        """(offset, length) in the chunk text of tokens first..last.
+
+        Exact unless case folding lengthened the text before them (e.g. a "ß"); then off by that much.
+        """
+        matches = list(islice(_WORD.finditer(self.text.casefold()), first, last + 1))
+        return matches[0].start(), matches[-1].end() - matches[0].start()
+
+
+def _document_key(metadata: dict):
+    for field in ("document_id", "document_name", "file_name"):
+        value = metadata.get(field)
+        if value:
+            return normalize_document_id(str(value)) or str(value).casefold()
+    return None
+
+
+class Grounder:
+    """Locates excerpts in one search's raw chunks; build once, ground every reference."""
+
+    def __init__(self, raw_chunks: list, min_similarity: float = None, min_words: int = None):
+        self.min_similarity = config.GROUNDING_MIN_SIMILARITY if min_similarity is None else min_similarity
+        self.min_words = config.GROUNDING_MIN_WORDS if min_words is None else min_words
+        self.chunks = [_Chunk(chunk, i) for i, chunk in enumerate(raw_chunks or [])]
+        self.documents = {chunk.document_id for chunk in self.chunks if chunk.document_id}
+
+    # --- Matching ---
+    def _exact(self, fragments: list) -> dict:
+        """fragment index -> (chunk, first token, last token) of its first verbatim occurrence."""
+        found = {}
+        automaton = _Automaton(fragments)
+        for chunk in self.chunks:
+            for fragment_id, end in automaton.scan(chunk.tokens):
+                if fragment_id not in found:
+                    found[fragment_id] = (chunk, end - len(fragments[fragment_id]) + 1, end)
+            if len(found) == len(fragments):
+                break
+        return found
+
+    def _postings(self, fragments: list) -> dict:
+        """Word trigram of any of the fragments -> [(chunk index, start)], from one pass over the chunks."""
+        wanted = {trigram for fragment in fragments for trigram in zip(fragment, fragment[1:], fragment[2:])}
+        postings = {}
+        for position, chunk in enumerate(self.chunks):
+            tokens = chunk.tokens
+            for start, trigram in enumerate(zip(tokens, tokens[1:], tokens[2:])):
+                if trigram in wanted:
+                    postings.setdefault(trigram, []).append((position, start))
+        return postings
+
+    def _fuzzy(self, fragment: list, postings: dict):
+        """(similarity, chunk, first token, last token) of the best alignment, or None."""
+        if len(fragment) < 3:
+            return None
+        found = [(k, postings.get(trigram, ())) for k, trigram in enumerate(zip(fragment, fragment[1:], fragment[2:]))]
+        informative = [(k, postings) for k, postings in found if len(postings) <= _MAX_POSTINGS]
+        votes = Counter()
+        for k, postings in informative or found:
+            for position, start in postings[:_MAX_POSTINGS]:
+                votes[position, start - k] += 1
+        best = None
+        slack = max(3, len(fragment) // 4)
+        for (position, start), _ in votes.most_common(_CANDIDATES):
+            chunk = self.chunks[position]
+            low = max(0, start - slack)
+            window = chunk.tokens[low:start + len(fragment) + slack]
+            blocks = [b for b in SequenceMatcher(None, fragment, window, autojunk=False).get_matching_blocks() if b.size]
+            if not blocks:
+                continue
+            first, last = low + blocks[0].b, low + blocks[-1].b + blocks[-1].size - 1
+            # Words left out of the quote count against it as much as words changed in it
+            similarity = 2 * sum(b.size for b in blocks) / (len(fragment) + last - first + 1)
+            if best is None or similarity > best[0]:
+                best = (similarity, chunk, first, last)
+        return best
+
+    # --- References ---
+    def _record(self, excerpt: str, fragments: list, matches: list, cited_document) -> dict:
+        """Grounding record of one excerpt from the matches of its fragments (None where not located)."""
+        record = {"text": excerpt, "grounded": False, "match": None, "source_num": None, "chunk_id": None,
+                  "offset": None, "length": None, "similarity": 0.0, "same_document": None}
+        located = [(fragment, match) for fragment, match in zip(fragments, matches) if match]
+        if not located:
+            return record
+        words_total = sum(len(fragment) for fragment in fragments)
+        similarity = sum(match[1] * len(fragment) for fragment, match in located) / words_total
+        exact = len(located) == len(fragments) and all(match[0] == "exact" for _, match in located)
+        # Report the span from first to last fragment when they share a chunk, else the longest fragment's
+        spans = [match[2:] for _, match in located]
+        if len({id(chunk) for chunk, _, _ in spans}) == 1:
+            chunk, first, last = spans[0][0], min(s[1] for s in spans), max(s[2] for s in spans)
+        else:
+            chunk, first, last = max(spans, key=lambda s: s[2] - s[1])
+        offset, length = chunk.span(first, last)
+        record.update(
+            grounded=exact or (similarity >= self.min_similarity and words_total >= self.min_words),
+            match="exact" if exact else "fuzzy", source_num=chunk.source_num, chunk_id=chunk.chunk_id,
+            offset=offset, length=length, similarity=round(similarity, 3),
+            same_document=chunk.document_id is not None and chunk.document_id == cited_document,
+        )
+        return record
+
+    def ground_all(self, refs: list, drop: bool = None) -> list:
+        """Attach ref["grounding"] to every reference; with drop, also remove ungrounded excerpts from key_excerpts.
+
+        The excerpts of all references are matched together, in one pass over the chunks.
+        """
+        drop = config.GROUNDING_MODE == "drop" if drop is None else drop
+        fragments, owners = [], []  # word tokens of every excerpt's fragments; per excerpt, its fragment ids
+        for ref in refs:
+            for excerpt in ref.get("key_excerpts") or []:
+                if str(excerpt).strip():
+                    owned = [tokens for tokens in (words(part) for part in _ELISION.split(str(excerpt))) if tokens]
+                    owners.append((ref, str(excerpt), range(len(fragments), len(fragments) + len(owned))))
+                    fragments += owned
+        matches = [None] * len(fragments)
+        if fragments and self.chunks:
+            for i, (chunk, first, last) in self._exact(fragments).items():
+                matches[i] = ("exact", 1.0, chunk, first, last)
+            unmatched = [i for i, match in enumerate(matches) if match is None]
+            if unmatched:
+                postings = self._postings([fragments[i] for i in unmatched])
+                for i in unmatched:
+                    best = self._fuzzy(fragments[i], postings)
+                    matches[i] = ("fuzzy", *best) if best else None
+
+        cited = {}
+        for ref in refs:
+            document_name = str(ref.get("document_name") or "")
+            cited[id(ref)] = normalize_document_id(document_name) or document_name.casefold() or None
+            ref["grounding"] = {"document_retrieved": cited[id(ref)] in self.documents, "excerpts": [], "ungrounded": 0}
+        for ref, excerpt, ids in owners:
+            record = self._record(excerpt, [fragments[i] for i in ids], [matches[i] for i in ids], cited[id(ref)])
+            ref["grounding"]["excerpts"].append(record)
+            ref["grounding"]["ungrounded"] += not record["grounded"]
+        for ref in refs:
+            if drop and ref["grounding"]["ungrounded"]:
+                ref["key_excerpts"] = [record["text"] for record in ref["grounding"]["excerpts"] if record["grounded"]]
+                ref["grounding"]["dropped"] = ref["grounding"]["ungrounded"]
+        return refs
+
+    def ground(self, ref: dict, drop: bool = None) -> dict:
+        """ground_all for a single reference (e.g. one streamed in); returns it."""
+        return self.ground_all([ref], drop)[0]
+
+
+def excerpt_grounding(ref: dict, excerpt: str):
+    """The grounding record of one of a reference's excerpts, or None if it was not checked."""
+    grounding = ref.get("grounding") or {}
+    return next((r for r in grounding.get("excerpts") or [] if r["text"] == str(excerpt)), None)
+
+
+def ground_results(results: dict, raw_chunks: list, grounder: Grounder = None) -> dict:
+    """Ground every reference of a parsed reply in place (unless GROUNDING_MODE=off); returns results."""
+    if config.GROUNDING_MODE == "off" or not isinstance(results, dict) or not results.get("references"):
+        return results
+    with span("grounding") as grounding:
+        grounder = grounder or Grounder(raw_chunks)
+        refs = grounder.ground_all([ref for ref in results["references"] if isinstance(ref, dict)])
+        grounding.set(excerpts=sum(len(ref["grounding"]["excerpts"]) for ref in refs),
+                      ungrounded=sum(ref["grounding"]["ungrounded"] for ref in refs), chunks=len(grounder.chunks))
+    return results
@@ -0,0 +1,335 @@
+"""Incremental ingestion of the Data folder.
+
+Every PDF is hashed and compared against a manifest from the previous run.
+Only new or changed documents are extracted and chunked, spread over a
+process pool; deleted documents are dropped. Chunks are kept per content
+hash, so a renamed or moved file is re-indexed without re-extraction.
+
+    python -m nrc_search.ingest                            # sync the local index
+    python -m nrc_search.ingest --llamacloud               # also sync the hosted "nrc" index
+    python -m nrc_search.ingest --llamacloud --baseline
+
+--baseline records the current files as already present in LlamaCloud
+without uploading them; use it once to adopt an index that was filled by hand.
+Adopted files have no recorded LlamaCloud id, so when one later changes or is
+deleted its hosted copy is found by file name. Deletions that fail are kept
+in llamacloud_deletes.json and retried on the next --llamacloud run.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from . import config
+from .cache import on_index_changed
+from .local_index import chunk_pdf, current_generation, document_metadata, list_pdfs, write_index
+
+
+MANIFEST_NAME = "manifest.json"
+PENDING_DELETES_NAME = "llamacloud_deletes.json"
+DOCUMENTS_DIR = "documents"
+
+
+# --- Manifest ---
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(index_dir: str, name: str = MANIFEST_NAME, default=None):
+    try:
+        with open(os.path.join(index_dir, name), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {} if default is None else default
+
+
+def save_manifest(index_dir: str, manifest, name: str = MANIFEST_NAME):
+    os.makedirs(index_dir, exist_ok=True)
+    tmp_path = os.path.join(index_dir, name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, os.path.join(index_dir, name))
+
+
+def scan(data_folder: str, manifest: dict, rehash: bool = False, workers: int = None) -> dict:
+    """Hash the PDFs under data_folder. Returns {relative_path: {sha256, size, mtime}}.
+
+    Files whose size and mtime match the manifest reuse the recorded hash
+    unless rehash is set.
+    """
+    entries, to_hash = {}, []
+    for path in list_pdfs(data_folder):
+        rel_path = os.path.relpath(path, data_folder)
+        stat = os.stat(path)
+        entry = {"size": stat.st_size, "mtime": stat.st_mtime}
+        previous = manifest.get(rel_path)
+        if not rehash and previous and previous["size"] == entry["size"] and previous["mtime"] == entry["mtime"]:
+            entry["sha256"] = previous["sha256"]
+        else:
+            to_hash.append(rel_path)
+        entries[rel_path] = entry
+    with ThreadPoolExecutor(max_workers=workers or config.INGEST_WORKERS) as pool:
+        hashes = pool.map(lambda rel: file_sha256(os.path.join(data_folder, rel)), to_hash)
+        for rel_path, sha256 in zip(to_hash, hashes):
+            entries[rel_path]["sha256"] = sha256
+    return entries
+
+
+# --- Per-Document Chunks ---
+def _chunks_path(index_dir: str, sha256: str) -> str:
+    return os.path.join(index_dir, DOCUMENTS_DIR, f"{sha256}.json")
+
+
+def _extract(path: str, data_folder: str):
+    """Process-pool worker: extract and chunk one PDF. Returns (chunks, pages, error)."""
+    try:
+        chunks, pages = chunk_pdf(path, data_folder)
+        return chunks, pages, None
+    except Exception as e:
+        return [], 0, f"{type(e).__name__}: {e}"
+
+
+def _load_chunks(index_dir: str, sha256: str, path: str, data_folder: str) -> tuple:
+    """Load stored chunks, re-stamped with the document's current path. Returns (chunks, pages)."""
+    with open(_chunks_path(index_dir, sha256), encoding="utf-8") as f:
+        stored = json.load(f)
+    base = document_metadata(path, data_folder)
+    for chunk in stored["chunks"]:
+        chunk["metadata"].update(base)
+        chunk["id"] = f"{base['file_path']}#{chunk['metadata']['chunk_index']}"
+    return stored["chunks"], stored["pages"]
+
+
+# --- LlamaCloud Sync ---
+def _pipeline_files_api():
+    """The platform client's pipeline files API; LlamaCloudIndex has no call for removing an uploaded file."""
+    from llama_cloud.client import LlamaCloud
+
+    kwargs = {"token": config.LLAMA_CLOUD_API_KEY}
+    if config.LLAMA_CLOUD_BASE_URL:
+        kwargs["base_url"] = config.LLAMA_CLOUD_BASE_URL
+    return LlamaCloud(**kwargs).pipeline_files
+
+
+def _pipeline_file_ids(files_api, pipeline_id: str, name: str, keep: set) -> list:
+    """Ids of the pipeline's files called name, except those in keep."""
+    ids, offset = [], 0
+    while True:
+        page = files_api.list_pipeline_files_2(pipeline_id, file_name_contains=name, limit=100, offset=offset)
+        ids += [f.file_id for f in page.files if f.name == name and f.file_id and f.file_id not in keep]
+        offset += len(page.files)
+        if not page.files or offset >= page.total_count:
+            return ids
+
+
+def _delete_pipeline_file(files_api, pipeline_id: str, file_id: str) -> bool:
+    """Remove a file from the pipeline; False if it was already gone."""
+    from llama_cloud.core.api_error import ApiError
+
+    try:
+        files_api.delete_pipeline_file(file_id=file_id, pipeline_id=pipeline_id)
+        return True
+    except ApiError as e:
+        if e.status_code == 404:
+            return False
+        raise
+
+
+def _remove_stale(index, index_dir: str, manifest: dict, entries: dict, upload: list, removed: list, report: dict):
+    """Remove deleted files and the old versions of changed ones, plus deletions that failed before."""
+    stale = load_manifest(index_dir, PENDING_DELETES_NAME, default=[])
+    for rel_path in removed + upload:
+        if "llamacloud_file_id" in manifest.get(rel_path, {}):
+            stale.append({"file_id": manifest[rel_path]["llamacloud_file_id"], "name": os.path.basename(rel_path)})
+    keep = {entry["llamacloud_file_id"] for entry in entries.values() if entry.get("llamacloud_file_id")}
+    # Adopted files still in use; a lookup by one of their names would find them too
+    adopted = {os.path.basename(rel) for rel, entry in entries.items()
+               if "llamacloud_file_id" in entry and entry["llamacloud_file_id"] is None}
+    files_api, failed = _pipeline_files_api(), []
+    for item in stale:
+        try:
+            if item["file_id"]:
+                file_ids = [item["file_id"]]
+            elif item["name"] in adopted:
+                raise RuntimeError("another adopted file has this name; retried once it has an id")
+            else:
+                file_ids = _pipeline_file_ids(files_api, index.pipeline.id, item["name"], keep)
+            for file_id in file_ids:
+                report["removed"] += _delete_pipeline_file(files_api, index.pipeline.id, file_id)
+        except Exception as e:
+            report["errors"].append(f"delete {item['file_id'] or item['name']}: {e}")
+            failed.append(item)
+    save_manifest(index_dir, failed, PENDING_DELETES_NAME)
+    report["pending_deletes"] = len(failed)
+
+
+def _sync_llamacloud(data_folder: str, index_dir: str, manifest: dict, entries: dict, upload: list,
+                     removed: list) -> dict:
+    """Upload new/changed files and remove deleted ones from the hosted index."""
+    from .clients import build_llama_cloud_index
+
+    index = build_llama_cloud_index()
+    report = {"uploaded": 0, "removed": 0, "errors": []}
+    # Before uploading, so a lookup by name cannot find the new version of a changed file
+    _remove_stale(index, index_dir, manifest, entries, upload, removed, report)
+
+    def upload_one(rel_path):
+        metadata = {k: v for k, v in document_metadata(os.path.join(data_folder, rel_path), data_folder).items() if v is not None}
+        return index.upload_file(os.path.join(data_folder, rel_path), custom_metadata=metadata, wait_for_ingestion=False)
+
+    uploaded_ids = []
+    with ThreadPoolExecutor(max_workers=config.INGEST_UPLOAD_WORKERS) as pool:
+        futures = {pool.submit(upload_one, rel): rel for rel in upload}
+        for future in as_completed(futures):
+            rel_path = futures[future]
+            try:
+                file_id = future.result()
+            except Exception as e:
+                report["errors"].append(f"upload {rel_path}: {e}")
+                continue
+            entries[rel_path]["llamacloud_file_id"] = file_id
+            uploaded_ids.append(file_id)
+            report["uploaded"] += 1
+    if uploaded_ids:
+        index.wait_for_completion(file_ids=uploaded_ids, raise_on_error=False)
+    return report
+
+
+# --- Sync ---
+def sync(data_folder: str = None, index_dir: str = None, llamacloud: bool = False, workers: int = None,
+         rehash: bool = False, baseline: bool = False, dense: bool = None) -> dict:
+    """Bring the local index (and optionally LlamaCloud) in line with the data folder. Returns a report."""
+    data_folder = data_folder or config.DATA_FOLDER
+    index_dir = index_dir or config.LOCAL_INDEX_DIR
+    workers = workers or config.INGEST_WORKERS
+    started = time.perf_counter()
+
+    manifest = load_manifest(index_dir)
+    entries = scan(data_folder, manifest, rehash=rehash, workers=workers)
+    added = sorted(rel for rel in entries if rel not in manifest)
+    changed = sorted(rel for rel in entries if rel in manifest and manifest[rel]["sha256"] != entries[rel]["sha256"])
+    deleted = sorted(rel for rel in manifest if rel not in entries)
+    unchanged = len(entries) - len(added) - len(changed)
+    hashed_at = time.perf_counter()
+
+    # Carry over per-document results from the previous run
+    for rel_path, entry in entries.items():
+        previous = manifest.get(rel_path)
+        if previous and previous["sha256"] == entry["sha256"]:
+            for key in ("pages", "chunks", "llamacloud_file_id", "error"):
+                if key in previous:
+                    entry[key] = previous[key]
+
+    # Extract documents whose content has never been chunked before
+    os.makedirs(os.path.join(index_dir, DOCUMENTS_DIR), exist_ok=True)
+    to_extract = {}
+    for rel_path in added + changed:
+        sha256 = entries[rel_path]["sha256"]
+        if not os.path.exists(_chunks_path(index_dir, sha256)):
+            to_extract.setdefault(sha256, rel_path)
+    failed, pages_extracted, extracted = {}, 0, 0
+    if to_extract:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_extract, os.path.join(data_folder, rel_path), data_folder): (sha256, rel_path)
+                for sha256, rel_path in to_extract.items()
+            }
+            for future in as_completed(futures):
+                sha256, rel_path = futures[future]
+                chunks, pages, error = future.result()
+                if error:
+                    failed[rel_path] = error
+                    continue
+                extracted += 1
+                pages_extracted += pages
+                with open(_chunks_path(index_dir, sha256), "w", encoding="utf-8") as f:
+                    json.dump({"pages": pages, "chunks": chunks}, f, default=str)
+    extracted_at = time.perf_counter()
+
+    # Failed documents stay in the manifest with their error and are retried once their content changes
+    for rel_path in added + changed:
+        entry = entries[rel_path]
+        if not os.path.exists(_chunks_path(index_dir, entry["sha256"])):
+            entry["error"] = failed.setdefault(rel_path, "extraction failed")
+
+    # Rebuild the local index from stored chunks (cheap next to extraction)
+    index_changed = bool(added or changed or deleted)
+    chunk_count = None
+    if index_changed or current_generation(index_dir) is None:
+        all_chunks = []
+        for rel_path in sorted(rel for rel, entry in entries.items() if "error" not in entry):
+            sha256 = entries[rel_path]["sha256"]
+            chunks, pages = _load_chunks(index_dir, sha256, os.path.join(data_folder, rel_path), data_folder)
+            entries[rel_path]["chunks"] = len(chunks)
+            entries[rel_path]["pages"] = pages
+            all_chunks.extend(chunks)
+        write_index(all_chunks, index_dir, dense)
+        chunk_count = len(all_chunks)
+
+    llamacloud_report = None
+    if llamacloud:
+        if baseline:
+            for entry in entries.values():
+                entry.setdefault("llamacloud_file_id", None)
+            llamacloud_report = {"uploaded": 0, "removed": 0, "errors": [], "baseline": True}
+        else:
+            upload = [rel for rel, entry in entries.items()
+                      if "error" not in entry and (rel in added or rel in changed or "llamacloud_file_id" not in entry)]
+            llamacloud_report = _sync_llamacloud(data_folder, index_dir, manifest, entries, upload, deleted)
+
+    # Drop chunk files no longer referenced by any document
+    live = {entry["sha256"] for entry in entries.values()}
+    for name in os.listdir(os.path.join(index_dir, DOCUMENTS_DIR)):
+        if name.endswith(".json") and name[:-5] not in live:
+            os.remove(os.path.join(index_dir, DOCUMENTS_DIR, name))
+
+    save_manifest(index_dir, entries)
+    if index_changed:
+        on_index_changed()
+
+    finished = time.perf_counter()
+    extract_seconds = extracted_at - hashed_at
+    return {
+        "documents": len(entries),
+        "added": len(added),
+        "changed": len(changed),
+        "deleted": len(deleted),
+        "unchanged": unchanged,
+        "failed": failed,
+        "extracted": extracted,
+        "pages_extracted": pages_extracted,
+        "chunks_indexed": chunk_count,
+        "llamacloud": llamacloud_report,
+        "seconds": {
+            "hash": round(hashed_at - started, 2),
+            "extract": round(extract_seconds, 2),
+            "index": round(finished - extracted_at, 2),
+            "total": round(finished - started, 2),
+        },
+        "throughput": {
+            "docs_per_second": round(extracted / extract_seconds, 2) if extract_seconds > 0 else None,
+            "pages_per_second": round(pages_extracted / extract_seconds, 2) if extract_seconds > 0 else None,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally sync the Data folder into the search indexes.")
+    parser.add_argument("--data-folder", default=config.DATA_FOLDER)
+    parser.add_argument("--index-dir", default=config.LOCAL_INDEX_DIR, help="Local index and manifest location")
+    parser.add_argument("--llamacloud", action="store_true", help="Also sync the hosted LlamaCloud index")
+    parser.add_argument("--workers", type=int, default=config.INGEST_WORKERS, help="Extraction processes")
+    parser.add_argument("--rehash", action="store_true", help="Hash every file even if size and mtime are unchanged")
+    parser.add_argument("--baseline", action="store_true", help="Record LlamaCloud as already in sync without uploading")
+    parser.add_argument("--no-dense", action="store_true", help="Skip the dense vector index")
+    args = parser.parse_args()
+
+    report = sync(args.data_folder, args.index_dir, llamacloud=args.llamacloud, workers=args.workers,
+                  rehash=args.rehash, baseline=args.baseline, dense=False if args.no_dense else None)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,430 @@
+"""Offline retrieval over the PDFs in the Data folder.
+
+An alternative to the hosted LlamaCloud index for air-gapped hosts and local
+benchmarking. PDFs are split into section-aware chunks and indexed with
+BM25, plus an optional dense index of hashing-trick embeddings. Postings,
+document lengths and vectors are stored as flat binary arrays and
+memory-mapped on load.
+
+Select it with RETRIEVAL_BACKEND=local, after building it (or keeping it in
+sync incrementally with python -m nrc_search.ingest):
+
+    python -m nrc_search.local_index build
+    python -m nrc_search.local_index query "stress corrosion cracking"
+"""
+import argparse
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import threading
+import time
+from array import array
+
+from . import config
+from .doc_index import document_year, normalize_document_id
+from .embeddings import embed
+from .text import tokenize
+
+try:
+    import numpy as np
+except ImportError:  # optional: enables a full dense scan instead of BM25-candidate rescoring
+    np = None
+
+
+INDEX_FORMAT_VERSION = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+DENSE_CANDIDATES = 200
+
+
+# --- Extraction and Chunking ---
+# Case-sensitive apart from the "Section" prefix: a heading starts with a capital, which rules out
+# "3 of 12"; and not with a capitalized abbreviation plus a number, which rules out "10 CFR 50.55a ..."
+SECTION_HEADING = re.compile(r"^\s*(?i:section\s+)?((?:\d{1,2}\.)*\d{1,2})\.?\s+(?![A-Z]+\s+\d)[A-Z][^\n]{2,100}$")
+
+
+def extract_pages(path: str) -> list:
+    """Return the text of each page of a PDF."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    pages = []
+    for page in reader.pages:
+        try:
+            pages.append(page.extract_text() or "")
+        except Exception:
+            pages.append("")
+    return pages
+
+
+def document_metadata(path: str, data_folder: str = None) -> dict:
+    """Metadata shared by every chunk of one PDF."""
+    data_folder = data_folder or config.DATA_FOLDER
+    file_name = os.path.basename(path)
+    document_id = normalize_document_id(file_name)
+    return {
+        "file_name": file_name,
+        "file_path": os.path.relpath(path, data_folder),
+        "document_name": os.path.splitext(file_name)[0],
+        "document_id": document_id,
+        "doc_type": document_id.split(" ")[0] if document_id else None,
+        "year": document_year(document_id),
+    }
+
+
+def chunk_pages(pages: list, base_metadata: dict, chunk_chars: int = None, overlap: int = None) -> list:
+    """Split page texts into chunks that never straddle a section heading.
+
+    Returns dicts with "id", "text" and "metadata" (base metadata plus
+    section_number, page_label and chunk_index).
+    """
+    chunk_chars = chunk_chars or config.LOCAL_CHUNK_CHARS
+    overlap = config.LOCAL_CHUNK_OVERLAP if overlap is None else overlap
+    chunks = []
+    section = None
+    buffer, buffer_page = [], 1
+    buffer_len = 0
+
+    def flush(carry_overlap: bool):
+        nonlocal buffer, buffer_len
+        text = "\n".join(buffer).strip()
+        if text:
+            metadata = dict(base_metadata)
+            metadata.update({"section_number": section, "page_label": str(buffer_page), "chunk_index": len(chunks)})
+            chunks.append({"id": f"{base_metadata['file_path']}#{len(chunks)}", "text": text, "metadata": metadata})
+        tail = text[-overlap:] if carry_overlap and overlap and text else ""
+        buffer = [tail] if tail else []
+        buffer_len = len(tail)
+
+    for page_number, page_text in enumerate(pages, start=1):
+        for line in page_text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            heading = SECTION_HEADING.match(line)
+            if heading and heading.group(1) != section:
+                flush(carry_overlap=False)
+                section = heading.group(1)
+                buffer_page = page_number
+            if not buffer:
+                buffer_page = page_number
+            buffer.append(line)
+            buffer_len += len(line) + 1
+            if buffer_len >= chunk_chars:
+                flush(carry_overlap=True)
+                buffer_page = page_number
+    flush(carry_overlap=False)
+    return chunks
+
+
+def chunk_pdf(path: str, data_folder: str = None) -> tuple:
+    """Extract and chunk one PDF. Returns (chunks, page_count)."""
+    pages = extract_pages(path)
+    return chunk_pages(pages, document_metadata(path, data_folder)), len(pages)
+
+
+def list_pdfs(data_folder: str) -> list:
+    """All PDF paths under a folder, sorted for a stable chunk order."""
+    paths = []
+    for root, dirs, files in os.walk(data_folder):
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(".pdf"))
+    return sorted(paths)
+
+
+# --- Node Shape (matches what run_custom_rag reads from LlamaCloud) ---
+class LocalNode:
+    __slots__ = ("node_id", "text", "metadata")
+
+    def __init__(self, node_id: str, text: str, metadata: dict):
+        self.node_id = node_id
+        self.text = text
+        self.metadata = metadata
+
+    def get_content(self) -> str:
+        return self.text
+
+
+class LocalNodeWithScore:
+    __slots__ = ("node", "score")
+
+    def __init__(self, node: LocalNode, score: float):
+        self.node = node
+        self.score = score
+
+
+# --- Index ---
+def _write_array(path: str, typecode: str, values):
+    with open(path, "wb") as f:
+        array(typecode, values).tofile(f)
+
+
+def _map_array(path: str, typecode: str):
+    """Memory-map a flat binary array file; returns a typed memoryview (or empty array)."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return array(typecode)
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped).cast(typecode)
+
+
+def current_generation(index_dir: str):
+    """Name of the generation directory the CURRENT pointer selects, or None."""
+    try:
+        with open(os.path.join(index_dir, "CURRENT"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def write_index(chunks: list, index_dir: str, dense: bool = None) -> str:
+    """Write a complete index for the given chunks and make it current.
+
+    Each build goes into a new generation directory and the CURRENT pointer
+    is swapped atomically, so readers never see a half-written index and
+    files still memory-mapped by a running process (which Windows will not
+    let us replace) are left alone. Returns the new generation name.
+    """
+    dense = config.LOCAL_DENSE if dense is None else dense
+    os.makedirs(index_dir, exist_ok=True)
+    generation = f"gen-{time.time_ns()}"
+    gen_dir = os.path.join(index_dir, generation)
+    os.makedirs(gen_dir)
+
+    postings = {}
+    doc_lens = []
+    with open(os.path.join(gen_dir, "chunks.jsonl"), "w", encoding="utf-8") as f:
+        for i, chunk in enumerate(chunks):
+            f.write(json.dumps(chunk, default=str) + "\n")
+            tokens = tokenize(chunk["text"])
+            doc_lens.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((i, min(tf, 65535)))
+
+    vocab, ids, tfs = {}, array("I"), array("H")
+    for term in sorted(postings):
+        entries = postings[term]
+        vocab[term] = [len(ids), len(entries)]
+        ids.extend(i for i, _ in entries)
+        tfs.extend(tf for _, tf in entries)
+    with open(os.path.join(gen_dir, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f, separators=(",", ":"))
+    _write_array(os.path.join(gen_dir, "postings.u32"), "I", ids)
+    _write_array(os.path.join(gen_dir, "tfs.u16"), "H", tfs)
+    _write_array(os.path.join(gen_dir, "doc_lens.u32"), "I", doc_lens)
+
+    dim = config.EMBEDDING_DIM if dense else 0
+    if dense:
+        with open(os.path.join(gen_dir, "vectors.f32"), "wb") as f:
+            for chunk in chunks:
+                embed(chunk["text"], dim).tofile(f)
+
+    meta = {
+        "version": INDEX_FORMAT_VERSION,
+        "chunks": len(chunks),
+        "avgdl": (sum(doc_lens) / len(doc_lens)) if doc_lens else 0.0,
+        "dim": dim,
+    }
+    with open(os.path.join(gen_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    pointer_tmp = os.path.join(index_dir, "CURRENT.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(generation)
+    os.replace(pointer_tmp, os.path.join(index_dir, "CURRENT"))
+
+    # Remove superseded generations; ones still mapped elsewhere are retried next build
+    for name in os.listdir(index_dir):
+        if name.startswith("gen-") and name != generation:
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+    return generation
+
+
+class LocalIndex:
+    """Read-only BM25 (+ optional dense) index loaded from disk."""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(index_dir, "vocab.json"), encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        self.chunks = []
+        self.by_document_id = {}  # document identifier -> chunk positions, in document order
+        with open(os.path.join(index_dir, "chunks.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                chunk = json.loads(line)
+                document_id = chunk["metadata"].get("document_id")
+                if document_id:
+                    self.by_document_id.setdefault(document_id, []).append(len(self.chunks))
+                self.chunks.append(LocalNode(chunk["id"], chunk["text"], chunk["metadata"]))
+        self.postings = _map_array(os.path.join(index_dir, "postings.u32"), "I")
+        self.tfs = _map_array(os.path.join(index_dir, "tfs.u16"), "H")
+        self.doc_lens = _map_array(os.path.join(index_dir, "doc_lens.u32"), "I")
+        self.dim = self.meta.get("dim", 0)
+        self.vectors = _map_array(os.path.join(index_dir, "vectors.f32"), "f") if self.dim else None
+        self._matrix = None
+        if self.vectors is not None and np is not None and len(self.vectors):
+            self._matrix = np.frombuffer(self.vectors, dtype=np.float32).reshape(-1, self.dim)
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def allowed(self, filters) -> set:
+        """Positions of the chunks that pass the filters, or None when nothing is filtered."""
+        if not filters:
+            return None
+        if filters.document_ids:
+            positions = (p for document_id in filters.document_ids for p in self.by_document_id.get(document_id, ()))
+        else:
+            positions = range(len(self.chunks))
+        return {p for p in positions if filters.matches(self.chunks[p].metadata)}
+
+    def bm25(self, query: str, allowed: set = None) -> dict:
+        """BM25 scores of every chunk (among allowed, if given) containing at least one query term."""
+        n = len(self.chunks)
+        avgdl = self.meta["avgdl"] or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            entry = self.vocab.get(term)
+            if not entry:
+                continue
+            offset, df = entry
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for j in range(offset, offset + df):
+                doc = self.postings[j]
+                if allowed is not None and doc not in allowed:
+                    continue
+                tf = self.tfs[j]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lens[doc] / avgdl)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def dense(self, query: str, candidates=None, allowed: set = None) -> dict:
+        """Cosine similarity to the query for all chunks (numpy) or only the given candidates."""
+        if not self.dim or self.vectors is None or not len(self.chunks):
+            return {}
+        query_vector = embed(query, self.dim)
+        if self._matrix is not None:
+            rows = np.fromiter(sorted(allowed), dtype=np.int64) if allowed is not None else np.arange(len(self.chunks))
+            sims = self._matrix[rows] @ np.frombuffer(query_vector, dtype=np.float32)
+            top = np.argsort(-sims)[:DENSE_CANDIDATES]
+            return {int(rows[i]): float(sims[i]) for i in top}
+        scores = {}
+        for doc in candidates or ():
+            row = self.vectors[doc * self.dim:(doc + 1) * self.dim]
+            scores[doc] = sum(x * y for x, y in zip(row, query_vector))
+        return scores
+
+    def search(self, query: str, top_k: int, filters=None) -> list:
+        """Return [(chunk_position, score)], best first, scoring only chunks that pass the filters."""
+        allowed = self.allowed(filters)
+        if allowed is not None and not allowed:
+            return []
+        lexical = self.bm25(query, allowed)
+        if self.dim:
+            weight = config.LOCAL_DENSE_WEIGHT
+            candidates = heapq.nlargest(DENSE_CANDIDATES, lexical, key=lexical.get)
+            semantic = self.dense(query, candidates, allowed)
+            top_lexical = max(lexical.values()) if lexical else 1.0
+            combined = {}
+            for doc in set(lexical) | set(semantic):
+                combined[doc] = (1 - weight) * lexical.get(doc, 0.0) / top_lexical + weight * max(semantic.get(doc, 0.0), 0.0)
+            lexical = combined
+        return heapq.nlargest(top_k, lexical.items(), key=lambda item: (item[1], -item[0]))
+
+    def retrieve(self, query: str, similarity_top_k: int = None, filters=None) -> list:
+        """Same shape as a LlamaCloud retriever: nodes with .node.get_content(), .node.metadata, .score."""
+        similarity_top_k = similarity_top_k or config.SIMILARITY_TOP_K
+        return [LocalNodeWithScore(self.chunks[doc], round(score, 4))
+                for doc, score in self.search(query, similarity_top_k, filters)]
+
+    def lookup(self, document_ids, limit: int = None) -> list:
+        """The first chunks of each identified document, without scoring."""
+        limit = limit or config.SIMILARITY_TOP_K
+        per_document = -(-limit // max(1, len(document_ids)))
+        positions = [p for document_id in document_ids for p in self.by_document_id.get(document_id, [])[:per_document]]
+        return [LocalNodeWithScore(self.chunks[p], 1.0) for p in positions[:limit]]
+
+
+class LocalRetriever:
+    """Process-wide handle on the local index that reloads after a rebuild."""
+
+    def __init__(self, index_dir: str = None):
+        self.index_dir = index_dir or config.LOCAL_INDEX_DIR
+        self._lock = threading.Lock()
+        self._index = None
+        self._generation = None
+
+    def index(self) -> LocalIndex:
+        generation = current_generation(self.index_dir)
+        if generation is None:
+            raise RuntimeError(f"No local index at {self.index_dir}; run: python -m nrc_search.local_index build")
+        if self._index is None or generation != self._generation:
+            with self._lock:
+                if self._index is None or generation != self._generation:
+                    self._index = LocalIndex(os.path.join(self.index_dir, generation))
+                    self._generation = generation
+        return self._index
+
+    def retrieve(self, query: str, similarity_top_k: int = None, filters=None) -> list:
+        return self.index().retrieve(query, similarity_top_k, filters)
+
+    def lookup(self, document_ids, limit: int = None) -> list:
+        return self.index().lookup(document_ids, limit)
+
+
+_local_retriever = None
+_local_retriever_lock = threading.Lock()
+
+
+def get_local_retriever() -> LocalRetriever:
+    """Return the process-wide local retriever."""
+    global _local_retriever
+    if _local_retriever is None:
+        with _local_retriever_lock:
+            if _local_retriever is None:
+                _local_retriever = LocalRetriever()
+    return _local_retriever
+
+
+def build_local_index(data_folder: str = None, index_dir: str = None, dense: bool = None) -> int:
+    """Extract, chunk and index every PDF under the data folder. Returns the chunk count."""
+    data_folder = data_folder or config.DATA_FOLDER
+    chunks = []
+    for path in list_pdfs(data_folder):
+        try:
+            document_chunks, _ = chunk_pdf(path, data_folder)
+        except Exception as e:
+            print(f"Skipping {path}: {e}")
+            continue
+        chunks.extend(document_chunks)
+    write_index(chunks, index_dir or config.LOCAL_INDEX_DIR, dense)
+    return len(chunks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the offline retrieval index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Index every PDF in the data folder")
+    build.add_argument("--data-folder", default=config.DATA_FOLDER)
+    build.add_argument("--index-dir", default=config.LOCAL_INDEX_DIR)
+    build.add_argument("--no-dense", action="store_true", help="Skip the dense vector index")
+    query = sub.add_parser("query", help="Run a query against the built index")
+    query.add_argument("text")
+    query.add_argument("--top-k", type=int, default=config.SIMILARITY_TOP_K)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_local_index(args.data_folder, args.index_dir, dense=not args.no_dense)
+        print(f"Indexed {count} chunks into {args.index_dir}")
+    else:
+        for result in get_local_retriever().retrieve(args.text, args.top_k):
+            meta = result.node.metadata
+            print(f"{result.score:8.4f}  {meta.get('document_name')}  section {meta.get('section_number')}  p.{meta.get('page_label')}")
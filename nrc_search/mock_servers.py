@@ -0,0 +1,345 @@
+"""Local stand-in servers for exercising the search pipeline offline.
+
+Start a Core42 stand-in that fails a third of requests with 429:
+
+    python -m nrc_search.mock_servers core42 --port 8042 --error-rate 0.33 --error-status 429 --retry-after 1
+
+or one that enforces 20 requests per minute, answering 429 beyond that:
+
+    python -m nrc_search.mock_servers core42 --port 8042 --rpm-limit 20
+
+then point the app at it:
+
+    CORE42_API_URL=http://127.0.0.1:8042/v1/chat/completions streamlit run 02_dashboard.py
+
+The LlamaCloud stand-in answers the project/pipeline lookups LlamaCloudIndex
+makes on connect and POST /api/v1/pipelines/<id>/retrieve over a corpus of
+chunks ({"id", "text", "metadata"}, scored by shared query terms, honouring
+metadata filters) passed as the "chunks" option:
+
+    LLAMA_CLOUD_BASE_URL=http://127.0.0.1:8043 LLAMA_CLOUD_API_KEY=mock streamlit run 02_dashboard.py
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .text import tokenize
+
+
+MOCK_REFERENCES = {
+    "references": [
+        {
+            "document_name": "IN 2023-01",
+            "section_number": "2",
+            "relevance_summary": "Mock reference returned by the local Core42 stand-in.",
+            "key_excerpts": ["This is a mock excerpt."],
+            "technical_context": "Offline testing only.",
+        }
+    ]
+}
+
+
+class _MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler, options: dict):
+        super().__init__(address, handler)
+        self.options = options
+        self.lock = threading.Lock()
+        self.status_sequence = list(options.get("status_sequence") or [])
+        self.request_count = 0
+        self.rate_limited_count = 0
+        self.usage_log = deque()  # (time, tokens) of accepted requests in the current rate window
+        self._corpus = None
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return  # the client gave up or dropped a pooled connection; not a server fault
+        super().handle_error(request, client_address)
+
+    def corpus(self) -> tuple:
+        """(chunks, term -> chunk positions) for the "chunks" option, indexed on first use."""
+        with self.lock:
+            if self._corpus is None:
+                chunks = list(self.options.get("chunks") or [])
+                postings = {}
+                for position, chunk in enumerate(chunks):
+                    for term in set(tokenize(chunk["text"])):
+                        postings.setdefault(term, []).append(position)
+                self._corpus = (chunks, postings)
+            return self._corpus
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            return {}
+
+    def _send_json(self, status: int, payload, headers: dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate_latency(self):
+        options = self.server.options
+        delay = options.get("latency", 0.0) + random.uniform(0, options.get("jitter", 0.0))
+        if delay > 0:
+            time.sleep(delay)
+
+    def _next_error_status(self):
+        """Return an injected error status for this request, or None to succeed."""
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            if server.status_sequence:
+                status = server.status_sequence.pop(0)
+                return None if status == 200 else status
+        if random.random() < server.options.get("error_rate", 0.0):
+            return server.options.get("error_status", 503)
+        return None
+
+    def _send_error_status(self, status: int):
+        headers = {}
+        retry_after = self.server.options.get("retry_after")
+        if retry_after is not None:
+            headers["Retry-After"] = str(retry_after)
+        self._send_json(status, {"error": {"message": f"mock error {status}"}}, headers)
+
+
+# --- Core42 Stand-in ---
+class MockCore42Handler(_JsonHandler):
+    """Answers POST /v1/chat/completions with a canned references JSON."""
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        payload = self._read_json()
+        if self._rate_limited(payload):
+            return
+        self._simulate_latency()
+        status = self._next_error_status()
+        if status is not None:
+            self._send_error_status(status)
+            return
+        content = json.dumps(self.server.options.get("references") or MOCK_REFERENCES)
+        if payload.get("stream"):
+            self._send_stream(content)
+            return
+        # Rough usage figures (about four characters per token) so token metrics have something to count
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in payload.get("messages") or []) // 4
+        completion_tokens = len(content) // 4
+        self._send_json(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    def _rate_limited(self, payload: dict) -> bool:
+        """Enforce rpm_limit/tpm_limit over a sliding rate_window; answers 429 and returns True when exceeded."""
+        options, server = self.server.options, self.server
+        rpm, tpm = options.get("rpm_limit", 0), options.get("tpm_limit", 0)
+        if not rpm and not tpm:
+            return False
+        window = options.get("rate_window", 60.0)
+        tokens = sum(len(str(m.get("content") or "")) for m in payload.get("messages") or []) // 4
+        now = time.monotonic()
+        with server.lock:
+            while server.usage_log and now - server.usage_log[0][0] >= window:
+                server.usage_log.popleft()
+            used_requests = len(server.usage_log)
+            used_tokens = sum(t for _, t in server.usage_log)
+            if (rpm and used_requests + 1 > rpm) or (tpm and used_tokens + tokens > tpm):
+                server.rate_limited_count += 1
+                retry_after = window - (now - server.usage_log[0][0]) if server.usage_log else window
+            else:
+                server.usage_log.append((now, tokens))
+                return False
+        self._send_json(429, {"error": {"message": "Rate limit exceeded"}}, {
+            "Retry-After": f"{max(retry_after, 0.01):.2f}",
+            "x-ratelimit-remaining-requests": str(max(0, rpm - used_requests)) if rpm else "",
+            "x-ratelimit-remaining-tokens": str(max(0, tpm - used_tokens)) if tpm else "",
+        })
+        return True
+
+    def _send_stream(self, content: str):
+        """Send the reply as chat-completions SSE chunks of a few characters each."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        step = self.server.options.get("stream_chunk_chars", 8)
+        delay = self.server.options.get("stream_delay", 0.0)
+        for i in range(0, len(content), step):
+            chunk = {"choices": [{"index": 0, "delta": {"content": content[i:i + step]}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if delay:
+                time.sleep(delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+# --- LlamaCloud Stand-in ---
+MOCK_PROJECT_ID = "00000000-0000-4000-8000-000000000001"
+MOCK_PIPELINE_ID = "00000000-0000-4000-8000-000000000002"
+
+
+def _filter_matches(metadata: dict, search_filters: dict) -> bool:
+    """Evaluate LlamaCloud MetadataFilters JSON (==, !=, in, nin, >, >=, <, <=; and/or) against chunk metadata."""
+    if not search_filters or not search_filters.get("filters"):
+        return True
+    results = []
+    for item in search_filters["filters"]:
+        if "filters" in item:  # nested MetadataFilters
+            results.append(_filter_matches(metadata, item))
+            continue
+        value, expected, operator = metadata.get(item.get("key")), item.get("value"), item.get("operator", "==")
+        try:
+            results.append({
+                "==": lambda: value == expected, "!=": lambda: value != expected,
+                "in": lambda: value in expected, "nin": lambda: value not in expected,
+                ">": lambda: value is not None and value > expected, ">=": lambda: value is not None and value >= expected,
+                "<": lambda: value is not None and value < expected, "<=": lambda: value is not None and value <= expected,
+            }[operator]())
+        except (KeyError, TypeError):
+            results.append(False)
+    return any(results) if str(search_filters.get("condition", "and")).lower() == "or" else all(results)
+
+
+class MockLlamaCloudHandler(_JsonHandler):
+    """Answers the LlamaCloud calls the retriever makes: project and pipeline lookup, then retrieve."""
+
+    def _project(self, name: str = None, organization_id: str = None) -> dict:
+        return {"id": MOCK_PROJECT_ID, "name": name or "Default", "organization_id": organization_id or MOCK_PROJECT_ID}
+
+    def _pipeline(self, name: str = None) -> dict:
+        return {
+            "id": MOCK_PIPELINE_ID,
+            "name": name or self.server.options.get("pipeline_name", "nrc"),
+            "project_id": MOCK_PROJECT_ID,
+            "pipeline_type": "MANAGED",
+            "embedding_config": {"type": "MANAGED_OPENAI_EMBEDDING", "component": {}},
+        }
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        path = url.path.rstrip("/")
+        if path == "/api/v1/projects":
+            self._send_json(200, [self._project(query.get("project_name"), query.get("organization_id"))])
+        elif path == "/api/v1/pipelines":
+            self._send_json(200, [self._pipeline(query.get("pipeline_name"))])
+        elif path == f"/api/v1/pipelines/{MOCK_PIPELINE_ID}":
+            self._send_json(200, self._pipeline())
+        elif path == f"/api/v1/projects/{MOCK_PROJECT_ID}":
+            self._send_json(200, self._project())
+        else:
+            self._send_json(404, {"detail": "Not Found"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path != f"/api/v1/pipelines/{MOCK_PIPELINE_ID}/retrieve":
+            self._send_json(404, {"detail": "Not Found"})
+            return
+        payload = self._read_json()
+        self._simulate_latency()
+        status = self._next_error_status()
+        if status is not None:
+            self._send_error_status(status)
+            return
+        top_k = payload.get("dense_similarity_top_k") or 5
+        chunks, postings = self.server.corpus()
+        scores = {}
+        for term in set(tokenize(payload.get("query") or "")):
+            for position in postings.get(term, ()):
+                scores[position] = scores.get(position, 0) + 1
+        search_filters = payload.get("search_filters")
+        ranked = sorted(scores, key=lambda position: (-scores[position], position))
+        nodes = []
+        for position in ranked:
+            chunk = chunks[position]
+            if _filter_matches(chunk.get("metadata") or {}, search_filters):
+                nodes.append({
+                    "node": {"id_": chunk["id"], "text": chunk["text"], "extra_info": chunk.get("metadata") or {}},
+                    "score": round(scores[position] / max(1, len(tokenize(payload.get("query") or ""))), 4),
+                    "class_name": "NodeWithScore",
+                })
+                if len(nodes) >= top_k:
+                    break
+        self._send_json(200, {"pipeline_id": MOCK_PIPELINE_ID, "retrieval_nodes": nodes, "image_nodes": [],
+                              "metadata": {}, "retrieval_latency": {}})
+
+
+def start_mock_server(handler_class, port: int = 0, **options):
+    """Start a mock server on a daemon thread. Returns (server, base_url)."""
+    server = _MockServer(("127.0.0.1", port), handler_class, options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def start_mock_core42(port: int = 0, **options):
+    """Start a Core42 stand-in. Returns (server, chat_completions_url)."""
+    server, base_url = start_mock_server(MockCore42Handler, port, **options)
+    return server, f"{base_url}/v1/chat/completions"
+
+
+def start_mock_llama_cloud(port: int = 0, **options):
+    """Start a LlamaCloud stand-in. Returns (server, base_url) for LLAMA_CLOUD_BASE_URL."""
+    return start_mock_server(MockLlamaCloudHandler, port, **options)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stand-in for an external API.")
+    parser.add_argument("service", choices=["core42", "llamacloud"], help="Which API to imitate")
+    parser.add_argument("--port", type=int, default=8042)
+    parser.add_argument("--latency", type=float, default=0.0, help="Base response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="Status code for injected failures")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds sent with failures")
+    parser.add_argument("--status-sequence", default="", help="Comma-separated statuses for the first requests, e.g. 429,503,200")
+    parser.add_argument("--stream-delay", type=float, default=0.0, help="Delay between streamed chunks in seconds")
+    parser.add_argument("--rpm-limit", type=int, default=0, help="Requests allowed per rate window (429 beyond)")
+    parser.add_argument("--tpm-limit", type=int, default=0, help="Prompt tokens allowed per rate window (429 beyond)")
+    parser.add_argument("--rate-window", type=float, default=60.0, help="Rate-limit window in seconds")
+    args = parser.parse_args()
+
+    handlers = {"core42": MockCore42Handler, "llamacloud": MockLlamaCloudHandler}
+    options = {
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "error_status": args.error_status,
+        "retry_after": args.retry_after,
+        "status_sequence": [int(s) for s in args.status_sequence.split(",") if s.strip()],
+        "stream_delay": args.stream_delay,
+        "rpm_limit": args.rpm_limit,
+        "tpm_limit": args.tpm_limit,
+        "rate_window": args.rate_window,
+    }
+    server = _MockServer(("127.0.0.1", args.port), handlers[args.service], options)
+    print(f"Mock {args.service} listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
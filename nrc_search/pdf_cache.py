@@ -0,0 +1,76 @@
+"""Shared, size-bounded cache of PDF bytes for download buttons.
+
+The results page shows a download button for every cited PDF and Streamlit
+reruns the page on every interaction. Files are read only when a download
+is actually requested; the bytes are then kept in an LRU shared by all
+sessions, bounded by total size, and keyed by path, size and mtime so an
+updated file is never served stale.
+"""
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+from . import config
+from .tracing import get_metrics
+
+
+class PdfBytesCache:
+    """LRU of file contents, bounded by total bytes; files larger than the bound are read but not kept."""
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = config.PDF_CACHE_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.size = 0
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "bytes_read": 0}
+
+    def read(self, path: str) -> bytes:
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return data
+            self._counters["misses"] += 1
+
+        with open(path, "rb") as f:
+            data = f.read()
+
+        with self._lock:
+            self._counters["bytes_read"] += len(data)
+            if len(data) <= self.max_bytes and key not in self._entries:
+                self._entries[key] = data
+                self.size += len(data)
+                while self.size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.size -= len(evicted)
+                    self._counters["evictions"] += 1
+        return data
+
+    def loader(self, path: str):
+        """A no-argument callable returning the file's bytes, for deferred downloads."""
+        return functools.partial(self.read, path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries), "bytes": self.size}
+
+
+_pdf_cache = None
+_pdf_cache_lock = threading.Lock()
+
+
+def get_pdf_cache() -> PdfBytesCache:
+    """Return the process-wide PDF bytes cache, creating it on first use."""
+    global _pdf_cache
+    if _pdf_cache is None:
+        with _pdf_cache_lock:
+            if _pdf_cache is None:
+                _pdf_cache = PdfBytesCache()
+                get_metrics().register_source("pdf_cache", _pdf_cache.stats, {
+                    "hits": "counter", "misses": "counter", "evictions": "counter", "bytes_read": "counter",
+                })
+    return _pdf_cache
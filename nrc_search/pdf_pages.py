@@ -0,0 +1,257 @@
+"""Cited pages of a PDF: find them, cut them out and cache the result on disk.
+
+A reference names a section and quotes key excerpts; users need those pages,
+not a multi-megabyte letter. The pages are located from the section heading
+and excerpts in the page texts (and any page labels of retrieved chunks),
+then extracted as a small PDF with pypdf or rendered as PNG previews with
+pymupdf when it is installed. Page texts, single-page PDFs and previews are
+cached under PAGE_CACHE_DIR, keyed by the file's content hash and page
+number, so each is produced once per file version on any platform.
+
+    python -m nrc_search.pdf_pages "Data/IN/IN 2023-01.pdf" --section 2 --output cited.pdf
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+
+from . import config
+from .tracing import get_metrics, span
+
+try:
+    import fitz  # pymupdf; optional: PNG previews
+except ImportError:
+    fitz = None
+
+
+def _normalize(text: str) -> str:
+    """Lower-case words only, so excerpts match across hyphenation, line breaks and punctuation."""
+    return " ".join(re.findall(r"[a-z0-9]+", text.replace("-\n", "").casefold()))
+
+
+class PageExtractor:
+    """Locates and extracts PDF pages, with a size-bounded disk cache keyed by file hash and page."""
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        self.cache_dir = config.PAGE_CACHE_DIR if cache_dir is None else cache_dir
+        self.max_bytes = config.PAGE_CACHE_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._digests = {}  # (path, size, mtime_ns) -> sha256 of the file
+        self._cache_size = None
+        self._counters = {"hits": 0, "misses": 0, "bytes_served": 0, "evictions": 0}
+
+    # --- Disk cache ---
+    def digest(self, path: str) -> str:
+        """Content hash of a PDF, computed once per file version."""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    sha.update(block)
+            digest = sha.hexdigest()
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    def _cached(self, digest: str, name: str, produce) -> bytes:
+        """Bytes of cache entry digest/name, produced and stored on a miss."""
+        path = os.path.join(self.cache_dir, digest[:2], digest, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # recently used entries survive eviction
+            self._count("hits")
+            return data
+        except FileNotFoundError:
+            pass
+        self._count("misses")
+        data = produce()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)  # concurrent writers of the same entry write identical bytes
+        self._grew(len(data))
+        return data
+
+    def _grew(self, added: int):
+        with self._lock:
+            if self._cache_size is None:
+                self._cache_size = sum(size for _, size, _ in self._entries())
+            else:
+                self._cache_size += added
+            if self._cache_size <= self.max_bytes:
+                return
+            # Over budget: drop least recently used entries down to 90% of it
+            for path, size, _ in sorted(self._entries(), key=lambda entry: entry[2]):
+                if self._cache_size <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self._cache_size -= size
+                self._counters["evictions"] += 1
+
+    def _entries(self):
+        """(path, size, mtime) of every cache file."""
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._counters[key] += amount
+
+    # --- Locating pages ---
+    def page_texts(self, path: str) -> list:
+        """Text of every page (cached as JSON next to the page files)."""
+        from .local_index import extract_pages
+
+        blob = self._cached(self.digest(path), "text.json",
+                            lambda: json.dumps(extract_pages(path)).encode("utf-8"))
+        return json.loads(blob)
+
+    def locate(self, path: str, section_number: str = None, excerpts=(), hint_pages=(), max_pages: int = None) -> list:
+        """1-based page numbers that hold the cited excerpts, or else the section heading, or else the hints."""
+        from .local_index import SECTION_HEADING
+
+        max_pages = max_pages or config.PAGE_EXTRACT_MAX_PAGES
+        with span("locate_pages") as locate:
+            texts = self.page_texts(path)
+            normalized = [_normalize(text) for text in texts]
+            pages = []
+            for excerpt in excerpts or ():
+                needle = _normalize(excerpt)[:120]
+                if len(needle) < 12:
+                    continue
+                for number, text in enumerate(normalized, start=1):
+                    # Also match an excerpt running over onto the next page
+                    following = normalized[number] if number < len(normalized) else ""
+                    if needle in text or (needle[:40] in text and needle in f"{text} {following}"):
+                        pages.append(number)
+                        break
+            if not pages and section_number:
+                section = str(section_number).strip().rstrip(".")
+                for number, text in enumerate(texts, start=1):
+                    if any((m := SECTION_HEADING.match(line.strip())) and m.group(1) == section
+                           for line in text.splitlines()):
+                        pages.append(number)
+                        break
+            if not pages:
+                pages = [int(p) for p in hint_pages if str(p).isdigit() and 1 <= int(p) <= len(texts)]
+            pages = sorted(set(pages))[:max_pages]
+            locate.set(pages=len(pages), page_count=len(texts))
+        return pages
+
+    # --- Output ---
+    def page_pdf(self, path: str, page: int) -> bytes:
+        """One page as a standalone PDF."""
+        def produce():
+            from pypdf import PdfReader, PdfWriter
+
+            writer = PdfWriter()
+            writer.add_page(PdfReader(path).pages[page - 1])
+            if hasattr(writer, "compress_identical_objects"):  # pypdf >= 4
+                writer.compress_identical_objects()
+            out = io.BytesIO()
+            writer.write(out)
+            return out.getvalue()
+
+        return self._cached(self.digest(path), f"p{page:04d}.pdf", produce)
+
+    def pages_pdf(self, path: str, pages: list) -> bytes:
+        """The given pages, in order, as one small PDF assembled from the cached single pages."""
+        with span("extract_pages", pages=len(pages)) as extract:
+            if len(pages) == 1:
+                data = self.page_pdf(path, pages[0])
+            else:
+                from pypdf import PdfReader, PdfWriter
+
+                writer = PdfWriter()
+                for page in pages:
+                    writer.add_page(PdfReader(io.BytesIO(self.page_pdf(path, page))).pages[0])
+                out = io.BytesIO()
+                writer.write(out)
+                data = out.getvalue()
+            extract.set(bytes=len(data))
+        self._count("bytes_served", len(data))
+        return data
+
+    def page_png(self, path: str, page: int, zoom: float = None):
+        """A rendered preview of one page, or None when pymupdf is not installed."""
+        if fitz is None:
+            return None
+        zoom = zoom or config.PAGE_PREVIEW_ZOOM
+
+        def produce():
+            with fitz.open(path) as document:
+                return document[page - 1].get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes("png")
+
+        data = self._cached(self.digest(path), f"p{page:04d}@{zoom:g}x.png", produce)
+        self._count("bytes_served", len(data))
+        return data
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "cache_bytes": self._cache_size or 0, "previews": fitz is not None}
+
+
+_page_extractor = None
+_page_extractor_lock = threading.Lock()
+
+
+def get_page_extractor() -> PageExtractor:
+    """Return the process-wide page extractor, creating it on first use."""
+    global _page_extractor
+    if _page_extractor is None:
+        with _page_extractor_lock:
+            if _page_extractor is None:
+                _page_extractor = PageExtractor()
+                get_metrics().register_source("pdf_pages", _page_extractor.stats, {
+                    "hits": "counter", "misses": "counter", "bytes_served": "counter", "evictions": "counter",
+                })
+    return _page_extractor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract the pages of a PDF that a reference cites.")
+    parser.add_argument("pdf")
+    parser.add_argument("--section", help="Cited section number, e.g. 2 or 3.1")
+    parser.add_argument("--excerpt", action="append", default=[], help="Quoted excerpt (repeatable)")
+    parser.add_argument("--pages", help="Comma-separated page numbers, instead of locating them")
+    parser.add_argument("--output", help="Write the extracted pages here")
+    parser.add_argument("--png", action="store_true", help="Also write PNG previews next to --output")
+    args = parser.parse_args()
+
+    extractor = get_page_extractor()
+    pages = ([int(p) for p in args.pages.split(",")] if args.pages
+             else extractor.locate(args.pdf, args.section, args.excerpt))
+    report = {"pages": pages}
+    if pages and args.output:
+        data = extractor.pages_pdf(args.pdf, pages)
+        with open(args.output, "wb") as f:
+            f.write(data)
+        report.update(output=args.output, bytes=len(data), source_bytes=os.path.getsize(args.pdf))
+        if args.png:
+            for page in pages:
+                png = extractor.page_png(args.pdf, page)
+                if png is None:
+                    report["png"] = "pymupdf is not installed"
+                    break
+                with open(f"{os.path.splitext(args.output)[0]}-p{page}.png", "wb") as f:
+                    f.write(png)
+    print(json.dumps(report, indent=2))
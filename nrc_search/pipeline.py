@@ -0,0 +1,421 @@
+"""Retrieval-augmented search: LlamaCloud retrieval followed by a Core42 GPT-4o call.
+
+Compare time-to-first-reference of the streaming and non-streaming paths with:
+
+    python -m nrc_search.pipeline "stress corrosion cracking" --runs 3
+"""
+import argparse
+import hashlib
+import json
+import logging
+import statistics
+import time
+
+from . import config
+from .admission import Core42Busy, in_background
+from .cache import get_query_cache, make_cache_key
+from .clients import get_core42_client, get_retriever
+from .context import build_context, count_tokens
+from .fanout import fanout_retrieve
+from .filters import filter_hints, is_identifier_query, parse_filters, prefer_matching, strip_filter_terms
+from .grounding import ground_results
+from .rerank import rerank
+from .responses import ReferenceStream, parse_rag_response
+from .singleflight import get_single_flight
+from .tracing import Span, current_trace, finish_span, span
+
+
+logger = logging.getLogger(__name__)
+
+
+# --- Prompt ---
+# Enhanced system prompt requesting more details
+SYSTEM_PROMPT = (
+    "You are a technical document assistant for nuclear energy regulations. "
+    "Your task is to identify the specific document name and section number "
+    "that contains the information relevant to the user's question, and provide "
+    "comprehensive details about the content found. "
+    "\n\n"
+    "INSTRUCTIONS:\n"
+    "1. Analyze the provided context chunks thoroughly.\n"
+    "2. Extract the 'Document Name' and 'Section Number' for relevant sources.\n"
+    "3. Provide a DETAILED relevance_summary (3-5 sentences) explaining:\n"
+    "   - What specific information was found\n"
+    "   - Why this section is relevant to the user's question\n"
+    "   - What technical concepts or data points are covered\n"
+    "4. Extract 2-3 key_excerpts: direct quotes from the text that are most relevant.\n"
+    "5. Provide technical_context: brief explanation of the technical significance.\n"
+    "6. Return ONLY a valid JSON object. Do not include any conversational text.\n"
+    "7. If the answer is not in the context, return: {\"error\": \"Information not found in available documents.\"}\n"
+    "\n"
+    "OUTPUT FORMAT:\n"
+    "{\n"
+    "  \"references\": [\n"
+    "    {\n"
+    "      \"document_name\": \"string\",\n"
+    "      \"section_number\": \"string\",\n"
+    "      \"relevance_summary\": \"Detailed 3-5 sentence explanation...\",\n"
+    "      \"key_excerpts\": [\"Direct quote 1...\", \"Direct quote 2...\"],\n"
+    "      \"technical_context\": \"Brief technical significance explanation\"\n"
+    "    }\n"
+    "  ]\n"
+    "}"
+)
+
+
+# --- API Functions ---
+def get_core42_response(role: str, content: str, system_instruction: str = None) -> str:
+    """Sends a message to the Core42 API."""
+    if not config.CORE42_API_KEY:
+        return "Error: API Key is missing."
+
+    messages = []
+    if system_instruction:
+        messages.append({"role": "system", "content": system_instruction})
+    
+    messages.append({"role": role, "content": content})
+
+    with span("llm") as llm:
+        try:
+            response = get_core42_client().chat(messages)
+        except Core42Busy:
+            raise  # the caller shows this as a "try again" notice rather than a failed answer
+        except Exception as e:
+            llm.set(error=type(e).__name__)
+            return f"Error: {e}"
+        if "prompt_tokens" not in llm.attributes:  # no usage block in the reply
+            llm.set(prompt_tokens=sum(count_tokens(m["content"]) for m in messages), completion_tokens=count_tokens(response))
+        return response
+
+
+def retrieve_nodes(query: str, filters=None) -> list:
+    """First-stage retrieval (fanned out over sub-queries when enabled), plus optional local reranking.
+
+    Filter terms in the query (type:, year:, doc:) are combined with filters
+    (set in the UI, which take precedence) and pushed into the retriever.
+    Types and years the query only mentions widen the candidate set and rank
+    matching chunks first. A query that only names documents is answered by
+    direct lookup where the backend has one.
+    """
+    top_k = config.RERANK_CANDIDATES if config.RERANK_ENABLED else config.SIMILARITY_TOP_K
+    filters = parse_filters(query).merge(filters)
+    hints = filter_hints(query)
+    text = strip_filter_terms(query) or query
+    retriever = get_retriever()
+    with span("retrieval", backend=config.RETRIEVAL_BACKEND) as retrieval:
+        if filters:
+            retrieval.set(filters=filters.describe())
+        if filters.document_ids and is_identifier_query(query) and hasattr(retriever, "lookup"):
+            nodes = retriever.lookup(filters.document_ids, config.RERANK_TOP_N if config.RERANK_ENABLED else top_k)
+            retrieval.set(lookup=True, chunks=len(nodes))
+            return nodes
+        fetch_k = top_k * config.FILTER_OVERFETCH if hints else top_k
+        if config.FANOUT_ENABLED:
+            nodes, sub_queries = fanout_retrieve(retriever, text, fetch_k, filters=filters)
+            retrieval.set(sub_queries=len(sub_queries))
+        else:
+            nodes = retriever.retrieve(text, similarity_top_k=fetch_k, filters=filters)
+        if hints:
+            nodes = prefer_matching(nodes, hints, top_k)
+            retrieval.set(hints=hints.describe())
+        retrieval.set(chunks=len(nodes))
+    if config.RERANK_ENABLED:
+        with span("rerank", candidates=len(nodes)) as reranking:
+            nodes = rerank(text, nodes, config.RERANK_TOP_N)
+            reranking.set(chunks=len(nodes))
+    return nodes
+
+
+def build_rag_context(query: str, filters=None):
+    """Retrieve chunks for a query and build the user message. Returns (content, raw_chunks)."""
+    nodes = retrieve_nodes(query, filters)
+    
+    raw_chunks = []  # Store raw chunks for display
+    for i, node_with_score in enumerate(nodes):
+        raw_chunks.append({
+            "source_num": i + 1,
+            "node_id": getattr(node_with_score.node, "node_id", None),
+            "content": node_with_score.node.get_content(),
+            "metadata": node_with_score.node.metadata,
+            "score": node_with_score.score if hasattr(node_with_score, 'score') else None
+        })
+
+    with span("context") as context:
+        context_text, stats = build_context(nodes)
+        context.set(chunks=stats["chunks_in"], sources=stats["sources_sent"], context_tokens=stats["tokens_after"])
+    logger.info(
+        "context tokens %d -> %d (budget %d; %d chunks, %d duplicates dropped, %d merged, %d truncated, %d dropped)",
+        stats["tokens_before"], stats["tokens_after"], stats["token_budget"], stats["chunks_in"],
+        stats["duplicates_dropped"], stats["chunks_merged"], stats["sources_truncated"], stats["sources_dropped"],
+    )
+
+    final_user_content = f"CONTEXT:\n{context_text}\n\nUSER QUESTION: {query}"
+    return final_user_content, raw_chunks
+
+
+def _shareable(error: BaseException) -> Exception:
+    """The error to hand to sessions waiting on a failed flight.
+
+    Control flow of the leader's own script (Streamlit's rerun/stop, KeyboardInterrupt,
+    GeneratorExit) must not stop or rerun theirs; only the leader re-raises it.
+    """
+    return error if isinstance(error, Exception) else RuntimeError("Identical search was abandoned")
+
+
+def _flight_key(query: str, filters=None) -> str:
+    """Single-flight key; warm-up searches run at background priority, so live ones never join them."""
+    key = search_cache_key(query, filters)
+    return f"background:{key}" if in_background() else key
+
+
+def run_custom_rag(query: str, filters=None):
+    """Run RAG query using the configured retriever with enhanced detail extraction.
+
+    Concurrent identical queries from any session share one execution.
+    """
+    if not config.SINGLE_FLIGHT_ENABLED:
+        return _run_custom_rag(query, filters)
+    with span("single_flight") as flight_span:
+        flight, leader = get_single_flight().begin(_flight_key(query, filters))
+        flight_span.set(shared=not leader)
+        if not leader:
+            return get_single_flight().wait(flight)
+    try:
+        value = _run_custom_rag(query, filters)
+    except BaseException as e:
+        get_single_flight().reject(flight, _shareable(e))
+        raise
+    get_single_flight().resolve(flight, value)
+    return value
+
+
+def _run_custom_rag(query: str, filters=None):
+    final_user_content, raw_chunks = build_rag_context(query, filters)
+
+    response = get_core42_response(
+        role="user", 
+        content=final_user_content, 
+        system_instruction=SYSTEM_PROMPT
+    )
+    
+    return response, raw_chunks
+
+
+def stream_custom_rag(query: str, filters=None):
+    """Streaming variant of run_custom_rag.
+
+    Returns (ReferenceStream, raw_chunks); iterate the stream to receive each
+    reference as soon as GPT-4o finishes writing it. A query identical to
+    one already in flight waits for that reply and replays it instead.
+    """
+    if not config.SINGLE_FLIGHT_ENABLED:
+        return _stream_custom_rag(query, None, filters)
+    with span("single_flight") as flight_span:
+        flight, leader = get_single_flight().begin(_flight_key(query, filters))
+        flight_span.set(shared=not leader)
+        if not leader:
+            response, raw_chunks = get_single_flight().wait(flight)
+            return ReferenceStream(iter([response])), raw_chunks
+    try:
+        return _stream_custom_rag(query, flight, filters)
+    except BaseException as e:
+        get_single_flight().reject(flight, _shareable(e))
+        raise
+
+
+def _stream_custom_rag(query: str, flight, filters=None):
+    final_user_content, raw_chunks = build_rag_context(query, filters)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": final_user_content},
+    ]
+    fragments = _traced_fragments(get_core42_client().stream_chat(messages), messages)
+    if flight is not None:
+        fragments = _SharedFragments(fragments, flight, raw_chunks)
+    return ReferenceStream(fragments), raw_chunks
+
+
+class _SharedFragments:
+    """Pass reply fragments through, then hand the full reply to sessions waiting on the same query.
+
+    A class rather than a generator: closing or dropping a generator that was
+    never started runs none of its code, which would leave the flight open and
+    identical searches waiting on it until they time out.
+    """
+
+    def __init__(self, fragments, flight, raw_chunks: list):
+        self._fragments = iter(fragments)
+        self._flight = flight
+        self._raw_chunks = raw_chunks
+        self._parts = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._flight is None:
+            raise StopIteration
+        try:
+            fragment = next(self._fragments)
+        except StopIteration:
+            self._finish(("".join(self._parts), self._raw_chunks), None)
+            raise
+        except BaseException as e:
+            self._finish(None, _shareable(e))
+            raise
+        self._parts.append(fragment)
+        return fragment
+
+    def close(self):
+        """Stop reading; sessions waiting on an unfinished reply get an error instead."""
+        if self._flight is not None:
+            self._finish(None, _shareable(GeneratorExit()))
+        close = getattr(self._fragments, "close", None)
+        if close is not None:
+            close()
+
+    __del__ = close
+
+    def _finish(self, value, error):
+        flight, self._flight = self._flight, None
+        if error is None:
+            get_single_flight().resolve(flight, value)
+        else:
+            get_single_flight().reject(flight, error)
+
+
+def _traced_fragments(fragments, messages: list):
+    """Pass reply fragments through, recording an "llm" span once the stream ends."""
+    trace = current_trace()  # the stream is consumed later, outside this call's context
+    llm = Span("llm", {"streamed": True})
+    parts = []
+    try:
+        for fragment in fragments:
+            if not parts:
+                llm.set(first_token_ms=round((time.perf_counter() - llm.started_at) * 1000, 1))
+            parts.append(fragment)
+            yield fragment
+    except Exception as e:
+        llm.set(error=type(e).__name__)
+        raise
+    finally:
+        llm.set(prompt_tokens=sum(count_tokens(m["content"]) for m in messages), completion_tokens=count_tokens("".join(parts)))
+        finish_span(llm, trace)
+
+
+# --- Cached Search ---
+def search_settings(filters=None) -> dict:
+    """Everything besides the question text that changes the answer."""
+    return dict(
+        backend=config.RETRIEVAL_BACKEND,
+        index=config.LLAMA_CLOUD_INDEX_NAME,
+        index_version=config.INDEX_VERSION,
+        top_k=config.SIMILARITY_TOP_K,
+        rerank=[config.RERANK_CANDIDATES, config.RERANK_TOP_N] if config.RERANK_ENABLED else None,
+        fanout=[config.FANOUT_MAX_QUERIES, config.FANOUT_RRF_K] if config.FANOUT_ENABLED else None,
+        filters=filters.to_dict() if filters else None,
+        context_budget=config.CONTEXT_TOKEN_BUDGET,
+        model=config.CORE42_MODEL,
+        temperature=config.CORE42_TEMPERATURE,
+        prompt=hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:16],
+    )
+
+
+def search_cache_key(query: str, filters=None) -> str:
+    """Cache key covering everything that changes the answer for a query."""
+    return make_cache_key(query, **search_settings(filters))
+
+
+def similar_question_scope(query: str, filters=None) -> str:
+    """Questions may only reuse each other's answers under the same settings, effective filters and key terms."""
+    from .semantic_cache import key_terms
+
+    effective = parse_filters(query).merge(filters)
+    return make_cache_key("", **search_settings(filters), effective_filters=effective.to_dict(),
+                          hints=filter_hints(query).to_dict(), key_terms=key_terms(query))
+
+
+def _semantic_cache():
+    from .semantic_cache import get_semantic_cache  # pulls in numpy; loaded only when the feature is on
+
+    return get_semantic_cache()
+
+
+def get_cached_search(query: str, filters=None):
+    """Return cached (results, raw_chunks) for a query, or for a near-identical earlier one, or None.
+
+    A reused answer is recorded on the cache_lookup span as similar_to and similarity.
+    """
+    if not config.CACHE_ENABLED:
+        return None
+    with span("cache_lookup") as lookup:
+        cached = get_query_cache().get(search_cache_key(query, filters))
+        lookup.set(cache="miss" if cached is None else "hit")
+        if cached is None and config.SEMANTIC_CACHE_ENABLED:
+            match = _semantic_cache().find(query, similar_question_scope(query, filters))
+            if match is not None:
+                cached = get_query_cache().get(match.key)
+                if cached is None:
+                    _semantic_cache().forget(match.key)
+                else:
+                    lookup.set(cache="similar", similar_to=match.query, similarity=match.similarity)
+    return cached
+
+
+def cache_search_result(query: str, results: dict, raw_chunks: list, filters=None):
+    if config.CACHE_ENABLED:
+        key = search_cache_key(query, filters)
+        get_query_cache().put(key, results, raw_chunks)
+        if config.SEMANTIC_CACHE_ENABLED:
+            _semantic_cache().add(query, key, similar_question_scope(query, filters))
+
+
+def search(query: str, filters=None):
+    """Cached run_custom_rag with the reply parsed and its excerpts grounded. Returns (results, raw_chunks, from_cache).
+
+    Raises json.JSONDecodeError if the reply is not valid JSON; such replies
+    are never cached.
+    """
+    cached = get_cached_search(query, filters)
+    if cached is not None:
+        return cached[0], cached[1], True
+    response, raw_chunks = run_custom_rag(query, filters)
+    with span("parse"):
+        results = parse_rag_response(response)
+    ground_results(results, raw_chunks)
+    cache_search_result(query, results, raw_chunks, filters)
+    return results, raw_chunks, False
+
+
+# --- Time-to-First-Reference Comparison ---
+def compare_time_to_first_reference(query: str, runs: int = 3) -> dict:
+    """Time until the first reference is available, streaming vs. non-streaming."""
+    blocking_ms, streaming_ms = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response, _ = run_custom_rag(query)
+        parse_rag_response(response)
+        blocking_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        stream, _ = stream_custom_rag(query)
+        first = None
+        for _reference in stream:
+            if first is None:
+                first = time.perf_counter() - start
+        streaming_ms.append((first if first is not None else time.perf_counter() - start) * 1000)
+
+    return {
+        "runs": runs,
+        "non_streaming_ms": round(statistics.median(blocking_ms), 1),
+        "streaming_ms": round(statistics.median(streaming_ms), 1),
+        "saved_ms": round(statistics.median(blocking_ms) - statistics.median(streaming_ms), 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare time-to-first-reference with and without streaming.")
+    parser.add_argument("query", help="Question to search for")
+    parser.add_argument("--runs", type=int, default=3, help="Timed searches per mode")
+    args = parser.parse_args()
+    print(json.dumps(compare_time_to_first_reference(args.query, runs=args.runs), indent=2))
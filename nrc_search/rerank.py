@@ -0,0 +1,75 @@
+"""Local second-stage reranker for retrieved chunks.
+
+Scores a wide candidate set on CPU with no network call, using a weighted
+mix of:
+- BM25 computed over the candidate set itself
+- query-term coverage
+- query bigrams found verbatim
+- exact NRC document identifier matches
+- the first-stage retrieval score
+"""
+import math
+
+from . import config
+from .doc_index import find_document_ids
+from .text import tokenize
+
+
+WEIGHTS = {"bm25": 0.45, "coverage": 0.2, "bigrams": 0.1, "identifier": 0.15, "first_stage": 0.1}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def score_candidates(query: str, nodes: list) -> list:
+    """Return one feature dict per node, including the weighted "score"."""
+    query_terms = list(dict.fromkeys(tokenize(query)))
+    query_bigrams = {f"{a} {b}" for a, b in zip(query_terms, query_terms[1:])}
+    query_ids = set(find_document_ids(query))
+
+    documents = [tokenize(node.node.get_content()) for node in nodes]
+    n = len(documents) or 1
+    avgdl = (sum(len(d) for d in documents) / n) or 1.0
+    vocabularies = [set(d) for d in documents]
+    df = {term: sum(1 for v in vocabularies if term in v) for term in query_terms}
+    first_stage = [node.score or 0.0 for node in nodes]
+    top_first = max(first_stage, default=0.0) or 1.0
+
+    features = []
+    for node, tokens, first in zip(nodes, documents, first_stage):
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        bm25 = 0.0
+        for term in query_terms:
+            tf = counts.get(term, 0)
+            if tf:
+                idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+                bm25 += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / avgdl))
+        bigrams = {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+        metadata = node.node.metadata or {}
+        node_ids = {metadata.get("document_id")} | set(find_document_ids(str(metadata.get("file_name") or metadata.get("document_name") or ""), any_case=True))
+        features.append({
+            "bm25": bm25,
+            "coverage": (sum(1 for t in query_terms if t in counts) / len(query_terms)) if query_terms else 0.0,
+            "bigrams": (len(query_bigrams & bigrams) / len(query_bigrams)) if query_bigrams else 0.0,
+            "identifier": 1.0 if query_ids & node_ids else 0.0,
+            "first_stage": first / top_first,
+        })
+
+    top_bm25 = max((f["bm25"] for f in features), default=0.0) or 1.0
+    for f in features:
+        f["bm25"] /= top_bm25
+        f["score"] = sum(WEIGHTS[name] * f[name] for name in WEIGHTS)
+    return features
+
+
+def rerank(query: str, nodes: list, top_n: int = None) -> list:
+    """Return the best top_n nodes, with .score replaced by the rerank score."""
+    top_n = top_n or config.RERANK_TOP_N
+    features = score_candidates(query, nodes)
+    order = sorted(range(len(nodes)), key=lambda i: (-features[i]["score"], i))[:top_n]
+    ranked = []
+    for i in order:
+        nodes[i].score = round(features[i]["score"], 4)
+        ranked.append(nodes[i])
+    return ranked
@@ -0,0 +1,130 @@
+"""Parsing of the GPT-4o JSON reply, either whole or while it streams in."""
+import json
+import re
+import time
+
+
+_REFERENCES_KEY = re.compile(r'"references"\s*:\s*\[')
+
+
+def parse_rag_response(response: str) -> dict:
+    """Parse a complete reply, stripping markdown code fences if present.
+
+    Raises json.JSONDecodeError if the reply is not valid JSON.
+    """
+    # Clean the response if wrapped in markdown code blocks
+    clean_response = response.strip()
+    if clean_response.startswith("```json"):
+        clean_response = clean_response[7:]
+    if clean_response.startswith("```"):
+        clean_response = clean_response[3:]
+    if clean_response.endswith("```"):
+        clean_response = clean_response[:-3]
+    return json.loads(clean_response.strip())
+
+
+class ReferenceStreamParser:
+    """Incremental parser that emits each element of "references" once it is complete.
+
+    Feed it text fragments in arrival order; it keeps its scan position and
+    string/nesting state between calls, so every character is visited once.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start = None
+
+    def feed(self, fragment: str) -> list:
+        """Add a fragment and return references completed by it."""
+        self.text += fragment
+        if self._done:
+            return []
+        if not self._in_array:
+            match = _REFERENCES_KEY.search(self.text)
+            if not match:
+                return []
+            self._in_array = True
+            self._pos = match.end()
+
+        completed = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:  # closing bracket of the references array
+                    self._done = True
+                    self._pos = i + 1
+                    return completed
+                self._depth -= 1
+                if self._depth == 0 and self._start is not None:
+                    try:
+                        completed.append(json.loads(text[self._start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._start = None
+        self._pos = len(text)
+        return completed
+
+
+class ReferenceStream:
+    """Iterates references from a stream of reply fragments.
+
+    After iteration, `result` holds the full parsed reply. The streamed
+    references are used when the whole reply cannot be parsed, and
+    parse_rag_response is the fallback when nothing could be streamed
+    (e.g. an {"error": ...} reply). Close a stream that may not be read to
+    the end, so a reply shared with identical searches is not left pending.
+    """
+
+    def __init__(self, fragments):
+        self._fragments = fragments
+        self.parser = ReferenceStreamParser()
+        self.references = []
+        self.result = None
+        self.started_at = time.perf_counter()
+        self.time_to_first_reference = None
+        self.total_time = None
+
+    @property
+    def text(self) -> str:
+        return self.parser.text
+
+    def __iter__(self):
+        for fragment in self._fragments:
+            for reference in self.parser.feed(fragment):
+                if self.time_to_first_reference is None:
+                    self.time_to_first_reference = time.perf_counter() - self.started_at
+                self.references.append(reference)
+                yield reference
+        self.total_time = time.perf_counter() - self.started_at
+        try:
+            self.result = parse_rag_response(self.text)
+        except json.JSONDecodeError:
+            if not self.references:
+                raise
+            self.result = {"references": list(self.references)}
+
+    def close(self):
+        close = getattr(self._fragments, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,276 @@
+"""Near-duplicate question cache in front of the exact-match result cache.
+
+Paraphrases ("SCC in austenitic stainless" vs. "stress corrosion cracking
+of 304 SS") miss the exact-match cache. Every question whose answer is
+cached is also embedded (hashing trick, after spelling out abbreviations)
+into a compact in-memory vector store; a new question whose nearest earlier
+question is similar enough, under the same search settings and filters,
+reuses that question's cached references and chunks.
+
+Similarity alone cannot tell "piping at BWR plants" from "piping at PWR
+plants", so only questions with the same key terms are compared at all:
+document numbers, other numbers and years, and the plant types, systems and
+mechanisms of the abbreviation table, whether abbreviated or spelled out.
+
+Entries are LRU-bounded and persisted to SQLite along with a log of every
+reuse, so which earlier question satisfied a hit can be audited:
+
+    python -m nrc_search.semantic_cache audit --limit 20
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from . import config
+from .cache import normalize_query
+from .doc_index import find_document_ids, remove_document_ids
+from .embeddings import cosine, embed
+from .fanout import ABBREVIATIONS, expand_abbreviations
+from .text import tokenize
+from .tracing import get_metrics
+
+try:
+    import numpy as np
+except ImportError:  # optional: vectorized nearest-neighbour scan
+    np = None
+
+
+def _spaced(text: str) -> str:
+    return re.sub(r"[\s-]+", " ", text)
+
+
+_EXPANSIONS = {_spaced(expansion): abbreviation for abbreviation, expansion in ABBREVIATIONS.items()}
+# Longest first, so "intergranular stress corrosion cracking" is IGSCC and not also SCC
+_SPELLED_OUT = re.compile(r"\b(" + "|".join(
+    expansion.replace(" ", r"[\s-]+") for expansion in sorted(_EXPANSIONS, key=len, reverse=True)) + r")\b")
+
+
+def key_terms(query: str) -> list:
+    """Terms a question must share with an earlier one to reuse its answer, abbreviations in canonical form."""
+    terms = set(find_document_ids(query))
+    text = normalize_query(remove_document_ids(query))
+    for token in tokenize(text):
+        if token in ABBREVIATIONS or any(c.isdigit() for c in token):
+            terms.add(token)
+    terms.update(_EXPANSIONS[_spaced(match)] for match in _SPELLED_OUT.findall(text))
+    return sorted(terms)
+
+
+class SemanticMatch:
+    """The earlier question a hit reused: its exact cache key, text and similarity."""
+
+    __slots__ = ("key", "query", "similarity")
+
+    def __init__(self, key: str, query: str, similarity: float):
+        self.key = key
+        self.query = query
+        self.similarity = similarity
+
+
+class SemanticCache:
+    """Query embeddings in one flat float32 buffer, one slot per entry, evicted least recently used first."""
+
+    def __init__(self, path: str = None, max_entries: int = None, threshold: float = None, dim: int = None):
+        self.path = config.SEMANTIC_CACHE_PATH if path is None else path
+        self.max_entries = max_entries or config.SEMANTIC_CACHE_ENTRIES
+        self.threshold = config.SEMANTIC_CACHE_THRESHOLD if threshold is None else threshold
+        self.dim = dim or config.EMBEDDING_DIM
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # exact cache key -> (slot, scope, query), least recently used first
+        self._slots = []               # slot -> exact cache key, or None when free
+        self._free = []
+        self._vectors = array("f")
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "stale": 0}
+        self._db = None
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, scope TEXT NOT NULL, query TEXT NOT NULL, vector BLOB NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS reuses ("
+                " at REAL NOT NULL, query TEXT NOT NULL, matched_key TEXT NOT NULL, matched_query TEXT NOT NULL,"
+                " similarity REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._load()
+
+    def _load(self):
+        """Restore the most recently used entries saved by earlier processes."""
+        rows = self._db.execute(
+            "SELECT key, scope, query, vector FROM entries ORDER BY accessed DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for key, scope, query, blob in reversed(rows):
+            if len(blob) != self.dim * 4:  # saved with another EMBEDDING_DIM
+                continue
+            vector = array("f")
+            vector.frombytes(blob)
+            self._insert(key, scope, query, vector)
+
+    def embed_query(self, query: str) -> array:
+        return embed(expand_abbreviations(normalize_query(query)), self.dim)
+
+    # Slot bookkeeping (call with self._lock held)
+    def _insert(self, key: str, scope: str, query: str, vector: array):
+        if self._free:
+            slot = self._free.pop()
+            self._slots[slot] = key
+            self._vectors[slot * self.dim:(slot + 1) * self.dim] = vector
+        else:
+            slot = len(self._slots)
+            self._slots.append(key)
+            self._vectors.extend(vector)
+        self._entries[key] = (slot, scope, query)
+
+    def _remove(self, key: str):
+        slot, _, _ = self._entries.pop(key)
+        self._slots[slot] = None
+        self._free.append(slot)
+        if self._db is not None:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _nearest(self, vector: array, scope: str):
+        """(key, similarity) of the most similar entry with the same scope, or None."""
+        if not self._entries:
+            return None
+        if np is not None:
+            matrix = np.frombuffer(self._vectors, dtype=np.float32).reshape(-1, self.dim)
+            sims = matrix @ np.frombuffer(vector, dtype=np.float32)
+            del matrix  # release the buffer so the array can grow again
+            for slot in np.argsort(-sims):
+                key = self._slots[slot]
+                if key is not None and self._entries[key][1] == scope:
+                    return key, float(sims[slot])
+            return None
+        best = None
+        for key, (slot, entry_scope, _) in self._entries.items():
+            if entry_scope == scope:
+                similarity = cosine(self._vectors[slot * self.dim:(slot + 1) * self.dim], vector)
+                if best is None or similarity > best[1]:
+                    best = (key, similarity)
+        return best
+
+    # Public API
+    def add(self, query: str, key: str, scope: str):
+        """Remember that the answer for query is cached under key; scope fingerprints the search settings."""
+        vector = self.embed_query(query)
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._insert(key, scope, query, vector)
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, scope, query, vector, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, scope, query, vector.tobytes(), now, now),
+                )
+                self._db.commit()
+
+    def find(self, query: str, scope: str):
+        """The earlier question within the similarity threshold whose answer can be reused, or None."""
+        vector = self.embed_query(query)
+        with self._lock:
+            nearest = self._nearest(vector, scope)
+            if nearest is None or nearest[1] < self.threshold:
+                self._counters["misses"] += 1
+                return None
+            key, similarity = nearest
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            match = SemanticMatch(key, self._entries[key][2], round(similarity, 4))
+            if self._db is not None:
+                now = time.time()
+                self._db.execute("UPDATE entries SET accessed = ?, hits = hits + 1 WHERE key = ?", (now, key))
+                self._db.execute(
+                    "INSERT INTO reuses (at, query, matched_key, matched_query, similarity) VALUES (?, ?, ?, ?, ?)",
+                    (now, query, key, match.query, match.similarity),
+                )
+                self._db.execute("DELETE FROM reuses WHERE rowid <= (SELECT MAX(rowid) FROM reuses) - ?",
+                                 (config.SEMANTIC_CACHE_AUDIT_ROWS,))
+                self._db.commit()
+            return match
+
+    def forget(self, key: str):
+        """Drop an entry whose answer is no longer in the result cache."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self._counters["stale"] += 1
+                if self._db is not None:
+                    self._db.commit()
+
+    def invalidate(self):
+        """Drop every entry (the answers they point to are gone); the reuse log is kept."""
+        with self._lock:
+            self._entries.clear()
+            self._slots, self._free, self._vectors = [], [], array("f")
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+
+    def reuses(self, limit: int = 20) -> list:
+        """Most recent reuses, newest first: which question was answered with which earlier one."""
+        if self._db is None:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT at, query, matched_query, similarity FROM reuses ORDER BY rowid DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [{"at": at, "query": query, "matched_query": matched, "similarity": similarity}
+                for at, query, matched, similarity in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {**self._counters, "entries": len(self._entries)}
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Return the process-wide similar-question cache, creating it on first use."""
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache()
+                get_metrics().register_source("semantic_cache", _semantic_cache.stats, {
+                    "hits": "counter", "misses": "counter", "stores": "counter", "evictions": "counter",
+                    "stale": "counter",
+                })
+    return _semantic_cache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the similar-question cache.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    audit = sub.add_parser("audit", help="List recent reuses and the earlier questions that satisfied them")
+    audit.add_argument("--limit", type=int, default=20)
+    sub.add_parser("stats", help="Entry count and hit rate")
+    args = parser.parse_args()
+
+    cache = get_semantic_cache()
+    if args.command == "audit":
+        for reuse in cache.reuses(args.limit):
+            print(json.dumps(reuse))
+    else:
+        print(json.dumps(cache.stats(), indent=2))
@@ -0,0 +1,128 @@
+"""Process-wide deduplication of identical searches that are in flight.
+
+Every Streamlit session runs its script on its own thread. When several
+sessions ask the same question at once, the first becomes the leader and
+runs the search; the others wait for its outcome instead of making their
+own LlamaCloud and GPT-4o calls. A leader's exception is raised in every
+waiter. Nothing is kept once the call completes: later requests go to the
+result cache or start a new flight.
+"""
+import threading
+
+from . import config
+from .tracing import get_metrics
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised in a waiter when the shared call does not finish in time."""
+
+
+class Flight:
+    """One in-flight call; the leader resolves or rejects it, waiters block on wait()."""
+
+    __slots__ = ("key", "waiters", "_done", "_value", "_error")
+
+    def __init__(self, key: str):
+        self.key = key
+        self.waiters = 0
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+
+    def wait(self, timeout: float = None):
+        if not self._done.wait(timeout):
+            raise SingleFlightTimeout(f"Identical search still running after {timeout:g}s")
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class SingleFlight:
+    """Groups concurrent calls by key so only one of them reaches upstream."""
+
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout or config.SINGLE_FLIGHT_TIMEOUT
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._counters = {"calls": 0, "upstream_calls": 0, "shared": 0, "timeouts": 0, "errors": 0}
+
+    def begin(self, key: str):
+        """Join or start the flight for key. Returns (flight, is_leader).
+
+        A leader must finish the flight with resolve() or reject(), even on failure.
+        """
+        with self._lock:
+            self._counters["calls"] += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                return flight, False
+            flight = self._flights[key] = Flight(key)
+            self._counters["upstream_calls"] += 1
+            return flight, True
+
+    def resolve(self, flight: Flight, value):
+        self._finish(flight, value, None)
+
+    def reject(self, flight: Flight, error: BaseException):
+        self._finish(flight, None, error)
+
+    def _finish(self, flight: Flight, value, error):
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            if error is not None:
+                self._counters["errors"] += 1
+        flight._value, flight._error = value, error
+        flight._done.set()
+
+    def wait(self, flight: Flight, timeout: float = None):
+        """Block until the leader finishes; returns its value or raises its error."""
+        try:
+            value = flight.wait(self.timeout if timeout is None else timeout)
+        except SingleFlightTimeout:
+            with self._lock:
+                self._counters["timeouts"] += 1
+            raise
+        finally:
+            with self._lock:
+                flight.waiters -= 1
+        with self._lock:
+            self._counters["shared"] += 1
+        return value
+
+    def do(self, key: str, fn, timeout: float = None):
+        """Run fn() once for all concurrent callers with the same key. Returns (value, shared)."""
+        flight, leader = self.begin(key)
+        if not leader:
+            return self.wait(flight, timeout), True
+        try:
+            value = fn()
+        except BaseException as e:
+            self.reject(flight, e)
+            raise
+        self.resolve(flight, value)
+        return value, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "in_flight": len(self._flights),
+                    "waiting": sum(flight.waiters for flight in self._flights.values())}
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Return the process-wide single-flight group, creating it on first use."""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+                get_metrics().register_source("single_flight", _single_flight.stats, {
+                    "calls": "counter", "upstream_calls": "counter", "shared": "counter",
+                    "timeouts": "counter", "errors": "counter",
+                })
+    return _single_flight
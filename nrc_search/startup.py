@@ -0,0 +1,229 @@
+"""Cold-start helpers for the dashboard: background warm-up and a startup profile.
+
+Heavy imports (llama_cloud_services pulls in most of llama-index) are not
+made when the dashboard script loads. After the first screen has been sent,
+warm_start() builds the PDF name index and imports the retrieval client on
+a background thread, so neither delays the first paint and the first search
+rarely waits for them. It also starts the cache warmer (nrc_search.warmup).
+
+With STARTUP_PROFILE=1 the dashboard logs when, counted from process start,
+its imports finished, the first screen was sent and the first run ended.
+The profile command reports the import time of every module the script
+imports and time-to-first-paint of a fresh process, and exits non-zero when
+that exceeds STARTUP_BUDGET_SECONDS (for CI or a container smoke test):
+
+    python -m nrc_search.startup --top 15 --server
+"""
+import argparse
+import ast
+import importlib
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from . import config
+
+
+logger = logging.getLogger(__name__)
+
+
+def _process_start() -> float:
+    """Wall-clock time this process started (from /proc on Linux), or the profiler's launch time."""
+    if os.environ.get("NRC_STARTUP_T0"):
+        return float(os.environ["NRC_STARTUP_T0"])
+    try:
+        with open("/proc/self/stat") as f:
+            started_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - started_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.time()  # not Linux: count from when this module was imported
+
+
+_PROCESS_START = _process_start()
+_marks = {}
+_marks_lock = threading.Lock()
+
+
+# --- Startup Marks ---
+def mark(name: str):
+    """Record (once per process) how long after process start a point of the first run was reached."""
+    if not config.STARTUP_PROFILE:
+        return
+    elapsed_ms = round((time.time() - _PROCESS_START) * 1000, 1)
+    with _marks_lock:
+        if name in _marks:
+            return
+        _marks[name] = elapsed_ms
+    logger.info("startup: %s at %.0f ms after process start", name, elapsed_ms)
+
+
+def marks() -> dict:
+    with _marks_lock:
+        return dict(_marks)
+
+
+# --- Background Warm-up ---
+_warm_started = False
+_warm_lock = threading.Lock()
+
+
+def _backend_modules() -> list:
+    """Modules the first search would otherwise import."""
+    return ["nrc_search.local_index"] if config.RETRIEVAL_BACKEND == "local" else ["llama_cloud_services"]
+
+
+def _warm(data_folder: str):
+    from .doc_index import get_document_index
+
+    steps = [("documents", lambda: get_document_index(data_folder))]
+    steps += [(module, lambda module=module: importlib.import_module(module)) for module in _backend_modules()]
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+            logger.info("warmed %s in %.0f ms", name, (time.perf_counter() - started) * 1000)
+        except Exception as e:
+            logger.warning("warm-up of %s failed: %s", name, e)
+
+
+def warm_start(data_folder: str = None):
+    """Build the PDF index and import the retrieval client, once per process.
+
+    Runs on a background thread unless STARTUP_PREWARM=0, in which case only
+    the PDF index is built, inline, and the client is imported on first search.
+    Lookups that need the index meanwhile simply wait for it. The cache warmer
+    starts either way (it waits WARMUP_DELAY_SECONDS before its first search).
+    """
+    global _warm_started
+    if _warm_started:
+        return
+    with _warm_lock:
+        if _warm_started:
+            return
+        _warm_started = True
+    if config.STARTUP_PREWARM:
+        threading.Thread(target=_warm, args=(data_folder,), name="nrc-warm-start", daemon=True).start()
+    else:
+        from .doc_index import get_document_index
+
+        get_document_index(data_folder)
+    from .warmup import start_cache_warmer
+
+    start_cache_warmer()
+
+
+# --- Profile ---
+def script_imports(script: str) -> list:
+    """Top-level modules a script imports at load, in order."""
+    with open(script, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def import_profile(modules: list, top: int = 15) -> dict:
+    """Import the modules in a fresh interpreter under -X importtime; slowest first, dependencies included."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "; ".join(f"import {m}" for m in modules)],
+        cwd=config.PROJECT_ROOT, capture_output=True, text=True, timeout=300,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        fields = line[len("import time:"):].split("|") if line.startswith("import time:") else []
+        if len(fields) != 3 or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = fields
+        if name.strip() not in modules:  # a dependency, or the interpreter's own startup
+            continue
+        entries.append({"module": name.strip(), "self_ms": round(int(self_us) / 1000, 1),
+                        "cumulative_ms": round(int(cumulative_us) / 1000, 1)})
+    return {
+        "total_ms": round(sum(e["cumulative_ms"] for e in entries), 1),
+        "slowest": sorted(entries, key=lambda e: -e["cumulative_ms"])[:top],
+        "error": result.stderr.strip().splitlines()[-1] if result.returncode else None,
+    }
+
+
+_FIRST_RUN = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=300)
+app.run()
+from nrc_search.startup import marks
+cold = marks()
+started = time.perf_counter()
+app.run()
+print(json.dumps({"marks": cold, "rerun_ms": round((time.perf_counter() - started) * 1000, 1),
+                  "exceptions": [str(e.value) for e in app.exception]}))
+"""
+
+
+def first_paint_profile(script: str) -> dict:
+    """Run the script once in a fresh process (headless) and return its startup marks and rerun time."""
+    env = {**os.environ, "STARTUP_PROFILE": "1", "NRC_STARTUP_T0": repr(time.time())}
+    result = subprocess.run([sys.executable, "-c", _FIRST_RUN, os.path.abspath(script)], cwd=config.PROJECT_ROOT,
+                            env=env, capture_output=True, text=True, timeout=600)
+    if result.returncode:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else result.returncode}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def server_ready_profile(script: str, timeout: float = 120.0) -> dict:
+    """Time from launching `streamlit run` until its health endpoint answers."""
+    import requests
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", os.path.abspath(script), "--server.headless", "true",
+         "--server.port", str(port), "--server.address", "127.0.0.1", "--browser.gatherUsageStats", "false"],
+        cwd=config.PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if requests.get(f"http://127.0.0.1:{port}/_stcore/health", timeout=1).ok:
+                    return {"server_ready_ms": round((time.perf_counter() - started) * 1000, 1)}
+            except requests.RequestException:
+                pass
+            if process.poll() is not None:
+                return {"error": f"streamlit exited with {process.returncode}"}
+            time.sleep(0.02)
+        return {"error": f"not ready after {timeout:.0f} s"}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile dashboard cold start: imports and time-to-first-paint.")
+    parser.add_argument("--script", default=os.path.join(config.PROJECT_ROOT, "02_dashboard.py"))
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    parser.add_argument("--budget", type=float, default=config.STARTUP_BUDGET_SECONDS,
+                        help="Fail when time-to-first-paint exceeds this many seconds")
+    parser.add_argument("--server", action="store_true", help="Also time `streamlit run` until it is healthy")
+    args = parser.parse_args()
+
+    report = {"imports": import_profile(script_imports(args.script), args.top)}
+    report["first_run"] = first_paint_profile(args.script)
+    if args.server:
+        report["server"] = server_ready_profile(args.script)
+    first_paint_ms = report["first_run"].get("marks", {}).get("first_paint")
+    report["budget_ms"] = args.budget * 1000
+    report["within_budget"] = first_paint_ms is not None and first_paint_ms <= args.budget * 1000
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["within_budget"] else 1)
@@ -0,0 +1,21 @@
+"""Tokenization shared by the local index, reranker and caches."""
+import re
+
+
+STOPWORDS = frozenset("""
+a about above after again all also an and any are as at be been before being below between both but by can
+could did do does doing during each few for from further had has have having here how i if in into is it its
+itself just may more most must no nor not of off on once only or other our out over own same shall should so
+some such than that the their them then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your nrc say says tell find info information
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+
+
+def tokenize(text: str, keep_stopwords: bool = False) -> list:
+    """Lower-case word tokens; identifiers like "89-13" or "10.2" stay whole."""
+    tokens = _TOKEN.findall(text.casefold())
+    if keep_stopwords:
+        return tokens
+    return [token for token in tokens if token not in STOPWORDS]
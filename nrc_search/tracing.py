@@ -0,0 +1,317 @@
+"""Per-stage timing spans for searches, and process-wide latency metrics.
+
+A search runs inside a trace; each stage (cache lookup, retrieval, rerank,
+context, GPT-4o, parsing, PDF lookup, rendering) is a span recording its
+duration plus attributes such as token and chunk counts or cache status.
+Every finished span, traced or not, is also added to the process metrics,
+which are served in the Prometheus text format on METRICS_PORT:
+
+    curl http://127.0.0.1:9464/metrics
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import config
+
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNTED_ATTRIBUTES = ("prompt_tokens", "completion_tokens", "chunks")
+
+
+# --- Spans and Traces ---
+class Span:
+    __slots__ = ("name", "started_at", "duration_ms", "attributes")
+
+    def __init__(self, name: str, attributes: dict = None):
+        self.name = name
+        self.started_at = time.perf_counter()
+        self.duration_ms = None
+        self.attributes = dict(attributes or {})
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class Trace:
+    """The spans of one search, in the order they finished."""
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.started_at = time.perf_counter()
+        self.total_ms = None
+        self.spans = []
+        self._lock = threading.Lock()
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self):
+        if self.total_ms is None:
+            self.total_ms = (time.perf_counter() - self.started_at) * 1000
+            get_metrics().observe(self.name, self.total_ms / 1000)
+
+    def to_dict(self) -> dict:
+        total_ms = self.total_ms if self.total_ms is not None else (time.perf_counter() - self.started_at) * 1000
+        return {
+            "name": self.name,
+            "total_ms": round(total_ms, 1),
+            **self.attributes,
+            "spans": [
+                {"stage": span.name, "offset_ms": round((span.started_at - self.started_at) * 1000, 1),
+                 "duration_ms": round(span.duration_ms, 1), **span.attributes}
+                for span in self.spans
+            ],
+        }
+
+
+_current_trace = contextvars.ContextVar("nrc_search_trace", default=None)
+_current_span = contextvars.ContextVar("nrc_search_span", default=None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def begin_trace(name: str = "search", **attributes) -> Trace:
+    """Start a trace and make it current until end_trace is called."""
+    trace = Trace(name, **attributes)
+    trace._token = _current_trace.set(trace)
+    return trace
+
+
+def end_trace(trace: Trace) -> dict:
+    """Finish a trace started with begin_trace. Returns its breakdown."""
+    if getattr(trace, "_token", None) is not None:
+        _current_trace.reset(trace._token)
+        trace._token = None
+    trace.finish()
+    return trace.to_dict()
+
+
+@contextmanager
+def start_trace(name: str = "search", **attributes):
+    """Make a new trace current for the enclosed block and yield it."""
+    trace = begin_trace(name, **attributes)
+    try:
+        yield trace
+    finally:
+        end_trace(trace)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the enclosed block as one stage of the current trace (if any)."""
+    current = Span(name, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        finish_span(current)
+
+
+def annotate(**attributes):
+    """Add attributes to the innermost open span (no-op outside a span)."""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def finish_span(current: Span, trace: Trace = None, duration_ms: float = None):
+    """Close a span and record it; used directly for stages timed outside a with-block."""
+    current.duration_ms = duration_ms if duration_ms is not None else (time.perf_counter() - current.started_at) * 1000
+    trace = trace or _current_trace.get()
+    if trace is not None:
+        trace.add(current)
+    get_metrics().observe(current.name, current.duration_ms / 1000, current.attributes)
+
+
+# --- Metrics ---
+class StageMetrics:
+    """Cumulative histogram and a sliding window for quantiles, per stage."""
+
+    def __init__(self, window: int = None):
+        self.window = window or config.METRICS_WINDOW
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._totals = {}
+        self._cache = {}
+        self._errors = {}
+        self._sources = {}
+
+    def observe(self, stage: str, seconds: float, attributes: dict = None):
+        attributes = attributes or {}
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = {"buckets": [0] * len(BUCKETS), "count": 0, "sum": 0.0,
+                                               "recent": deque(maxlen=self.window)}
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    entry["buckets"][i] += 1
+            entry["count"] += 1
+            entry["sum"] += seconds
+            entry["recent"].append(seconds)
+            for key in COUNTED_ATTRIBUTES:
+                value = attributes.get(key)
+                if isinstance(value, (int, float)):
+                    self._totals[(stage, key)] = self._totals.get((stage, key), 0) + value
+            if attributes.get("cache"):
+                self._cache[attributes["cache"]] = self._cache.get(attributes["cache"], 0) + 1
+            if attributes.get("error"):
+                self._errors[stage] = self._errors.get(stage, 0) + 1
+
+    def quantiles(self, stage: str) -> dict:
+        with self._lock:
+            recent = sorted(self._stages[stage]["recent"]) if stage in self._stages else []
+        if not recent:
+            return {}
+        return {q: recent[min(len(recent) - 1, int(q * len(recent)))] for q in QUANTILES}
+
+    def snapshot(self) -> dict:
+        """Per-stage count, mean and quantiles in milliseconds."""
+        with self._lock:
+            stages = {name: (entry["count"], entry["sum"]) for name, entry in self._stages.items()}
+        report = {}
+        for name, (count, total) in sorted(stages.items()):
+            report[name] = {"count": count, "mean_ms": round(total / count * 1000, 1)}
+            for q, seconds in self.quantiles(name).items():
+                report[name][f"p{int(q * 100)}_ms"] = round(seconds * 1000, 1)
+        return report
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            stages = {name: (list(entry["buckets"]), entry["count"], entry["sum"]) for name, entry in self._stages.items()}
+            totals, cache, errors = dict(self._totals), dict(self._cache), dict(self._errors)
+
+        lines = [
+            "# HELP nrc_search_stage_duration_seconds Duration of each search stage.",
+            "# TYPE nrc_search_stage_duration_seconds histogram",
+        ]
+        for name, (buckets, count, total) in sorted(stages.items()):
+            for bound, bucket_count in zip(BUCKETS, buckets):
+                lines.append(f'nrc_search_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {bucket_count}')
+            lines.append(f'nrc_search_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {count}')
+            lines.append(f'nrc_search_stage_duration_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'nrc_search_stage_duration_seconds_count{{stage="{name}"}} {count}')
+
+        lines += [
+            f"# HELP nrc_search_stage_latency_seconds Stage latency quantiles over the last {self.window} observations.",
+            "# TYPE nrc_search_stage_latency_seconds summary",
+        ]
+        for name, (_, count, total) in sorted(stages.items()):
+            for q, seconds in self.quantiles(name).items():
+                lines.append(f'nrc_search_stage_latency_seconds{{stage="{name}",quantile="{q}"}} {seconds:.6f}')
+            lines.append(f'nrc_search_stage_latency_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'nrc_search_stage_latency_seconds_count{{stage="{name}"}} {count}')
+
+        lines += ["# HELP nrc_search_tokens_total Prompt and completion tokens.", "# TYPE nrc_search_tokens_total counter"]
+        for (name, key), value in sorted(totals.items()):
+            if key.endswith("_tokens"):
+                lines.append(f'nrc_search_tokens_total{{stage="{name}",kind="{key[:-len("_tokens")]}"}} {value}')
+        lines += ["# HELP nrc_search_chunks_total Chunks handled per stage.", "# TYPE nrc_search_chunks_total counter"]
+        for (name, key), value in sorted(totals.items()):
+            if key == "chunks":
+                lines.append(f'nrc_search_chunks_total{{stage="{name}"}} {value}')
+        lines += ["# HELP nrc_search_cache_lookups_total Result cache lookups by outcome.",
+                  "# TYPE nrc_search_cache_lookups_total counter"]
+        for status, value in sorted(cache.items()):
+            lines.append(f'nrc_search_cache_lookups_total{{status="{status}"}} {value}')
+        lines += ["# HELP nrc_search_stage_errors_total Stages that raised.", "# TYPE nrc_search_stage_errors_total counter"]
+        for name, value in sorted(errors.items()):
+            lines.append(f'nrc_search_stage_errors_total{{stage="{name}"}} {value}')
+
+        for prefix, (source, kinds) in sorted(self._sources.items()):
+            try:
+                values = source()
+            except Exception as e:
+                logger.warning("metrics source %s failed: %s", prefix, e)
+                continue
+            for name, value in sorted(values.items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metric = f"nrc_search_{prefix}_{name}"
+                    lines += [f"# TYPE {metric} {kinds.get(name, 'gauge')}", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def register_source(self, prefix: str, source, kinds: dict = None):
+        """Export the numeric values of source() as nrc_search_<prefix>_<name> on every scrape.
+
+        kinds maps a name to its Prometheus type (default "gauge"), e.g. {"calls_total": "counter"}.
+        """
+        with self._lock:
+            self._sources[prefix] = (source, kinds or {})
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> StageMetrics:
+    """Return the process-wide metrics registry."""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = StageMetrics()
+    return _metrics
+
+
+# --- Metrics Endpoint ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = get_metrics().render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_metrics_server = None
+_metrics_failed = False  # the bind failed once; not retried (the dashboard calls this on every rerun)
+
+
+def start_metrics_server(host: str = None, port: int = None):
+    """Serve /metrics from a daemon thread, once per process. Returns the server, or None if disabled or busy."""
+    global _metrics_server, _metrics_failed
+    port = config.METRICS_PORT if port is None else port
+    if port <= 0:
+        return None
+    with _metrics_lock:
+        if _metrics_server is None:
+            if _metrics_failed:
+                return None
+            try:
+                server = ThreadingHTTPServer((host or config.METRICS_HOST, port), _MetricsHandler)
+            except OSError as e:
+                _metrics_failed = True
+                logger.warning("metrics endpoint not started on port %d: %s", port, e)
+                return None
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="nrc-metrics", daemon=True).start()
+            _metrics_server = server
+    return _metrics_server
@@ -0,0 +1,309 @@
+"""Background cache warming from the example questions and the most frequent logged ones.
+
+After a deploy or restart the first person to ask a common question pays for
+LlamaCloud retrieval plus a GPT-4o call. The warmer answers those questions
+ahead of time and stores the results in the query cache, so live searches
+for them are cache hits.
+
+The questions are the examples in the dashboard's Tips expander plus, when
+the query log is enabled (QUERY_LOG_ENABLED=1; it keeps question text on the
+server, so it is opt-in), its most frequent entries. The log keeps only
+the normalized question text, its filters, a count and the day it was last
+asked (no session, client or exact time). Questions that look like they hold
+an e-mail address or phone number are never logged, and a logged question is
+warmed only after QUERY_LOG_MIN_COUNT searches.
+
+Warm-up never competes with users: a search is started only while no live
+GPT-4o call has been waiting or admitted for WARMUP_IDLE_SECONDS, each search
+starts at least WARMUP_INTERVAL_SECONDS after the previous one ended, and the
+GPT-4o call takes a background ticket that may not use the WARMUP_RESERVE
+share of the quota.
+
+Report (or, with --run, improve) the cache coverage of the warm-up set:
+
+    python -m nrc_search.warmup --run
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from . import config
+from .admission import Core42Busy, admission_context, get_scheduler
+from .cache import get_query_cache, normalize_query
+from .filters import SearchFilters
+from .tracing import get_metrics, start_trace
+
+
+logger = logging.getLogger(__name__)
+
+# Shown in the dashboard's "Tips for Better Search Results" expander
+EXAMPLE_QUESTIONS = (
+    "In Thermodynamic Reference Electrodes what is a well defined chemical RedOx couple.",
+    "What does the NRC say about the Production of Chloride-Based Salt Fuel",
+    "What does NRC say about stress corrosion cracking in austenitic stainless steel?",
+)
+
+_PERSONAL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+|\+?\d(?:[\s().-]*\d){8,}")
+MAX_LOGGED_CHARS = 300
+
+
+# --- Query Log ---
+def anonymize_query(query: str):
+    """The normalized question to log, or None when it should not be logged at all."""
+    text = normalize_query(query or "")
+    if not text or len(text) > MAX_LOGGED_CHARS or _PERSONAL.search(text):
+        return None
+    return text
+
+
+class QueryLog:
+    """Counts of anonymized questions in a SQLite file, for choosing what to warm."""
+
+    def __init__(self, path: str = None, max_entries: int = None):
+        self.path = config.QUERY_LOG_PATH if path is None else path
+        self.max_entries = max_entries or config.QUERY_LOG_ENTRIES
+        self._lock = threading.Lock()
+        self._records = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS queries ("
+            " query TEXT NOT NULL, filters TEXT NOT NULL, count INTEGER NOT NULL, last_day INTEGER NOT NULL,"
+            " PRIMARY KEY (query, filters))"
+        )
+        self._db.commit()
+
+    def record(self, query: str, filters: SearchFilters = None):
+        text = anonymize_query(query)
+        if text is None:
+            return
+        filters_json = json.dumps(filters.to_dict(), sort_keys=True) if filters else ""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO queries (query, filters, count, last_day) VALUES (?, ?, 1, ?)"
+                " ON CONFLICT (query, filters) DO UPDATE SET count = count + 1, last_day = excluded.last_day",
+                (text, filters_json, int(time.time() // 86400)),
+            )
+            self._records += 1
+            if self._records % 100 == 0:
+                # Keep the most frequent (then most recent) questions
+                self._db.execute(
+                    "DELETE FROM queries WHERE rowid NOT IN"
+                    " (SELECT rowid FROM queries ORDER BY count DESC, last_day DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+            self._db.commit()
+
+    def top(self, limit: int, min_count: int = None) -> list:
+        """[(query, SearchFilters or None, count)], most frequent first."""
+        min_count = config.QUERY_LOG_MIN_COUNT if min_count is None else min_count
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT query, filters, count FROM queries WHERE count >= ?"
+                " ORDER BY count DESC, last_day DESC LIMIT ?",
+                (min_count, limit),
+            ).fetchall()
+        return [(query, SearchFilters(**json.loads(filters)) if filters else None, count)
+                for query, filters, count in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, searches = self._db.execute("SELECT COUNT(*), COALESCE(SUM(count), 0) FROM queries").fetchone()
+        return {"entries": entries, "searches": searches}
+
+
+_query_log = None
+_query_log_lock = threading.Lock()
+
+
+def get_query_log() -> QueryLog:
+    """Return the process-wide query log, creating it on first use."""
+    global _query_log
+    if _query_log is None:
+        with _query_log_lock:
+            if _query_log is None:
+                _query_log = QueryLog()
+    return _query_log
+
+
+def log_query(query: str, filters: SearchFilters = None):
+    """Count a live search in the query log (when enabled). Never raises."""
+    if not config.QUERY_LOG_ENABLED:
+        return
+    try:
+        get_query_log().record(query, filters)
+    except Exception as e:
+        logger.warning("query log write failed: %s", e)
+
+
+# --- Warming ---
+def warmup_queries(limit: int = None) -> list:
+    """[{"query", "filters", "source"}]: the examples, then the most frequent logged questions."""
+    from .pipeline import search_cache_key
+
+    limit = limit or config.WARMUP_MAX_QUERIES
+    candidates = [(query, None, "example") for query in EXAMPLE_QUESTIONS]
+    if config.QUERY_LOG_ENABLED:
+        candidates += [(query, filters, "popular") for query, filters, _ in get_query_log().top(limit)]
+    queries, seen = [], set()
+    for query, filters, source in candidates:
+        key = search_cache_key(query, filters)
+        if key not in seen and len(queries) < limit:
+            seen.add(key)
+            queries.append({"query": query, "filters": filters, "source": source, "key": key})
+    return queries
+
+
+def coverage_report(queries: list = None) -> dict:
+    """How much of the warm-up set a live search would find in the query cache."""
+    queries = warmup_queries() if queries is None else queries
+    cache = get_query_cache()
+    report = {"queries": len(queries), "cached": 0, "by_source": {}, "missing": []}
+    for item in queries:
+        source = report["by_source"].setdefault(item["source"], {"queries": 0, "cached": 0})
+        source["queries"] += 1
+        if cache.contains(item["key"]):
+            report["cached"] += 1
+            source["cached"] += 1
+        else:
+            report["missing"].append(item["query"])
+    report["coverage"] = round(report["cached"] / len(queries), 3) if queries else 1.0
+    for source in report["by_source"].values():
+        source["coverage"] = round(source["cached"] / source["queries"], 3)
+    return report
+
+
+class CacheWarmer:
+    """Answers the warm-up set into the query cache, one rate-limited background search at a time."""
+
+    def __init__(self, interval: float = None, idle_poll: float = 5.0):
+        self.interval = config.WARMUP_INTERVAL_SECONDS if interval is None else interval
+        self.idle_poll = idle_poll
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._last_search = float("-inf")
+        self._coverage = None
+        self._counters = {"runs": 0, "warmed": 0, "already_cached": 0, "deferred": 0, "failed": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._counters[key] += 1
+
+    def _wait_for_turn(self) -> bool:
+        """Sleep until live traffic is idle and the interval has passed; False once stopped."""
+        while not self._stop.is_set():
+            wait = self._last_search + self.interval - time.monotonic()
+            if wait > 0:
+                self._stop.wait(wait)
+            elif get_scheduler().live_idle():
+                return True
+            else:
+                self._stop.wait(self.idle_poll)
+        return False
+
+    def warm(self, item: dict) -> str:
+        """Answer one warm-up question unless it is cached; returns what happened."""
+        from .pipeline import search
+
+        if get_query_cache().contains(item["key"]):
+            return "already_cached"
+        if not self._wait_for_turn():
+            return "deferred"
+        with admission_context("warmup", background=True), start_trace("warmup_search") as trace:
+            try:
+                search(item["query"], item["filters"])
+            except Core42Busy:
+                return "deferred"  # live traffic arrived; tried again on the next run
+            except json.JSONDecodeError as e:
+                logger.warning("warm-up of %r got an unusable reply: %s", item["query"], e.doc[:200])
+                return "failed"
+            except Exception as e:
+                logger.warning("warm-up of %r failed: %s", item["query"], e)
+                return "failed"
+            finally:
+                self._last_search = time.monotonic()  # the interval runs from the end of a search
+        logger.info("warmed %r in %.0f ms", item["query"], trace.total_ms)
+        return "warmed"
+
+    def run_once(self, limit: int = None) -> dict:
+        """Warm every question of the current warm-up set; returns its coverage afterwards."""
+        queries = warmup_queries(limit)
+        outcomes = {}
+        for item in queries:
+            if self._stop.is_set():
+                break
+            outcome = self.warm(item)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            self._count(outcome)
+        self._count("runs")
+        report = {**coverage_report(queries), "outcomes": outcomes}
+        with self._lock:
+            self._coverage = report["coverage"]
+        logger.info("cache warm-up coverage %.0f%% of %d questions (%s)",
+                    report["coverage"] * 100, report["queries"], outcomes)
+        return report
+
+    def start(self, delay: float = None, refresh: float = None):
+        """Warm on a daemon thread after delay seconds, then again every refresh seconds."""
+        delay = config.WARMUP_DELAY_SECONDS if delay is None else delay
+        refresh = config.WARMUP_REFRESH_SECONDS if refresh is None else refresh
+
+        def loop():
+            wait = delay
+            while not self._stop.wait(wait):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logger.warning("cache warm-up run failed: %s", e)
+                wait = refresh
+
+        threading.Thread(target=loop, name="nrc-cache-warmer", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "coverage": self._coverage}
+
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+
+def start_cache_warmer():
+    """Start the process-wide warmer once (when warm-up and the query cache are enabled). Returns it or None."""
+    global _warmer
+    if not (config.WARMUP_ENABLED and config.CACHE_ENABLED):
+        return None
+    if _warmer is None:
+        with _warmer_lock:
+            if _warmer is None:
+                warmer = CacheWarmer()
+                get_metrics().register_source("cache_warmup", warmer.stats, {
+                    "runs": "counter", "warmed": "counter", "already_cached": "counter",
+                    "deferred": "counter", "failed": "counter",
+                })
+                warmer.start()
+                _warmer = warmer
+    return _warmer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report, or with --run improve, cache coverage of the warm-up set.")
+    parser.add_argument("--run", action="store_true", help="Warm the missing questions now (still yields to live traffic)")
+    parser.add_argument("--limit", type=int, default=config.WARMUP_MAX_QUERIES, help="Questions in the warm-up set")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.run:
+        report = CacheWarmer().run_once(args.limit)
+    else:
+        report = coverage_report(warmup_queries(args.limit))
+    print(json.dumps(report, indent=2))